@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark search_files: legacy rglob + per-line lower() scan vs the
+scandir walker + parallel mmap scan engine.
+
+Builds a synthetic workspace (default 100k files, plus a node_modules
+tree that must be pruned) in a temp folder and times both implementations
+on the same queries. The trigram index is disabled so only the walk and
+content scan are measured.
+
+Usage:
+    python bench_search_files.py --files 100000
+"""
+import os
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+FILLER = "".join(f"    value_{i} = compute(value_{i - 1}, 'text {i}')\n" for i in range(1, 40))
+
+
+def build_tree(root: Path, file_count: int):
+    """Create file_count source files spread over nested project folders."""
+    print(f"📁 Building synthetic workspace with {file_count:,} files in {root}")
+    for i in range(file_count):
+        folder = root / f"project_{i % 20}" / f"pkg_{(i // 20) % 50}" / f"mod_{(i // 1000)}"
+        folder.mkdir(parents=True, exist_ok=True)
+        needle = "def RefreshYoutubeToken():\n" if i % 997 == 0 else ""
+        (folder / f"file_{i}.py").write_text(f"# file {i}\n{FILLER}{needle}")
+
+    # Noise that the old implementation walked and then discarded
+    for i in range(file_count // 10):
+        folder = root / "project_0" / "node_modules" / f"dep_{i % 100}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"index_{i}.js").write_text("module.exports = refreshYoutubeToken;\n")
+
+
+def legacy_search(workspace: Path, query: str, max_results: int) -> int:
+    """The original search_files loop (rglob + is_path_safe + str.lower())."""
+    import server
+
+    def legacy_is_path_safe(file_path: str) -> bool:
+        resolved = Path(file_path).resolve()
+        if not str(resolved).startswith(str(workspace.resolve())):
+            return False
+        path_parts = str(resolved).replace("\\", "/").lower()
+        for blocked in server.BLOCKED_FOLDERS:
+            if f"/{blocked.lower()}/" in path_parts or path_parts.endswith(f"/{blocked.lower()}"):
+                return False
+        return True
+
+    results = 0
+    query_lower = query.lower()
+    for file_path in workspace.rglob("*"):
+        if not file_path.is_file():
+            continue
+        if not legacy_is_path_safe(str(file_path)):
+            continue
+        if file_path.suffix.lower() in server.BLOCKED_EXTENSIONS:
+            continue
+        if file_path.stat().st_size > server.MAX_FILE_SIZE:
+            continue
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if query_lower in line.lower():
+                    results += 1
+                    if results >= max_results:
+                        return results
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic tree")
+    args = parser.parse_args()
+
+    workspace = Path(tempfile.mkdtemp(prefix="mcp-bench-"))
+    os.environ["WORKSPACE_ROOT"] = str(workspace)
+    os.environ["MCP_SEARCH_INDEX"] = "0"
+
+    try:
+        build_tree(workspace, args.files)
+
+        import server
+
+        queries = [
+            ("rare match, full scan", "refreshyoutubetoken", 1000),
+            ("no match, full scan", "this text does not exist", 50),
+            ("early stop", "compute", 50),
+        ]
+
+        print("=" * 60)
+        print(f"{'query':<24}{'legacy':>12}{'engine':>12}{'speedup':>10}")
+        print("=" * 60)
+        for label, query, max_results in queries:
+            started = time.perf_counter()
+            legacy_count = legacy_search(workspace, query, max_results)
+            legacy_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            result = await server.search_files(query, max_results=max_results, use_index=False)
+            engine_time = time.perf_counter() - started
+
+            if result["matches"] != legacy_count:
+                print(f"   ⚠️ match count differs: legacy={legacy_count} engine={result['matches']}")
+
+            print(
+                f"{label:<24}{legacy_time:>11.2f}s{engine_time:>11.2f}s"
+                f"{legacy_time / max(engine_time, 1e-6):>9.1f}x"
+            )
+    finally:
+        if not args.keep:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,341 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           BUILD CACHE                                         ║
+║  Content-hash cache of build outputs (dist/, .next/, ...)     ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Lets `npm run build`, `vercel build` (and full_deploy_pipeline) skip
+unchanged builds:
+- The key hashes the build command plus the path and content of every
+  source file git considers part of the project (tracked + untracked,
+  not ignored), the lockfile and .env* files, which bundlers inline
+- A folder like build/ or dist/ only counts as output when git tracks
+  nothing in it; otherwise it is source, stays in the key and is never
+  stored or overwritten on restore
+- File digests are memoized by (mtime, size), so re-keying an unchanged
+  project only stats its files
+- After a successful build its output folders are copied into the
+  cache; on a hit they are copied back instead of building
+- Total size is bounded; least recently used builds are evicted first
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import subprocess
+from pathlib import Path
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+KEY_VERSION = 1
+
+# Folders a JS build may produce, relative to the project
+OUTPUT_DIRS = ("dist", "build", "out", ".next", ".output", ".svelte-kit/output")
+
+# `vercel build` writes the Build Output API folder that `vercel deploy --prebuilt` uploads
+VERCEL_OUTPUT_DIRS = (".vercel/output",)
+
+# Written by `vercel link` / `vercel pull`; they change what `vercel build` produces
+VERCEL_SETTINGS = ("project.json",)
+
+# Sub-folders of outputs that are caches, not artifacts (never stored or replaced)
+OUTPUT_EXCLUDES = {".next": ("cache",)}
+
+LOCKFILES = ("package-lock.json", "pnpm-lock.yaml", "yarn.lock", "bun.lockb", "bun.lock")
+
+# Skipped when a project is not a git repository
+_WALK_SKIP = {
+    "node_modules", ".git", ".cache", ".turbo", ".vercel", "coverage", ".parcel-cache",
+    "__pycache__", ".venv", "venv",
+}
+
+# Memoized file digests before the memo is reset
+MAX_MEMO_ENTRIES = 200_000
+
+
+def is_vercel_build(command: str) -> bool:
+    return command.split()[:2] == ["vercel", "build"]
+
+
+def output_dirs(command: str) -> tuple[str, ...]:
+    """Folders a build command produces."""
+    return VERCEL_OUTPUT_DIRS if is_vercel_build(command) else OUTPUT_DIRS
+
+
+def _git_ls_files(project_dir: Path, *args: str) -> list[str]:
+    """`git ls-files -z` in project_dir; raises OSError outside a repository."""
+    result = subprocess.run(
+        ["git", "ls-files", "-z", *args],
+        cwd=str(project_dir),
+        capture_output=True,
+        timeout=60,
+    )
+    if result.returncode != 0:
+        raise OSError(result.stderr.decode("utf-8", errors="replace").strip())
+    output = result.stdout.decode("utf-8", errors="surrogateescape")
+    return [f for f in output.split("\0") if f]
+
+
+def _untracked_dirs(dirs: tuple[str, ...], tracked: Iterable[str]) -> tuple[str, ...]:
+    """The dirs that hold none of the tracked (project-relative, /-separated) files."""
+    holding = set()
+    for path in tracked:
+        for folder in dirs:
+            if path.startswith(folder + "/"):
+                holding.add(folder)
+    return tuple(folder for folder in dirs if folder not in holding)
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(folder, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _copy_output(src: Path, dst: Path, exclude: tuple[str, ...]):
+    """Replace dst with a copy of src, leaving dst's excluded sub-folders alone."""
+    if dst.exists():
+        for child in dst.iterdir():
+            if child.name in exclude:
+                continue
+            if child.is_dir() and not child.is_symlink():
+                shutil.rmtree(child)
+            else:
+                child.unlink()
+    dst.mkdir(parents=True, exist_ok=True)
+    for child in src.iterdir():
+        if child.name in exclude:
+            continue
+        target = dst / child.name
+        if child.is_dir() and not child.is_symlink():
+            shutil.copytree(child, target, symlinks=True)
+        else:
+            shutil.copy2(child, target, follow_symlinks=False)
+
+
+class BuildCache:
+    """Size-bounded LRU of build outputs keyed by a hash of the build inputs."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.index_path = self.root / "index.json"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._memo: dict[str, tuple[int, int, str]] = {}  # abs path -> (mtime_ns, size, sha)
+        self._index: Optional[dict] = None
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- Index ----------
+
+    def _load(self) -> dict:
+        if self._index is None:
+            try:
+                self._index = json.loads(self.index_path.read_text("utf-8"))
+            except FileNotFoundError:
+                self._index = {"entries": {}, "projects": {}}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Build cache index unreadable, starting empty: {e}")
+                self._index = {"entries": {}, "projects": {}}
+        return self._index
+
+    def _save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    # ---------- Keys ----------
+
+    def _input_files(self, project_dir: Path, command: str) -> list[str]:
+        """Project-relative paths of the build inputs."""
+        try:
+            tracked = _git_ls_files(project_dir, "--cached")
+            files = set(tracked)
+            files.update(_git_ls_files(project_dir, "--others", "--exclude-standard"))
+        except (OSError, subprocess.SubprocessError):
+            tracked = []
+            files = set()
+            for folder, dirs, names in os.walk(project_dir):
+                dirs[:] = [d for d in dirs if d not in _WALK_SKIP]
+                rel_folder = os.path.relpath(folder, project_dir)
+                for name in names:
+                    files.add(name if rel_folder == "." else os.path.join(rel_folder, name))
+
+        # Usually git-ignored, but they change what gets built
+        for name in LOCKFILES:
+            if (project_dir / name).is_file():
+                files.add(name)
+        for entry in os.scandir(project_dir):
+            if entry.name.startswith(".env") and entry.is_file():
+                files.add(entry.name)
+        if is_vercel_build(command) and (project_dir / ".vercel").is_dir():
+            # Pulled project settings and environment variables
+            for entry in os.scandir(project_dir / ".vercel"):
+                if entry.is_file() and (
+                    entry.name.startswith(".env") or entry.name in VERCEL_SETTINGS
+                ):
+                    files.add(f".vercel/{entry.name}")
+
+        outputs = _untracked_dirs(OUTPUT_DIRS + VERCEL_OUTPUT_DIRS, tracked)
+        output_prefixes = tuple(d + "/" for d in outputs)
+        return sorted(
+            f
+            for f in files
+            if f and not f.replace(os.sep, "/").startswith(output_prefixes)
+        )
+
+    def output_dirs(self, project_dir: Path, dirs: Iterable[str]) -> list[str]:
+        """The dirs present in project_dir that git tracks nothing in."""
+        dirs = tuple(d for d in dirs if (project_dir / d).is_dir())
+        if not dirs:
+            return []
+        try:
+            tracked = _git_ls_files(project_dir, "--cached", "--", *dirs)
+        except (OSError, subprocess.SubprocessError):
+            tracked = []  # Not a repository: nothing is tracked
+        return list(_untracked_dirs(dirs, tracked))
+
+    def _digest(self, path: Path) -> str:
+        key = str(path)
+        try:
+            stat = path.stat()
+        except OSError:
+            return "missing"
+        memo = self._memo.get(key)
+        if memo and memo[0] == stat.st_mtime_ns and memo[1] == stat.st_size:
+            return memo[2]
+        sha = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    sha.update(block)
+        except OSError:
+            return "unreadable"
+        if len(self._memo) >= MAX_MEMO_ENTRIES:
+            self._memo.clear()
+        self._memo[key] = (stat.st_mtime_ns, stat.st_size, sha.hexdigest())
+        return sha.hexdigest()
+
+    def key(self, project_dir: Path, command: str) -> tuple[str, int]:
+        """(cache key, number of input files) for building project_dir with command."""
+        project_dir = Path(project_dir)
+        files = self._input_files(project_dir, command)
+        digest = hashlib.sha256(f"v{KEY_VERSION}\0{' '.join(command.split())}\0".encode())
+        for rel_path in files:
+            digest.update(rel_path.encode("utf-8", errors="surrogateescape") + b"\0")
+            digest.update(self._digest(project_dir / rel_path).encode() + b"\0")
+        return digest.hexdigest()[:40], len(files)
+
+    # ---------- Public API ----------
+
+    def restore(self, key: str, project_dir: Path) -> Optional[dict]:
+        """
+        Put the outputs cached under key into project_dir.
+        Returns None on a miss; skips the copy when the project already
+        holds the outputs of this key.
+        """
+        project_dir = Path(project_dir)
+        with self._lock:
+            index = self._load()
+            entry = index["entries"].get(key)
+            if entry is None or not (self.root / key).is_dir():
+                self.misses += 1
+                return None
+
+            up_to_date = index["projects"].get(str(project_dir)) == key and all(
+                (project_dir / output).is_dir() for output in entry["outputs"]
+            )
+            if not up_to_date:
+                # Never overwrite a folder that has since gained tracked files
+                replaceable = set(self.output_dirs(project_dir, entry["outputs"]))
+                for output in entry["outputs"]:
+                    if (project_dir / output).is_dir() and output not in replaceable:
+                        continue
+                    _copy_output(
+                        self.root / key / output,
+                        project_dir / output,
+                        OUTPUT_EXCLUDES.get(output, ()),
+                    )
+            entry["last_used"] = time.time()
+            index["projects"][str(project_dir)] = key
+            self._save()
+            self.hits += 1
+            return {
+                "key": key,
+                "outputs": entry["outputs"],
+                "bytes": entry["bytes"],
+                "built_at": entry["created"],
+                "restored": not up_to_date,
+            }
+
+    def store(self, key: str, project_dir: Path, command: str) -> Optional[dict]:
+        """Copy the outputs of a successful build into the cache."""
+        project_dir = Path(project_dir)
+        outputs = self.output_dirs(project_dir, output_dirs(command))
+        if not outputs:
+            return None
+
+        with self._lock:
+            index = self._load()
+            target = self.root / key
+            tmp_target = self.root / f"{key}.tmp"
+            shutil.rmtree(tmp_target, ignore_errors=True)
+            for output in outputs:
+                _copy_output(
+                    project_dir / output, tmp_target / output, OUTPUT_EXCLUDES.get(output, ())
+                )
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(tmp_target, target)
+
+            entry = {
+                "project": str(project_dir),
+                "command": command,
+                "outputs": outputs,
+                "bytes": _dir_size(target),
+                "created": time.time(),
+                "last_used": time.time(),
+            }
+            index["entries"][key] = entry
+            index["projects"][str(project_dir)] = key
+            self._evict(keep=key)
+            self._save()
+            return {"key": key, "outputs": outputs, "bytes": entry["bytes"]}
+
+    def _evict(self, keep: str):
+        """Drop least recently used builds until under max_bytes."""
+        entries = self._index["entries"]
+        total = sum(entry["bytes"] for entry in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= entries.pop(key)["bytes"]
+            shutil.rmtree(self.root / key, ignore_errors=True)
+            logger.info(f"Evicted cached build {key[:12]}; cache is {total} bytes")
+        projects = self._index["projects"]
+        for project in [p for p, k in projects.items() if k not in entries]:
+            del projects[project]
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._load()["entries"]
+            return {
+                "builds": len(entries),
+                "bytes": sum(entry["bytes"] for entry in entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,421 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           COMMAND JOBS                                        ║
+║  Background commands with streamed, bounded output            ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Backs start_command / poll_command / cancel_command and run_command:
+- Output is read from the pipes in chunks while the process runs and
+  decoded incrementally (UTF-8 sequences split across reads stay intact)
+- Background jobs keep the last N characters in a ring buffer addressed
+  by absolute offsets, so a poller can resume where it stopped and learn
+  how much was dropped
+- run_command keeps only the head it returns plus counters, instead of
+  buffering the whole output through communicate()
+- Commands run in their own process group so a cancel or timeout also
+  stops the children (npm -> node -> esbuild ...); on Windows the tree is
+  stopped with taskkill /T
+- Running jobs are killed when the server exits instead of being orphaned
+"""
+
+import os
+import re
+import abc
+import time
+import uuid
+import codecs
+import signal
+import asyncio
+import logging
+import subprocess
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Bytes requested per pipe read
+READ_CHUNK_SIZE = 64 * 1024
+
+# Seconds between SIGTERM and SIGKILL when stopping a command
+KILL_GRACE_SECONDS = 3.0
+
+_PERCENT = re.compile(r"(\d{1,3}(?:\.\d+)?)\s?%")
+_LINE_BREAK = re.compile(r"[\r\n]")
+
+
+class OutputSink(abc.ABC):
+    """Common counters for captured output."""
+
+    def __init__(self):
+        self.total = 0  # Characters seen
+        self.lines = 0
+        self.last_line = ""
+        self.percent: Optional[float] = None
+        self._partial = ""
+
+    def _track(self, text: str):
+        self.total += len(text)
+        self.lines += text.count("\n")
+        # Progress bars redraw with \r, so treat it as a line break too
+        pieces = _LINE_BREAK.split((self._partial + text)[-8192:])
+        self._partial = pieces[-1]
+        line = next((piece.strip() for piece in reversed(pieces) if piece.strip()), "")
+        if line:
+            self.last_line = line[-300:]
+            found = _PERCENT.findall(line)
+            if found and float(found[-1]) <= 100:
+                self.percent = float(found[-1])
+
+    @abc.abstractmethod
+    def append(self, text: str):
+        """Take the next piece of decoded output."""
+
+
+class HeadCapture(OutputSink):
+    """Keeps the first max_chars characters; later output is only counted."""
+
+    def __init__(self, max_chars: int):
+        super().__init__()
+        self.max_chars = max_chars
+        self._parts: list[str] = []
+        self._kept = 0
+
+    def append(self, text: str):
+        if not text:
+            return
+        self._track(text)
+        if self._kept < self.max_chars:
+            part = text[: self.max_chars - self._kept]
+            self._parts.append(part)
+            self._kept += len(part)
+
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+class OutputRing(OutputSink):
+    """The last max_chars characters of a stream, addressed by absolute offsets."""
+
+    def __init__(self, max_chars: int):
+        super().__init__()
+        self.max_chars = max_chars
+        self._chunks: deque[str] = deque()
+        self._size = 0
+        self.start = 0  # Absolute offset of the first retained character
+
+    def append(self, text: str):
+        if not text:
+            return
+        self._track(text)
+        self._chunks.append(text)
+        self._size += len(text)
+        while self._size > self.max_chars:
+            excess = self._size - self.max_chars
+            first = self._chunks[0]
+            if len(first) <= excess:
+                self._chunks.popleft()
+                self._size -= len(first)
+                self.start += len(first)
+            else:
+                self._chunks[0] = first[excess:]
+                self._size -= excess
+                self.start += excess
+
+    def read(self, offset: int, limit: int) -> dict:
+        """Up to limit characters from offset; offsets before start were dropped."""
+        offset = max(0, offset)
+        dropped = max(0, self.start - offset)
+        position = max(offset, self.start)
+        if position >= self.total:
+            return {
+                "output": "",
+                "offset": position,
+                "next_offset": self.total,
+                "dropped": dropped,
+            }
+
+        # Skip whole chunks before position, then slice
+        skip = position - self.start
+        parts, remaining = [], limit
+        for chunk in self._chunks:
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            part = chunk[skip : skip + remaining]
+            skip = 0
+            parts.append(part)
+            remaining -= len(part)
+            if remaining <= 0:
+                break
+        output = "".join(parts)
+        return {
+            "output": output,
+            "offset": position,
+            "next_offset": position + len(output),
+            "dropped": dropped,
+        }
+
+
+async def pump(stream: asyncio.StreamReader, sink: OutputSink):
+    """Copy a pipe into sink until EOF."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        data = await stream.read(READ_CHUNK_SIZE)
+        if not data:
+            sink.append(decoder.decode(b"", final=True))
+            return
+        sink.append(decoder.decode(data))
+
+
+async def spawn(command: str, cwd: Path, merge_stderr: bool) -> asyncio.subprocess.Process:
+    """Start a shell command in its own process group."""
+    if os.name == "nt":
+        group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        group = {"start_new_session": True}
+    return await asyncio.create_subprocess_shell(
+        command,
+        cwd=str(cwd),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT if merge_stderr else asyncio.subprocess.PIPE,
+        **group,
+    )
+
+
+def _taskkill(pid: int):
+    """Windows has no group signals: kill the whole tree below pid."""
+    subprocess.run(
+        ["taskkill", "/T", "/F", "/PID", str(pid)],
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        timeout=30,
+    )
+
+
+def kill_tree(pid: int, force: bool):
+    """Signal a spawned command and its children (SIGTERM, or SIGKILL when force)."""
+    try:
+        if os.name == "nt":
+            _taskkill(pid)  # Always forceful; console programs ignore a polite taskkill
+        else:
+            os.killpg(pid, signal.SIGKILL if force else signal.SIGTERM)
+    except (OSError, subprocess.SubprocessError):
+        pass
+
+
+def _group_alive(pid: int) -> bool:
+    """Whether anything in the process group is left (reaping the leader first)."""
+    try:
+        os.waitpid(pid, os.WNOHANG)
+    except ChildProcessError:
+        pass
+    try:
+        os.killpg(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+async def terminate(process: asyncio.subprocess.Process, grace: float = KILL_GRACE_SECONDS):
+    """Stop a process and its children: SIGTERM, then SIGKILL after grace."""
+    if process.returncode is not None:
+        return
+    if os.name == "nt":
+        await asyncio.get_running_loop().run_in_executor(None, kill_tree, process.pid, True)
+    else:
+        kill_tree(process.pid, force=False)
+    try:
+        await asyncio.wait_for(process.wait(), timeout=grace)
+        return
+    except asyncio.TimeoutError:
+        pass
+    kill_tree(process.pid, force=True)
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+    await process.wait()
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+class CommandJob:
+    """One background command and its output ring."""
+
+    def __init__(self, command: str, working_dir: str, timeout: float, ring_chars: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.command = command
+        self.working_dir = working_dir
+        self.timeout = timeout
+        self.output = OutputRing(ring_chars)
+        self.status = "running"  # queued, running, succeeded, failed, cancelled, timed_out
+        self.exit_code: Optional[int] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.task: Optional[asyncio.Task] = None
+        self.scheduling: Optional[dict] = None
+        self.done = asyncio.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.finished_at is None
+
+    def info(self) -> dict:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "command": self.command,
+            "working_dir": self.working_dir,
+            "status": self.status,
+            "exit_code": self.exit_code,
+            "started_at": _iso(self.started_at),
+            "finished_at": _iso(self.finished_at),
+            "elapsed_seconds": round(end - self.started_at, 2),
+            "output_chars": self.output.total,
+            "output_lines": self.output.lines,
+            "last_line": self.output.last_line,
+            "progress_percent": self.output.percent,
+            "scheduling": self.scheduling,
+        }
+
+
+class JobManager:
+    """Starts, tracks and stops background command jobs."""
+
+    def __init__(self, ring_chars: int, max_finished: int = 50):
+        self.ring_chars = ring_chars
+        self.max_finished = max_finished
+        self._jobs: dict[str, CommandJob] = {}
+
+    async def start(
+        self, command: str, cwd: Path, working_dir: str, timeout: float, gate=None
+    ) -> CommandJob:
+        """
+        Run a command in the background. gate is an optional async context
+        manager (a scheduler slot) entered before the process starts; its
+        value's info() is reported as the job's scheduling details.
+        """
+        job = CommandJob(command, working_dir, timeout, self.ring_chars)
+        if gate is not None:
+            job.status = "queued"
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, cwd, gate))
+        self._prune()
+        return job
+
+    async def _run(self, job: CommandJob, cwd: Path, gate):
+        try:
+            if gate is None:
+                await self._execute(job, cwd)
+            else:
+                async with gate as ticket:
+                    job.scheduling = ticket.info()
+                    await self._execute(job, cwd)
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.output.append(f"[could not start: {e}]\n")
+        finally:
+            self._finish(job)
+
+    def _finish(self, job: CommandJob):
+        if job.done.is_set():
+            return
+        job.exit_code = job.process.returncode if job.process else None
+        if job.status == "running":
+            job.status = "succeeded" if job.exit_code == 0 else "failed"
+        job.finished_at = time.time()
+        job.done.set()
+        logger.info(f"Job {job.id} {job.status} (exit {job.exit_code}): {job.command}")
+
+    async def _execute(self, job: CommandJob, cwd: Path):
+        job.status = "running"
+        job.process = await spawn(job.command, cwd, merge_stderr=True)
+        reader = asyncio.create_task(pump(job.process.stdout, job.output))
+        try:
+            await asyncio.wait_for(job.process.wait(), timeout=job.timeout)
+        except asyncio.TimeoutError:
+            job.status = "timed_out"
+            await terminate(job.process)
+            job.output.append(f"\n[timed out after {job.timeout:g} seconds]\n")
+        except asyncio.CancelledError:
+            await terminate(job.process)
+            raise
+        finally:
+            try:
+                await asyncio.wait_for(reader, timeout=KILL_GRACE_SECONDS)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                reader.cancel()  # A grandchild still holds the pipe open
+
+    async def cancel(self, job_id: str) -> Optional[CommandJob]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job.running:
+            if job.process is None:
+                # Still queued; a task cancelled before its first step never
+                # runs its finally block, so finish it here
+                job.task.cancel()
+                try:
+                    await job.task
+                except asyncio.CancelledError:
+                    pass
+                job.status = "cancelled"
+                self._finish(job)
+            else:
+                job.status = "cancelled"
+                await terminate(job.process)
+                await job.done.wait()
+        return job
+
+    def kill_all(self, grace: float = KILL_GRACE_SECONDS):
+        """
+        Stop the process tree of every job that still has one, including
+        children that outlived a cancelled job's shell. Synchronous: used on
+        server exit, when the event loop that owns the processes is gone.
+        """
+        processes = [job.process for job in self._jobs.values() if job.process is not None]
+        if os.name == "nt":
+            pids = [process.pid for process in processes if process.returncode is None]
+        else:
+            pids = [process.pid for process in processes if _group_alive(process.pid)]
+        if not pids:
+            return
+        logger.info(f"Stopping {len(pids)} background job(s)")
+        for pid in pids:
+            kill_tree(pid, force=False)
+        if os.name == "nt":
+            return
+        deadline = time.monotonic() + grace
+        while pids and time.monotonic() < deadline:
+            time.sleep(0.1)
+            pids = [pid for pid in pids if _group_alive(pid)]
+        for pid in pids:
+            kill_tree(pid, force=True)
+
+    def get(self, job_id: str) -> Optional[CommandJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> list[CommandJob]:
+        return sorted(self._jobs.values(), key=lambda job: job.started_at, reverse=True)
+
+    def _prune(self):
+        finished = [job for job in self.list() if not job.running]
+        for job in finished[self.max_finished:]:
+            del self._jobs[job.id]
+
+    def stats(self) -> dict:
+        jobs = list(self._jobs.values())
+        return {
+            "queued": sum(1 for job in jobs if job.status == "queued"),
+            "running": sum(1 for job in jobs if job.status == "running"),
+            "finished": sum(1 for job in jobs if not job.running),
+            "ring_chars": self.ring_chars,
+        }
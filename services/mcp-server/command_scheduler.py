@@ -0,0 +1,283 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           COMMAND SCHEDULER                                   ║
+║  CPU slots, priorities and per-project locks for commands     ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Sits in front of run_command / start_command so concurrent clients
+don't thrash CPU and disk:
+- Every command is classified: interactive (git status, ls, ...),
+  service (dev servers), network (git fetch/pull/push, deploy uploads),
+  normal (scripts, tests) or build (install, build)
+- normal and build commands need one of N CPU slots (N = cores);
+  waiters are served by priority, then arrival order
+- interactive, service and network commands need no slot: they are
+  cheap, never finish or wait on the network, and none should queue
+  behind a build
+- build commands also take a per-project lock, so two installs or an
+  install and a build never run on the same node_modules at once; git
+  write commands take a separate per-project git lock
+- Queue depth and wait times are kept per class for monitoring
+"""
+
+import re
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+# Lower value = served first
+PRIORITIES = {"interactive": 0, "service": 0, "network": 1, "normal": 1, "build": 2}
+
+# Classes that run without a CPU slot
+SLOTLESS_CLASSES = {"interactive", "service", "network"}
+
+_SEGMENT_SPLIT = re.compile(r"&&|\|\||;|\|")
+
+_READ_ONLY = {"ls", "dir", "cat", "type", "head", "tail", "find", "grep", "rg", "pwd", "cd"}
+_GIT_READ = {"status", "log", "diff", "branch", "show", "remote", "rev-parse"}
+_GIT_NETWORK = {"fetch", "pull", "push"}
+_JS_PACKAGE_MANAGERS = {"npm", "pnpm", "yarn", "bun"}
+_DEPLOY_TOOLS = {"vercel", "netlify", "firebase"}
+
+
+class QueueTimeout(Exception):
+    """The command could not start within its wait timeout."""
+
+
+@dataclass(frozen=True)
+class CommandClass:
+    name: str  # interactive, service, network, normal, build
+    lock: Optional[str] = None  # "build", "git" or None
+
+    @property
+    def priority(self) -> int:
+        return PRIORITIES[self.name]
+
+
+def _classify_segment(parts: list[str]) -> CommandClass:
+    name = parts[0]
+    sub = parts[1] if len(parts) > 1 else ""
+    script = parts[2] if len(parts) > 2 else ""
+
+    if name in _READ_ONLY or name == "mkdir":
+        return CommandClass("interactive")
+    if name == "git":
+        if sub in _GIT_READ:
+            return CommandClass("interactive")
+        if sub in _GIT_NETWORK:
+            return CommandClass("network", "git")
+        return CommandClass("normal", "git")
+    if name in _JS_PACKAGE_MANAGERS:
+        if sub in ("install", "ci", "add", "i") or (name in ("yarn", "bun") and not sub):
+            return CommandClass("build", "build")
+        if sub == "build" or (sub == "run" and script.startswith("build")):
+            return CommandClass("build", "build")
+        if sub == "start" or (sub == "run" and script in ("dev", "start", "serve", "preview")):
+            return CommandClass("service")
+        if sub in ("ls", "outdated", "audit", "--version", "-v"):
+            return CommandClass("interactive")
+        return CommandClass("normal")
+    if name in ("pip", "pip3"):
+        if sub == "install":
+            return CommandClass("build", "build")
+        return CommandClass("interactive")
+    if name == "uv":
+        if sub in ("sync", "add", "remove", "lock") or (sub == "pip" and script == "install"):
+            return CommandClass("build", "build")
+        return CommandClass("normal")
+    if name in ("flutter", "dart"):
+        if sub in ("build", "pub", "clean"):
+            return CommandClass("build", "build")
+        if sub in ("doctor", "analyze", "format"):
+            return CommandClass("interactive")
+        return CommandClass("normal")
+    if name in _DEPLOY_TOOLS:
+        if sub in ("ls", "logs", "inspect", "env", "status", "open"):
+            return CommandClass("interactive")
+        if sub in ("serve", "emulators:start"):
+            return CommandClass("service")
+        if sub == "build":
+            return CommandClass("build", "build")
+        # Uploads and settings pulls wait on the network, but must not
+        # overlap a build of the same project
+        return CommandClass("network", "build")
+    if name == "docker":
+        return CommandClass("normal") if sub == "compose" else CommandClass("interactive")
+    return CommandClass("normal")
+
+
+def classify(command: str) -> CommandClass:
+    """Class of a command line; chained commands take their heaviest segment."""
+    classes = [
+        _classify_segment(segment.split())
+        for segment in _SEGMENT_SPLIT.split(command.lower())
+        if segment.split()
+    ]
+    if not classes:
+        return CommandClass("interactive")
+    return max(classes, key=lambda c: (c.priority, c.lock is not None))
+
+
+class PrioritySlots:
+    """Counting semaphore whose waiters are woken lowest priority value first."""
+
+    def __init__(self, slots: int):
+        self.slots = max(1, slots)
+        self.in_use = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    async def acquire(self, priority: int):
+        if self.in_use < self.slots and not self._waiters:
+            self.in_use += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # The slot was handed over just before the cancel
+            raise
+
+    def release(self):
+        # Hand the slot straight to the next live waiter
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+
+class _ClassMetrics:
+    def __init__(self):
+        self.queued = 0
+        self.running = 0
+        self.started = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def as_dict(self) -> dict:
+        average = self.total_wait / self.started if self.started else 0.0
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "started": self.started,
+            "avg_wait_seconds": round(average, 3),
+            "max_wait_seconds": round(self.max_wait, 3),
+        }
+
+
+@dataclass
+class Ticket:
+    command_class: CommandClass
+    project: str
+    waited_seconds: float = 0.0
+
+    def info(self) -> dict:
+        return {
+            "class": self.command_class.name,
+            "project_lock": self.command_class.lock,
+            "waited_seconds": round(self.waited_seconds, 3),
+        }
+
+
+class CommandScheduler:
+    """Admission control for terminal commands."""
+
+    def __init__(self, cpu_slots: int):
+        self.cpu = PrioritySlots(cpu_slots)
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+        self._metrics = {name: _ClassMetrics() for name in PRIORITIES}
+
+    def _lock(self, kind: str, project: str) -> asyncio.Lock:
+        key = (kind, project)
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    @asynccontextmanager
+    async def slot(self, command: str, project: str, wait_timeout: Optional[float] = None):
+        """
+        Wait for the command's project lock and CPU slot; yields a Ticket.
+        Raises QueueTimeout if both are not available within wait_timeout.
+        """
+        command_class = classify(command)
+        ticket = Ticket(command_class, project)
+        metrics = self._metrics[command_class.name]
+        lock = self._lock(command_class.lock, project) if command_class.lock else None
+        needs_slot = command_class.name not in SLOTLESS_CLASSES
+
+        started = time.monotonic()
+        deadline = started + wait_timeout if wait_timeout is not None else None
+
+        def remaining() -> Optional[float]:
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        metrics.queued += 1
+        holds_lock = holds_slot = False
+        try:
+            # Lock first: a build waiting on its project must not sit on a CPU slot
+            if lock is not None:
+                await asyncio.wait_for(lock.acquire(), timeout=remaining())
+                holds_lock = True
+            if needs_slot:
+                await asyncio.wait_for(
+                    self.cpu.acquire(command_class.priority), timeout=remaining()
+                )
+                holds_slot = True
+        except asyncio.TimeoutError:
+            metrics.queued -= 1
+            if holds_lock:
+                lock.release()
+            if holds_lock or lock is None:
+                waiting_for = "CPU slot"
+            else:
+                waiting_for = f"{command_class.lock} lock on '{project or '.'}'"
+            raise QueueTimeout(
+                f"Waited {wait_timeout:g}s for a {waiting_for} ({command_class.name} command)"
+            )
+        except BaseException:
+            metrics.queued -= 1
+            if holds_lock:
+                lock.release()
+            raise
+
+        ticket.waited_seconds = time.monotonic() - started
+        metrics.queued -= 1
+        metrics.running += 1
+        metrics.started += 1
+        metrics.total_wait += ticket.waited_seconds
+        metrics.max_wait = max(metrics.max_wait, ticket.waited_seconds)
+        try:
+            yield ticket
+        finally:
+            metrics.running -= 1
+            if holds_slot:
+                self.cpu.release()
+            if holds_lock:
+                lock.release()
+
+    def stats(self) -> dict:
+        return {
+            "cpu_slots": self.cpu.slots,
+            "cpu_slots_in_use": self.cpu.in_use,
+            "queue_depth": sum(metrics.queued for metrics in self._metrics.values()),
+            "waiting_for_cpu": self.cpu.waiting,
+            "locked_projects": sorted(
+                f"{project or '.'}:{kind}"
+                for (kind, project), lock in self._locks.items()
+                if lock.locked()
+            ),
+            "classes": {name: metrics.as_dict() for name, metrics in self._metrics.items()},
+        }
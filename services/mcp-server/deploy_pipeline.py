@@ -0,0 +1,236 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           DEPLOY PIPELINE                                     ║
+║  Dependency-ordered steps with timing, state and resume       ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Backs full_deploy_pipeline:
+- A pipeline is a set of named steps, each listing the steps it needs;
+  a step starts as soon as all of them have succeeded, so independent
+  steps (build and lint) run concurrently
+- A step may declare an inputs fingerprint; when it succeeded with the
+  same fingerprint last time it is skipped and its previous result is
+  reused, so a re-run after a failed push picks up at the push
+- A failed step blocks everything that depends on it; every step
+  records its wall time
+- Step state is persisted per pipeline as JSON in the cache directory
+"""
+
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Step:
+    name: str
+    run: Callable[[], Awaitable[dict]]  # Returns a result dict with "success"
+    needs: tuple[str, ...] = ()
+    # Fingerprint of what the step depends on; None = always run
+    inputs: Optional[Callable[[], Awaitable[str]]] = None
+
+
+def validate(steps: list[Step]):
+    """Raise ValueError on duplicate names, unknown dependencies or cycles."""
+    by_name = {}
+    for step in steps:
+        if step.name in by_name:
+            raise ValueError(f"Duplicate step: {step.name}")
+        by_name[step.name] = step
+    for step in steps:
+        for need in step.needs:
+            if need not in by_name:
+                raise ValueError(f"Step {step.name} needs unknown step {need}")
+
+    visiting, done = set(), set()
+
+    def visit(name: str):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle through {name}")
+        visiting.add(name)
+        for need in by_name[name].needs:
+            visit(need)
+        visiting.discard(name)
+        done.add(name)
+
+    for step in steps:
+        visit(step.name)
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds")
+
+
+class PipelineStore:
+    """Last outcome of every step of every pipeline, one JSON file per pipeline."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.json"
+
+    def load(self, key: str) -> dict:
+        try:
+            state = json.loads(self._path(key).read_text("utf-8"))
+            if state.get("key") == key:
+                return state
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Pipeline state for {key} unreadable, starting fresh: {e}")
+        return {"key": key, "steps": {}}
+
+    def save(self, key: str, state: dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(state), "utf-8")
+        tmp_path.replace(path)
+
+    def count(self) -> int:
+        try:
+            return sum(1 for _ in self.root.glob("*.json"))
+        except OSError:
+            return 0
+
+
+class PipelineRunner:
+    """Runs step graphs; one run per pipeline key at a time."""
+
+    def __init__(self, store: PipelineStore):
+        self.store = store
+        self._locks: dict[str, asyncio.Lock] = {}
+        self.runs = 0
+        self.skipped_steps = 0
+
+    async def run(self, key: str, steps: list[Step], force: bool = False) -> dict:
+        """
+        Run steps in dependency order. Returns success, one record per step
+        (in declaration order: status succeeded / failed / skipped / blocked,
+        seconds and the step's result), failed_at / error for the first
+        failure and elapsed_seconds.
+        """
+        validate(steps)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            return await self._run(key, steps, force)
+
+    async def _run(self, key: str, steps: list[Step], force: bool) -> dict:
+        started = time.perf_counter()
+        state = self.store.load(key)
+        previous = state["steps"]
+        records: dict[str, dict] = {}
+        finished = {step.name: asyncio.Event() for step in steps}
+
+        async def execute(step: Step):
+            try:
+                for need in step.needs:
+                    await finished[need].wait()
+                blocked_by = [
+                    need
+                    for need in step.needs
+                    if records[need]["status"] in ("failed", "blocked")
+                ]
+                if blocked_by:
+                    records[step.name] = {
+                        "step": step.name,
+                        "status": "blocked",
+                        "success": False,
+                        "blocked_by": blocked_by,
+                        "seconds": 0.0,
+                    }
+                    return
+                records[step.name] = await self._execute(step, previous.get(step.name), force)
+                previous[step.name] = {
+                    name: value for name, value in records[step.name].items() if name != "step"
+                }
+            finally:
+                finished[step.name].set()
+
+        await asyncio.gather(*(execute(step) for step in steps))
+        self.runs += 1
+        state["last_run"] = time.time()
+        self.store.save(key, state)
+
+        # Fingerprints and raw timestamps are only needed by the next run
+        ordered = [
+            {
+                name: value
+                for name, value in records[step.name].items()
+                if name not in ("fingerprint", "finished_at")
+            }
+            for step in steps
+        ]
+        failed = next((record for record in ordered if record["status"] == "failed"), None)
+        result = {
+            "success": failed is None,
+            "steps": ordered,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }
+        if failed:
+            result["failed_at"] = failed["step"]
+            result["error"] = failed.get("error") or failed.get("message") or "Step failed"
+        return result
+
+    async def _execute(self, step: Step, last: Optional[dict], force: bool) -> dict:
+        started = time.perf_counter()
+        fingerprint = None
+        try:
+            if step.inputs is not None:
+                fingerprint = await step.inputs()
+            if (
+                not force
+                and fingerprint is not None
+                and last is not None
+                and last.get("status") in ("succeeded", "skipped")
+                and last.get("fingerprint") == fingerprint
+            ):
+                self.skipped_steps += 1
+                reused = {
+                    name: value
+                    for name, value in last.items()
+                    if name not in ("status", "seconds", "reason", "last_ran_seconds")
+                }
+                return {
+                    **reused,
+                    "step": step.name,
+                    "status": "skipped",
+                    "reason": f"inputs unchanged since {_iso(last['finished_at'])}",
+                    "last_ran_seconds": last.get("last_ran_seconds", last.get("seconds")),
+                    "seconds": round(time.perf_counter() - started, 3),
+                }
+            result = await step.run()
+        except Exception as e:
+            logger.exception(f"Pipeline step {step.name} raised")
+            result = {"success": False, "error": str(e)}
+
+        seconds = round(time.perf_counter() - started, 3)
+        success = bool(result.get("success"))
+        return {
+            **result,
+            "step": step.name,
+            "status": "succeeded" if success else "failed",
+            "success": success,
+            "seconds": seconds,
+            "last_ran_seconds": seconds,
+            "fingerprint": fingerprint,
+            "finished_at": time.time(),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "stored_pipelines": self.store.count(),
+            "runs": self.runs,
+            "skipped_steps": self.skipped_steps,
+        }
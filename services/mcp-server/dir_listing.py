@@ -0,0 +1,166 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           PAGINATED DIRECTORY LISTING                         ║
+║  Sorted, cursor-based listing with cached directory metadata  ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Backs list_files so that paging through a big tree only costs the page:
+- Directory contents (names + types, sorted) are cached per directory and
+  invalidated when the directory's mtime changes
+- Entries stream in a stable order: folders first, then files, and in
+  recursive mode each folder is followed by its own contents
+- A cursor is the sort key of the last returned entry; the next page
+  descends straight to it instead of re-listing everything before it
+- File size/mtime are only stat'ed for entries on the returned page
+"""
+
+import os
+import json
+import base64
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from workspace_walker import PathMatcher, relative_ignores
+
+# (is_file, name): folders sort before files, then by name
+SortKey = tuple[int, str]
+
+
+class DirectoryCache:
+    """Sorted children of directories, invalidated by directory mtime."""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[int, list[tuple[str, bool, bool]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def children(self, dir_path: str) -> list[tuple[str, bool, bool]]:
+        """
+        Sorted (name, is_dir, is_symlink) children of a directory.
+        Raises OSError if the directory cannot be read.
+        """
+        mtime_ns = os.stat(dir_path).st_mtime_ns
+        with self._lock:
+            cached = self._entries.get(dir_path)
+            if cached and cached[0] == mtime_ns:
+                self._entries.move_to_end(dir_path)
+                return cached[1]
+
+        children = []
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if not is_dir and not entry.is_file():
+                        continue
+                    children.append((entry.name, is_dir, entry.is_symlink()))
+                except OSError:
+                    continue
+        children.sort(key=lambda child: (0 if child[1] else 1, child[0]))
+
+        with self._lock:
+            self._entries[dir_path] = (mtime_ns, children)
+            self._entries.move_to_end(dir_path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return children
+
+    def invalidate(self, dir_path: Optional[str] = None):
+        """Drop one directory (or everything) from the cache."""
+        with self._lock:
+            if dir_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(dir_path, None)
+
+
+def encode_cursor(listing_path: str, key_path: list[SortKey]) -> str:
+    payload = json.dumps({"p": listing_path, "k": key_path}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, listing_path: str) -> list[SortKey]:
+    """Sort-key path stored in a cursor; ValueError if it is invalid."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        key_path = [(int(is_file), str(name)) for is_file, name in payload["k"]]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if payload.get("p") != listing_path:
+        raise ValueError("Cursor belongs to a different listing")
+    return key_path
+
+
+class DirectoryLister:
+    """Streams sorted listings of workspace folders from the cache."""
+
+    def __init__(
+        self,
+        root: Path,
+        matcher: PathMatcher,
+        cache: DirectoryCache,
+        ignore: Iterable[Path] = (),
+    ):
+        self.root = Path(root)
+        self.matcher = matcher
+        self.cache = cache
+        self.ignore = relative_ignores(self.root, ignore)
+
+    def iter_entries(
+        self,
+        start: Path,
+        recursive: bool,
+        after: Optional[list[SortKey]] = None,
+    ) -> Iterator[tuple[str, bool, str, list[SortKey], bool]]:
+        """
+        Yield (relative_path, is_dir, absolute_path, key_path, is_symlink)
+        in listing order, starting strictly after the `after` key path.
+        Blocked folders and ignored paths are pruned and symlinked folders
+        are not followed.
+        """
+        rel_start = Path(start).relative_to(self.root)
+        base_parts = tuple(p.lower() for p in rel_start.parts)
+        base_rel = "" if not rel_start.parts else str(rel_start) + os.sep
+        yield from self._iter_dir(str(start), base_rel, base_parts, [], after, recursive)
+
+    def _iter_dir(self, dir_path, rel_prefix, lowered_parts, key_prefix, after, recursive):
+        try:
+            children = self.cache.children(dir_path)
+        except OSError:
+            return
+
+        depth = len(key_prefix)
+        bound = after[depth] if after and len(after) > depth else None
+
+        for name, is_dir, is_symlink in children:
+            key = (0 if is_dir else 1, name)
+            if bound is not None and key < bound:
+                continue
+
+            parts = lowered_parts + (name.lower(),)
+            if self.matcher.blocked_tail(parts):
+                continue
+
+            key_path = key_prefix + [key]
+            rel_path = rel_prefix + name
+            if rel_path in self.ignore:
+                continue
+            abs_path = os.path.join(dir_path, name)
+
+            if bound is not None and key == bound:
+                # The cursor entry itself or one of its ancestors: already
+                # returned, but its subtree may still hold later entries
+                if is_dir and recursive:
+                    deeper = after if len(after) > depth + 1 else None
+                    yield from self._iter_dir(
+                        abs_path, rel_path + os.sep, parts, key_path, deeper, recursive
+                    )
+                continue
+
+            yield rel_path, is_dir, abs_path, key_path, is_symlink
+            if is_dir and recursive:
+                yield from self._iter_dir(
+                    abs_path, rel_path + os.sep, parts, key_path, None, recursive
+                )
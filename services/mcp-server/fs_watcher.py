@@ -0,0 +1,556 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           FILESYSTEM WATCHER                                  ║
+║  Change journal + cache invalidation events                   ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Watches the workspace in a background thread so tools and clients can
+react to changes instead of re-walking everything:
+- inotify (via ctypes) on Linux; polling snapshot diff only on request
+  ("poll", or "auto" when inotify is missing or its watch limit reached)
+- Lost events (queue overflow, a folder that could not be watched)
+  rebuild the whole watch set before subscribers are told to re-walk
+- Blocked folders are never watched, blocked extensions never reported
+  (except to unfiltered subscribers such as the git status cache, which
+  also get to know which blocked folders exist)
+- Bursts of events are debounced and coalesced per path
+- Changes go to an in-memory journal (cursor-based, for changes_since)
+  and to subscribers (search index, directory cache, project catalog)
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from workspace_walker import PathMatcher, WorkspaceWalker, relative_ignores
+
+logger = logging.getLogger(__name__)
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_ONLYDIR
+    | IN_DONT_FOLLOW
+    | IN_EXCL_UNLINK
+)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Pending events are flushed at least this often, even during a burst
+MAX_FLUSH_DELAY = 1.0
+
+# Change event: {"seq", "type", "path", "is_dir", "time"}; type is one of
+# created / modified / deleted, or "overflow" when events were lost
+Subscriber = Callable[[list[dict]], None]
+
+
+class ChangeJournal:
+    """Ring buffer of change events addressed by '<epoch>-<seq>' cursors."""
+
+    def __init__(self, max_events: int = 10000):
+        self.epoch = f"{int(time.time()):x}"
+        self._events: deque = deque(maxlen=max_events)
+        self._seq = 0
+        self._reset_seq = 0  # Clients behind this must re-list
+        self._lock = threading.Lock()
+
+    @property
+    def cursor(self) -> str:
+        return f"{self.epoch}-{self._seq}"
+
+    def append(self, events: list[dict]) -> list[dict]:
+        with self._lock:
+            for event in events:
+                self._seq += 1
+                event["seq"] = self._seq
+                self._events.append(event)
+                if event["type"] == "overflow":
+                    self._reset_seq = self._seq
+        return events
+
+    def _position(self, reset: bool) -> dict:
+        return {"cursor": self.cursor, "changes": [], "reset": reset, "has_more": False}
+
+    def since(self, cursor: str, limit: int = 500) -> dict:
+        """
+        Changes after cursor. reset=True means events were lost (restart,
+        journal overflow or watcher overflow) and the client must re-list.
+        """
+        with self._lock:
+            if not cursor:
+                return self._position(reset=False)
+
+            epoch, _, seq_text = cursor.partition("-")
+            try:
+                seq = int(seq_text)
+            except ValueError:
+                seq = -1
+            oldest = self._events[0]["seq"] if self._events else self._seq + 1
+            if epoch != self.epoch or seq < 0 or seq > self._seq:
+                return self._position(reset=True)
+            if seq < oldest - 1 or seq < self._reset_seq:
+                return self._position(reset=True)
+
+            changes = []
+            for event in self._events:
+                if event["seq"] > seq:
+                    changes.append(event)
+                    if len(changes) >= limit:
+                        break
+            next_seq = changes[-1]["seq"] if changes else seq
+            return {
+                "cursor": f"{self.epoch}-{next_seq}",
+                "changes": changes,
+                "reset": False,
+                "has_more": next_seq < self._seq,
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"events": len(self._events), "cursor": self.cursor}
+
+
+def _coalesce(pending: dict, rel_path: str, change: str, is_dir: bool):
+    """Merge a new event for rel_path into the pending (not yet flushed) set."""
+    previous = pending.get(rel_path)
+    if previous is None:
+        pending[rel_path] = (change, is_dir)
+        return
+    before = previous[0]
+    if before == "created" and change == "modified":
+        return
+    if before == "created" and change == "deleted":
+        del pending[rel_path]  # Never visible to anyone
+        return
+    if before == "deleted" and change == "created":
+        pending[rel_path] = ("modified", is_dir)
+        return
+    pending[rel_path] = (change, is_dir)
+
+
+class _Inotify:
+    """Minimal ctypes binding for inotify."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self) -> Iterable[tuple[int, int, str]]:
+        """Yield (wd, mask, name) for everything currently queued."""
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            yield wd, mask, os.fsdecode(name)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """Background workspace watcher feeding a journal and subscribers."""
+
+    def __init__(
+        self,
+        root: Path,
+        matcher: PathMatcher,
+        walker: WorkspaceWalker,
+        ignore: Iterable[Path] = (),
+        journal_size: int = 10000,
+        poll_interval: float = 2.0,
+        debounce: float = 0.2,
+    ):
+        self.root = Path(root)
+        self.matcher = matcher
+        self.walker = walker
+        self.ignore = sorted(relative_ignores(self.root, ignore))
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.journal = ChangeJournal(journal_size)
+        self.backend: Optional[str] = None
+        self._subscribers: list[tuple[Subscriber, bool]] = []
+        # Blocked folders inside the workspace, whose contents go unwatched
+        self._blind_dirs: set[str] = set()
+        self._blind_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._poll_fallback = True
+
+    # ────────────────────────────────────────────────────────────
+    # Public API
+    # ────────────────────────────────────────────────────────────
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def subscribe(self, callback: Subscriber, unfiltered: bool = False):
+        """
+        Call callback(events) from the watcher thread for every flushed batch.
+        Unfiltered subscribers also get events for blocked paths in watched
+        folders (blocked extensions, blocked folders themselves; inotify only).
+        """
+        self._subscribers.append((callback, unfiltered))
+
+    def blind_dirs(self) -> list[str]:
+        """Workspace-relative blocked folders whose contents are not watched."""
+        with self._blind_lock:
+            return sorted(self._blind_dirs)
+
+    def start(self, backend: str = "auto") -> Optional[str]:
+        """
+        Start watching; backend is 'auto', 'inotify' or 'poll'. Returns the
+        backend used, or None when 'inotify' is unavailable ('auto' falls
+        back to polling instead, here and when the watch limit is reached).
+        """
+        if self.running:
+            return self.backend
+        inotify = None
+        if backend in ("auto", "inotify") and sys.platform.startswith("linux"):
+            try:
+                inotify = _Inotify()
+            except (OSError, AttributeError) as e:
+                logger.warning(f"inotify unavailable: {e}")
+        if inotify is None and backend == "inotify":
+            logger.info("File watcher not started (no inotify; set MCP_WATCH=poll to poll)")
+            return None
+        self._poll_fallback = backend == "auto"
+        self._stop.clear()
+        if inotify is not None:
+            self.backend = "inotify"
+            target = lambda: self._run_inotify(inotify)
+        else:
+            self.backend = "poll"
+            target = self._run_poll
+        self._thread = threading.Thread(target=target, daemon=True, name="fs-watcher")
+        self._thread.start()
+        logger.info(f"File watcher started ({self.backend})")
+        return self.backend
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def stats(self) -> dict:
+        with self._blind_lock:
+            blind = len(self._blind_dirs)
+        return {
+            "backend": self.backend,
+            "running": self.running,
+            "unwatched_folders": blind,
+            **self.journal.stats(),
+        }
+
+    # ────────────────────────────────────────────────────────────
+    # Filtering / dispatch
+    # ────────────────────────────────────────────────────────────
+
+    def _ignored(self, rel_path: str) -> bool:
+        return any(rel_path == p or rel_path.startswith(p + os.sep) for p in self.ignore)
+
+    def _reportable(self, rel_path: str, is_dir: bool) -> bool:
+        parts = tuple(p.lower() for p in Path(rel_path).parts)
+        if not parts or self.matcher.blocked_folder(parts):
+            return False
+        if not is_dir and self.matcher.extension_blocked(parts[-1]):
+            return False
+        return not self._ignored(rel_path)
+
+    def _flush(self, pending: dict, overflow: bool = False, hidden: Optional[dict] = None):
+        if not pending and not hidden and not overflow:
+            return
+        now = time.strftime("%Y-%m-%dT%H:%M:%S")
+        events = [
+            {"type": change, "path": rel_path, "is_dir": is_dir, "time": now}
+            for rel_path, (change, is_dir) in sorted(pending.items())
+        ]
+        if overflow:
+            events.append({"type": "overflow", "path": "", "is_dir": True, "time": now})
+        pending.clear()
+        self.journal.append(events)
+        # Blocked paths: not journaled, only for unfiltered subscribers
+        blocked = [
+            {"type": change, "path": rel_path, "is_dir": is_dir, "time": now}
+            for rel_path, (change, is_dir) in sorted((hidden or {}).items())
+        ]
+        if hidden:
+            hidden.clear()
+        for callback, unfiltered in self._subscribers:
+            batch = events + blocked if unfiltered else events
+            if not batch:
+                continue
+            try:
+                callback(batch)
+            except Exception as e:
+                logger.warning(f"File watcher subscriber failed: {e}")
+
+    def _add_blind(self, rel_dir: str):
+        with self._blind_lock:
+            self._blind_dirs.add(rel_dir)
+
+    def _forget_blind(self, rel_dir: str):
+        prefix = rel_dir + os.sep
+        with self._blind_lock:
+            self._blind_dirs = {
+                p for p in self._blind_dirs if p != rel_dir and not p.startswith(prefix)
+            }
+
+    def _blocked_event(self, hidden: dict, rel_path: str, mask: int, is_dir: bool):
+        """Record an inotify event on a blocked path for unfiltered subscribers."""
+        if mask & (IN_CREATE | IN_MOVED_TO):
+            change = "created"
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            change = "deleted"
+        elif mask & (IN_MODIFY | IN_CLOSE_WRITE) and not is_dir:
+            change = "modified"
+        else:
+            return
+        if is_dir:  # A blocked folder appearing or going away
+            if change == "created":
+                self._add_blind(rel_path)
+            else:
+                self._forget_blind(rel_path)
+        _coalesce(hidden, rel_path, change, is_dir)
+
+    # ────────────────────────────────────────────────────────────
+    # Polling backend
+    # ────────────────────────────────────────────────────────────
+
+    def _snapshot(self) -> dict[str, tuple[bool, int, int]]:
+        state = {}
+        for rel_path, entry in self.walker.walk(include_dirs=True):
+            if self._ignored(rel_path):
+                continue
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            state[rel_path] = (is_dir, 0 if is_dir else stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def _run_poll(self):
+        previous = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            try:
+                current = self._snapshot()
+            except Exception as e:
+                logger.warning(f"File watcher poll failed: {e}")
+                continue
+            pending: dict = {}
+            for rel_path, info in current.items():
+                before = previous.get(rel_path)
+                if before is None:
+                    pending[rel_path] = ("created", info[0])
+                elif before != info and not info[0]:
+                    pending[rel_path] = ("modified", False)
+            for rel_path, info in previous.items():
+                if rel_path not in current:
+                    pending[rel_path] = ("deleted", info[0])
+            previous = current
+            self._flush(pending)
+
+    # ────────────────────────────────────────────────────────────
+    # inotify backend
+    # ────────────────────────────────────────────────────────────
+
+    def _watch_tree(
+        self, inotify: _Inotify, watches: dict, rel_dir: str, pending: Optional[dict]
+    ):
+        """
+        Watch rel_dir and every folder below it. When pending is given
+        (a folder that appeared while running), its existing contents
+        are reported as created since their own events were missed.
+
+        Each folder is watched before it is listed (the walk is lazy and
+        lists a folder only after yielding it), so anything created in
+        between shows up either as an event or in the listing.
+        """
+
+        def watch(rel_path: str):
+            abs_path = str(self.root / rel_path) if rel_path else str(self.root)
+            wd = inotify.add_watch(abs_path, WATCH_MASK)
+            watches[wd] = rel_path
+
+        watch(rel_dir)
+        start = self.root / rel_dir if rel_dir else self.root
+        for rel_path, entry in self.walker.walk(
+            start, include_dirs=True, on_pruned=self._add_blind
+        ):
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if self._ignored(rel_path):
+                continue
+            if is_dir:
+                watch(rel_path)
+            if pending is not None and self._reportable(rel_path, is_dir):
+                _coalesce(pending, rel_path, "created", is_dir)
+
+    def _unwatch_tree(self, inotify: _Inotify, watches: dict, rel_dir: str):
+        self._forget_blind(rel_dir)
+        prefix = rel_dir + os.sep
+        for wd, rel_path in list(watches.items()):
+            if rel_path == rel_dir or rel_path.startswith(prefix):
+                inotify.rm_watch(wd)
+                watches.pop(wd, None)
+
+    def _watch_all(self, inotify: _Inotify, watches: dict) -> bool:
+        """Build the watch set from scratch; False when the watch limit is reached."""
+        watches.clear()
+        with self._blind_lock:
+            self._blind_dirs.clear()
+        try:
+            self._watch_tree(inotify, watches, "", None)
+        except OSError as e:
+            if e.errno in (errno.ENOSPC, errno.EMFILE):
+                logger.warning(
+                    "inotify watch limit reached (raise fs.inotify.max_user_watches); "
+                    + ("falling back to polling" if self._poll_fallback else "watcher stopped")
+                )
+                return False
+            raise
+        logger.info(f"File watcher watching {len(watches)} folders")
+        return True
+
+    def _without_inotify(self):
+        """Watch limit reached: poll from now on ('auto') or stop watching."""
+        if self._poll_fallback:
+            self.backend = "poll"
+            self._run_poll()
+
+    def _run_inotify(self, inotify: _Inotify):
+        watches: dict[int, str] = {}
+        try:
+            if not self._watch_all(inotify, watches):
+                inotify.close()
+                inotify = None
+                self._without_inotify()
+                return
+
+            pending: dict = {}
+            hidden: dict = {}  # Events on blocked paths
+            last_event = first_event = 0.0
+            while not self._stop.is_set():
+                ready, _, _ = select.select([inotify.fd], [], [], self.debounce)
+                overflow = False
+                if ready:
+                    if not pending and not hidden:
+                        first_event = time.monotonic()
+                    for wd, mask, name in inotify.read_events():
+                        if mask & IN_Q_OVERFLOW:
+                            overflow = True
+                            continue
+                        if mask & IN_IGNORED:
+                            watches.pop(wd, None)
+                            continue
+                        parent = watches.get(wd)
+                        if parent is None or not name:
+                            continue
+                        rel_path = os.path.join(parent, name) if parent else name
+                        is_dir = bool(mask & IN_ISDIR)
+                        if not self._reportable(rel_path, is_dir):
+                            if not self._ignored(rel_path):
+                                self._blocked_event(hidden, rel_path, mask, is_dir)
+                            continue
+
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            _coalesce(pending, rel_path, "created", is_dir)
+                            if is_dir:
+                                try:
+                                    self._watch_tree(inotify, watches, rel_path, pending)
+                                except OSError as e:
+                                    logger.warning(f"Cannot watch {rel_path}: {e}")
+                                    overflow = True
+                        elif mask & (IN_DELETE | IN_MOVED_FROM):
+                            _coalesce(pending, rel_path, "deleted", is_dir)
+                            if is_dir and mask & IN_MOVED_FROM:
+                                self._unwatch_tree(inotify, watches, rel_path)
+                        elif mask & (IN_MODIFY | IN_CLOSE_WRITE) and not is_dir:
+                            _coalesce(pending, rel_path, "modified", False)
+                    last_event = time.monotonic()
+
+                now = time.monotonic()
+                if overflow:
+                    # Events (or folders) were missed: start over with a fresh
+                    # watch set, then let subscribers re-walk from there
+                    rewatched = False
+                    try:
+                        inotify.close()
+                        inotify = None
+                        inotify = _Inotify()
+                        rewatched = self._watch_all(inotify, watches)
+                    finally:
+                        self._flush(pending, overflow=True, hidden=hidden)
+                    if not rewatched:
+                        inotify.close()
+                        inotify = None
+                        self._without_inotify()
+                        return
+                elif (pending or hidden) and (
+                    now - last_event >= self.debounce or now - first_event >= MAX_FLUSH_DELAY
+                ):
+                    self._flush(pending, hidden=hidden)
+        except Exception as e:
+            logger.error(f"File watcher stopped: {e}")
+        finally:
+            if inotify is not None:
+                inotify.close()
@@ -0,0 +1,604 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           GIT BACKEND                                         ║
+║  Cached repository handles with a persistent cat-file         ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Backs git_status / git_log without going through run_command:
+- One handle per repository (top-level folder), kept in an LRU; git
+  runs with argument lists, never through a shell
+- Each handle owns a long-lived `git cat-file --batch` process; git_log
+  resolves the start revision and walks parents through it (newest
+  commit date first, like `git log`), and parsed commits are cached
+  since commit objects never change
+- `git status --porcelain=v2 --branch -z` is parsed into structured
+  entries; the result is cached until the file watcher reports a change
+  inside the repository or .git/index / HEAD change on disk (callers only
+  trust it when unwatched folders are ones git ignores anyway)
+- Diffs are summarized with `--numstat` and paged hunk by hunk: the
+  patch is read line by line as git writes it, and git is stopped as
+  soon as the page's byte budget is used
+"""
+
+import os
+import re
+import json
+import heapq
+import base64
+import hashlib
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Repository handles (and cat-file processes) kept open
+MAX_REPOS = 32
+
+# Parsed commits cached per repository
+MAX_CACHED_COMMITS = 5000
+
+GIT_TIMEOUT = 60
+
+
+class GitError(Exception):
+    """A git command failed; the message is git's stderr."""
+
+
+def run_git(cwd: Path, *args: str, timeout: float = GIT_TIMEOUT) -> str:
+    result = subprocess.run(
+        ["git", *args],
+        cwd=str(cwd),
+        capture_output=True,
+        timeout=timeout,
+    )
+    if result.returncode != 0:
+        raise GitError(result.stderr.decode("utf-8", errors="replace").strip())
+    return result.stdout.decode("utf-8", errors="surrogateescape")
+
+
+# ════════════════════════════════════════════════════════════
+# Parsing
+# ════════════════════════════════════════════════════════════
+
+
+def _status_code(xy: str) -> str:
+    """Porcelain v2 XY ("M.", ".D") to the familiar v1 form ("M ", " D")."""
+    return xy.replace(".", " ")
+
+
+def parse_status_v2(output: str) -> dict:
+    """Parse `git status --porcelain=v2 --branch -z`."""
+    branch = {"head": None, "oid": None, "upstream": None, "ahead": 0, "behind": 0}
+    entries = []
+    fields = output.split("\0")
+    i = 0
+    while i < len(fields):
+        record = fields[i]
+        i += 1
+        if not record:
+            continue
+        kind = record[0]
+        if kind == "#":
+            _, key, *value = record.split(" ")
+            if key == "branch.oid":
+                branch["oid"] = None if value[0] == "(initial)" else value[0]
+            elif key == "branch.head":
+                branch["head"] = None if value[0] == "(detached)" else value[0]
+            elif key == "branch.upstream":
+                branch["upstream"] = value[0]
+            elif key == "branch.ab":
+                branch["ahead"] = int(value[0])
+                branch["behind"] = -int(value[1])
+        elif kind == "1":
+            parts = record.split(" ", 8)
+            entries.append(
+                {"status": _status_code(parts[1]), "file": parts[8], "kind": "changed"}
+            )
+        elif kind == "2":
+            parts = record.split(" ", 9)
+            entries.append(
+                {
+                    "status": _status_code(parts[1]),
+                    "file": parts[9],
+                    "orig_file": fields[i],  # -z puts the source path in its own field
+                    "kind": "renamed" if parts[8].startswith("R") else "copied",
+                }
+            )
+            i += 1
+        elif kind == "u":
+            parts = record.split(" ", 10)
+            entries.append(
+                {"status": _status_code(parts[1]), "file": parts[10], "kind": "unmerged"}
+            )
+        elif kind == "?":
+            entries.append({"status": "??", "file": record[2:], "kind": "untracked"})
+        elif kind == "!":
+            entries.append({"status": "!!", "file": record[2:], "kind": "ignored"})
+    return {"branch": branch, "entries": entries}
+
+
+def _parse_signature(value: str) -> dict:
+    """'Name <email> 1700000000 +0700' -> name, email, ISO date."""
+    name_email, _, stamp = value.rpartition("> ")
+    name, _, email = name_email.partition(" <")
+    seconds, _, offset = stamp.partition(" ")
+    try:
+        sign = -1 if offset.startswith("-") else 1
+        tz = timezone(sign * timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5])))
+        date = datetime.fromtimestamp(int(seconds), tz).isoformat()
+        timestamp = int(seconds)
+    except (ValueError, IndexError):
+        date, timestamp = None, 0
+    return {"name": name, "email": email, "date": date, "timestamp": timestamp}
+
+
+def parse_commit(sha: str, raw: bytes) -> dict:
+    text = raw.decode("utf-8", errors="replace")
+    header, _, message = text.partition("\n\n")
+    parents, author, committer = [], None, None
+    for line in header.split("\n"):
+        if line.startswith(" "):
+            continue  # Continuation (gpgsig, mergetag)
+        key, _, value = line.partition(" ")
+        if key == "parent":
+            parents.append(value)
+        elif key == "author":
+            author = _parse_signature(value)
+        elif key == "committer":
+            committer = _parse_signature(value)
+    subject, _, body = message.partition("\n")
+    return {
+        "sha": sha,
+        "short_sha": sha[:7],
+        "parents": parents,
+        "author": author["name"] if author else None,
+        "author_email": author["email"] if author else None,
+        "date": author["date"] if author else None,
+        "committer": committer["name"] if committer else None,
+        "committed_at": committer["date"] if committer else None,
+        "_timestamp": committer["timestamp"] if committer else 0,
+        "subject": subject.strip(),
+        "body": body.strip(),
+    }
+
+
+# ════════════════════════════════════════════════════════════
+# Diffs
+# ════════════════════════════════════════════════════════════
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def diff_args(staged: bool, ref: str) -> list[str]:
+    """Options shared by the numstat and patch runs, so both list files in the same order."""
+    if ref.startswith("-") or "\n" in ref:
+        raise ValueError(f"Invalid ref: {ref}")
+    args = ["--no-color", "--no-ext-diff", "--find-renames"]
+    if staged:
+        args.append("--cached")
+    if ref:
+        args.append(ref)
+    return args
+
+
+def parse_numstat(output: str) -> list[dict]:
+    """Parse `git diff --numstat -z`."""
+    files = []
+    fields = output.split("\0")
+    i = 0
+    while i < len(fields):
+        record = fields[i]
+        i += 1
+        if not record:
+            continue
+        added, deleted, path = record.split("\t", 2)
+        entry = {
+            "file": path,
+            "added": None if added == "-" else int(added),
+            "deleted": None if deleted == "-" else int(deleted),
+            "binary": added == "-",
+        }
+        if not path:  # Rename or copy: source and destination follow
+            entry["orig_file"], entry["file"] = fields[i], fields[i + 1]
+            i += 2
+        files.append(entry)
+    return files
+
+
+def diff_fingerprint(
+    args: list[str], context_lines: int, pathspec: list[str], numstat: str
+) -> str:
+    """Identifies one diff and its hunk boundaries (which depend on the context size)."""
+    key = args + [f"-U{context_lines}", "--"] + pathspec
+    digest = hashlib.sha1("\0".join(key).encode("utf-8"))
+    digest.update(numstat.encode("utf-8", errors="surrogateescape"))
+    return digest.hexdigest()[:16]
+
+
+def encode_diff_cursor(fingerprint: str, position: tuple[int, int, int]) -> str:
+    file_index, hunk_index, line = position
+    payload = json.dumps({"d": fingerprint, "f": file_index, "h": hunk_index, "l": line})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_diff_cursor(cursor: str, fingerprint: str) -> tuple[int, int, int]:
+    """
+    (file index, hunk index, line within the hunk) stored in a cursor;
+    ValueError if it is invalid or stale.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        position = (int(payload["f"]), int(payload["h"]), int(payload.get("l", 0)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if payload.get("d") != fingerprint:
+        raise ValueError("The diff changed since this cursor was issued; start again")
+    return position
+
+
+def _new_hunk(file_index: int, hunk_index: int, header: str) -> dict:
+    match = _HUNK_HEADER.match(header)
+    old_start, old_lines, new_start, new_lines = match.groups() if match else (0, 1, 0, 1)
+    return {
+        "file_index": file_index,
+        "hunk_index": hunk_index,
+        "header": header,
+        "old_start": int(old_start),
+        "old_lines": int(1 if old_lines is None else old_lines),
+        "new_start": int(new_start),
+        "new_lines": int(1 if new_lines is None else new_lines),
+        "_lines": [],
+        "_bytes": 0,
+    }
+
+
+def read_diff_page(
+    cwd: Path,
+    args: list[str],
+    context_lines: int,
+    pathspec: list[str],
+    start: tuple[int, int, int],
+    max_bytes: int,
+) -> tuple[list[dict], Optional[tuple[int, int, int]]]:
+    """
+    Hunks of `git diff <args> -U<context_lines> -- <pathspec>` from start
+    (file index, hunk index, line within the hunk) on, until about max_bytes
+    of hunk text. A first hunk larger than the budget is split: the page
+    ends with its head flagged "truncated" and the next position points
+    inside it, and the piece that resumes it carries "line_offset". Returns
+    (hunks, position to continue from or None at the end).
+    """
+    process = subprocess.Popen(
+        ["git", "diff", *args, f"-U{context_lines}", "--", *pathspec],
+        cwd=str(cwd),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    hunks: list[dict] = []
+    used = 0
+    file_index = hunk_index = -1
+    current: Optional[dict] = None  # Hunk being read, None outside a wanted hunk
+    line_index = 0  # Body lines of the current hunk seen so far
+
+    def finish(hunk: dict):
+        nonlocal used
+        hunk["diff"] = "".join(hunk.pop("_lines"))
+        used += hunk.pop("_bytes")
+        hunks.append(hunk)
+
+    try:
+        for raw in process.stdout:
+            line = raw.decode("utf-8", errors="replace")
+            if line.startswith("diff --git "):
+                if current is not None:
+                    finish(current)
+                    current = None
+                file_index += 1
+                hunk_index = -1
+                continue
+            if line.startswith("@@ "):
+                if current is not None:
+                    finish(current)
+                    current = None
+                hunk_index += 1
+                if (file_index, hunk_index) < start[:2]:
+                    continue
+                if hunks and used >= max_bytes:
+                    return hunks, (file_index, hunk_index, 0)
+                current = _new_hunk(file_index, hunk_index, line.rstrip("\n"))
+                line_index = 0
+                if (file_index, hunk_index) == start[:2] and start[2]:
+                    current["line_offset"] = start[2]
+                continue
+            if current is None or hunk_index < 0:
+                continue  # File header lines, or a hunk before start
+            line_index += 1
+            if line_index <= current.get("line_offset", 0):
+                continue  # Sent on an earlier page
+            size = len(raw)
+            if used + current["_bytes"] + size > max_bytes and (hunks or current["_lines"]):
+                position = (current["file_index"], current["hunk_index"], 0)
+                if not hunks:
+                    # Oversized hunk: send its head, the rest starts the next page
+                    current["truncated"] = True
+                    position = position[:2] + (line_index - 1,)
+                    finish(current)
+                # Otherwise it doesn't fit and starts the next page whole
+                return hunks, position
+            current["_lines"].append(line)
+            current["_bytes"] += size
+        if current is not None:
+            finish(current)
+        return hunks, None
+    finally:
+        if process.poll() is None:
+            process.kill()  # Stop git instead of draining the rest of the patch
+        process.stdout.close()
+        process.wait()
+
+
+# ════════════════════════════════════════════════════════════
+# Repository handle
+# ════════════════════════════════════════════════════════════
+
+
+class CatFile:
+    """A `git cat-file --batch` process answering object lookups."""
+
+    def __init__(self, repo_root: Path):
+        self.repo_root = repo_root
+        self._process: Optional[subprocess.Popen] = None
+
+    def _ensure(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                cwd=str(self.repo_root),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self._process
+
+    def read(self, revision: str) -> Optional[tuple[str, str, bytes]]:
+        """(sha, type, content) or None if the revision does not exist."""
+        if "\n" in revision:
+            raise ValueError("Invalid revision")
+        for attempt in range(2):
+            process = self._ensure()
+            try:
+                process.stdin.write(revision.encode("utf-8") + b"\n")
+                process.stdin.flush()
+                header = process.stdout.readline().decode("utf-8", errors="replace").split()
+                if len(header) != 3:
+                    return None  # "<rev> missing" / "<rev> ambiguous"
+                sha, kind, size = header
+                content = process.stdout.read(int(size))
+                process.stdout.read(1)  # Trailing newline
+                return sha, kind, content
+            except (BrokenPipeError, OSError, ValueError):
+                self.close()
+                if attempt:
+                    raise
+        return None
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def close(self):
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+            self._process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            self._process.kill()
+        self._process = None
+
+
+class GitRepo:
+    """Cached state of one repository."""
+
+    def __init__(self, root: Path, git_dir: Path):
+        self.root = root
+        self.git_dir = git_dir
+        self.cat_file = CatFile(root)
+        self._lock = threading.Lock()
+        self._commits: OrderedDict[str, dict] = OrderedDict()
+        self._status: Optional[tuple[int, tuple, dict]] = None  # (generation, stamp, result)
+        self.generation = 0
+        self._ignored: Optional[tuple[tuple, bool]] = None  # (key, result)
+        self.status_hits = 0
+        self.status_misses = 0
+
+    def _stamp(self) -> tuple:
+        """Cheap fingerprint of what git itself changes: index, HEAD, current ref."""
+        stamp = []
+        for name in ("index", "HEAD", "packed-refs"):
+            try:
+                stat = (self.git_dir / name).stat()
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamp.append(None)
+        try:
+            head = (self.git_dir / "HEAD").read_text("utf-8").strip()
+            if head.startswith("ref: "):
+                stat = (self.git_dir / head[5:]).stat()
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            stamp.append(None)
+        return tuple(stamp)
+
+    def status(self, trust_cache: bool) -> tuple[dict, bool]:
+        """(parsed status, served from cache)."""
+        stamp = self._stamp()
+        cached = self._status
+        if trust_cache and cached and cached[0] == self.generation and cached[1] == stamp:
+            self.status_hits += 1
+            return cached[2], True
+
+        generation = self.generation
+        output = run_git(
+            self.root,
+            "--no-optional-locks",
+            "status",
+            "--porcelain=v2",
+            "--branch",
+            "-z",
+            "--untracked-files=normal",
+        )
+        result = parse_status_v2(output)
+        self._status = (generation, stamp, result)
+        self.status_misses += 1
+        return result, False
+
+    def invalidate(self):
+        self.generation += 1
+
+    def ignores(self, folders: list[Path]) -> bool:
+        """
+        True when git ignores every folder and tracks nothing inside them,
+        so changes there can't show up in status. Cached like status.
+        """
+        if not folders:
+            return True
+        key = (self.generation, self._stamp(), tuple(folders))
+        cached = self._ignored
+        if cached and cached[0] == key:
+            return cached[1]
+        rel_paths = [folder.relative_to(self.root).as_posix() for folder in folders]
+        try:
+            ignored = set(run_git(self.root, "check-ignore", "--", *rel_paths).splitlines())
+            tracked = run_git(self.root, "ls-files", "-z", "--", *rel_paths)
+        except GitError:  # check-ignore exits 1 when nothing is ignored
+            ignored, tracked = set(), ""
+        result = ignored == set(rel_paths) and not tracked
+        self._ignored = (key, result)
+        return result
+
+    def _commit(self, revision: str) -> Optional[dict]:
+        commit = self._commits.get(revision)
+        if commit is not None:
+            self._commits.move_to_end(revision)
+            return commit
+        found = self.cat_file.read(revision)
+        if found is None:
+            return None
+        sha, kind, content = found
+        if kind == "tag":  # Annotated tag: follow to its commit
+            return self._commit(sha + "^{commit}")
+        if kind != "commit":
+            return None
+        commit = parse_commit(sha, content)
+        self._commits[sha] = commit
+        if len(self._commits) > MAX_CACHED_COMMITS:
+            self._commits.popitem(last=False)
+        return commit
+
+    def log(self, revision: str, count: int) -> list[dict]:
+        """Up to count commits reachable from revision, newest commit date first."""
+        with self._lock:
+            start = self._commit(revision)
+            if start is None:
+                raise GitError(f"Unknown revision: {revision}")
+            commits = []
+            seen = {start["sha"]}
+            heap = [(-start["_timestamp"], 0, start)]
+            order = 1
+            while heap and len(commits) < count:
+                _, _, commit = heapq.heappop(heap)
+                commits.append(commit)
+                for parent_sha in commit["parents"]:
+                    if parent_sha in seen:
+                        continue
+                    seen.add(parent_sha)
+                    parent = self._commit(parent_sha)
+                    if parent is not None:  # Shallow clones lack old parents
+                        heapq.heappush(heap, (-parent["_timestamp"], order, parent))
+                        order += 1
+        return [
+            {key: value for key, value in commit.items() if not key.startswith("_")}
+            for commit in commits
+        ]
+
+    def close(self):
+        with self._lock:
+            self.cat_file.close()
+
+
+class GitBackend:
+    """Registry of repository handles."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._repos: OrderedDict[str, GitRepo] = OrderedDict()
+        self._roots: dict[str, str] = {}  # folder -> repository root
+
+    def repo(self, path: Path) -> GitRepo:
+        """Handle of the repository containing path. Raises GitError outside a repository."""
+        folder = str(Path(path).resolve())
+        root = self._roots.get(folder)
+        if root is None:
+            output = run_git(
+                Path(folder), "rev-parse", "--show-toplevel", "--absolute-git-dir"
+            )
+            root_line, git_dir_line = output.strip().split("\n")[:2]
+            root = str(Path(root_line).resolve())
+            self._roots[folder] = root
+        else:
+            git_dir_line = None
+
+        with self._lock:
+            repo = self._repos.get(root)
+            if repo is None:
+                if git_dir_line is None:
+                    git_dir_line = run_git(Path(root), "rev-parse", "--absolute-git-dir")
+                    git_dir_line = git_dir_line.strip()
+                repo = GitRepo(Path(root), Path(git_dir_line))
+                self._repos[root] = repo
+                while len(self._repos) > MAX_REPOS:
+                    _, evicted = self._repos.popitem(last=False)
+                    evicted.close()
+            else:
+                self._repos.move_to_end(root)
+            return repo
+
+    def invalidate(self, paths: list[Path]):
+        """Drop cached status of repositories containing any of paths."""
+        with self._lock:
+            repos = list(self._repos.values())
+        for repo in repos:
+            root = str(repo.root)
+            prefix = root + os.sep
+            if any(str(path) == root or str(path).startswith(prefix) for path in paths):
+                repo.invalidate()
+
+    def invalidate_all(self):
+        with self._lock:
+            repos = list(self._repos.values())
+        for repo in repos:
+            repo.invalidate()
+
+    def close(self):
+        with self._lock:
+            repos = list(self._repos.values())
+            self._repos.clear()
+        for repo in repos:
+            repo.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            repos = list(self._repos.values())
+        return {
+            "repos": len(repos),
+            "cat_file_processes": sum(1 for repo in repos if repo.cat_file.running),
+            "status_cache_hits": sum(repo.status_hits for repo in repos),
+            "status_cache_misses": sum(repo.status_misses for repo in repos),
+        }
@@ -0,0 +1,487 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           GIT HISTORY                                         ║
+║  Persisted per-repository commit index for history queries    ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Backs git_history_query:
+- One SQLite file per repository: commits (author, dates, message) and
+  the paths each commit touched (`--name-status`, renames recorded as a
+  delete plus an add)
+- Updates are incremental: the ref tips seen last time are excluded
+  from the walk, so only commits added since are read from git; the walk
+  is streamed and written in one transaction
+- Commits left unreachable by an amend, rebase or deleted branch are
+  dropped, so results match what `git log --all` would show
+- Queries filter by path (file or folder), author, date range and
+  message text in SQL instead of re-walking history
+"""
+
+import os
+import time
+import codecs
+import hashlib
+import sqlite3
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from git_backend import GitError, run_git
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+# Repository databases kept open
+MAX_OPEN_REPOS = 16
+
+# Files listed per commit when the query has no path filter
+FILES_PER_COMMIT = 20
+
+_LOG_FORMAT = "--format=%x1e%H%x1f%an%x1f%ae%x1f%at%x1f%ct%x1f%s%x1f%b%x1f"
+
+# Commits inserted per executemany batch
+_BATCH_SIZE = 500
+
+
+def _iso(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def parse_log_record(record: str) -> Optional[tuple[tuple, list[tuple[str, str]]]]:
+    """One `git log` record in _LOG_FORMAT -> (commit row, [(status, path)])."""
+    head = record.split("\x1f", 6)
+    if len(head) != 7:
+        return None
+    sha, author, email, authored_at, committed_at, subject, rest = head
+    body, _, tail = rest.rpartition("\x1f")
+    tokens = [token.strip("\n") for token in tail.split("\0")]
+    tokens = [token for token in tokens if token]
+    changes = list(zip(tokens[0::2], tokens[1::2]))
+    row = (sha, author, email, int(authored_at), int(committed_at), subject, body.strip())
+    return row, changes
+
+
+class HistoryIndex:
+    """Commit index of one repository, stored in SQLite."""
+
+    def __init__(self, db_path: Path, repo_root: Path):
+        self.db_path = Path(db_path)
+        self.repo_root = Path(repo_root)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+        self._path_ids: dict[str, int] = {}
+        self.last_update: Optional[dict] = None
+
+    def _init_schema(self):
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self._db.executescript(
+                """
+                DROP TABLE IF EXISTS commits;
+                DROP TABLE IF EXISTS paths;
+                DROP TABLE IF EXISTS changes;
+                DROP TABLE IF EXISTS tips;
+                """
+            )
+        self._db.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS commits (
+                id INTEGER PRIMARY KEY,
+                sha TEXT NOT NULL UNIQUE,
+                author TEXT NOT NULL,
+                email TEXT NOT NULL,
+                authored_at INTEGER NOT NULL,
+                committed_at INTEGER NOT NULL,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS paths (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS changes (
+                commit_id INTEGER NOT NULL,
+                path_id INTEGER NOT NULL,
+                status TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS tips (
+                sha TEXT PRIMARY KEY
+            );
+            CREATE INDEX IF NOT EXISTS commits_committed_at ON commits (committed_at);
+            CREATE INDEX IF NOT EXISTS changes_path ON changes (path_id);
+            CREATE INDEX IF NOT EXISTS changes_commit ON changes (commit_id);
+            PRAGMA user_version = {SCHEMA_VERSION};
+            """
+        )
+        self._db.commit()
+
+    # ---------- Updates ----------
+
+    def _ref_tips(self) -> set[str]:
+        """Commits that branches, tags, remotes and HEAD point to."""
+        output = run_git(
+            self.repo_root,
+            "for-each-ref",
+            "--format=%(objecttype) %(objectname) %(*objecttype) %(*objectname)",
+        )
+        tips = set()
+        for line in output.splitlines():
+            parts = line.split()
+            if parts[:1] == ["commit"]:
+                tips.add(parts[1])
+            elif len(parts) == 4 and parts[2] == "commit":  # Annotated tag
+                tips.add(parts[3])
+        try:
+            tips.add(run_git(self.repo_root, "rev-parse", "--verify", "-q", "HEAD").strip())
+        except GitError:
+            pass  # No commits yet
+        return tips
+
+    def _existing(self, shas: set[str]) -> set[str]:
+        """Those of shas still present in the object store."""
+        if not shas:
+            return set()
+        result = subprocess.run(
+            ["git", "cat-file", "--batch-check=%(objectname) %(objecttype)"],
+            cwd=str(self.repo_root),
+            input="".join(f"{sha}\n" for sha in shas).encode("ascii"),
+            capture_output=True,
+            timeout=60,
+        )
+        found = set()
+        for line in result.stdout.decode("ascii", errors="replace").splitlines():
+            parts = line.split()
+            if len(parts) == 2 and parts[1] == "commit":
+                found.add(parts[0])
+        return found
+
+    def _path_id(self, path: str) -> int:
+        path_id = self._path_ids.get(path)
+        if path_id is None:
+            self._db.execute("INSERT OR IGNORE INTO paths (path) VALUES (?)", (path,))
+            path_id = self._db.execute(
+                "SELECT id FROM paths WHERE path = ?", (path,)
+            ).fetchone()[0]
+            self._path_ids[path] = path_id
+        return path_id
+
+    def _commit_ids(self, shas: list[str]) -> dict[str, int]:
+        placeholders = ",".join("?" * len(shas))
+        rows = self._db.execute(
+            f"SELECT sha, id FROM commits WHERE sha IN ({placeholders})", shas
+        )
+        return dict(rows.fetchall())
+
+    def _insert(self, batch: list[tuple[tuple, list[tuple[str, str]]]]) -> int:
+        # A branch tip that isn't a descendant of an indexed tip can reach
+        # commits indexed through another path; keep those rows as they are
+        existing = self._commit_ids([row[0] for row, _ in batch])
+        batch = [(row, changes) for row, changes in batch if row[0] not in existing]
+        if not batch:
+            return 0
+        self._db.executemany(
+            "INSERT INTO commits "
+            "(sha, author, email, authored_at, committed_at, subject, body) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [row for row, _ in batch],
+        )
+        ids = self._commit_ids([row[0] for row, _ in batch])
+        self._db.executemany(
+            "INSERT INTO changes (commit_id, path_id, status) VALUES (?, ?, ?)",
+            [
+                (ids[row[0]], self._path_id(path), status)
+                for row, changes in batch
+                for status, path in changes
+            ],
+        )
+        return len(batch)
+
+    def _walk(self, include: set[str], exclude: set[str]) -> int:
+        """Stream `git log` over include minus exclude into the tables."""
+        process = subprocess.Popen(
+            [
+                "git",
+                "-c",
+                "core.quotepath=off",
+                "log",
+                "--stdin",
+                "-z",
+                "--name-status",
+                "--no-renames",
+                _LOG_FORMAT,
+            ],
+            cwd=str(self.repo_root),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        revisions = [f"{sha}\n" for sha in include] + [f"^{sha}\n" for sha in exclude]
+        # git reads all of stdin before writing; a thread keeps large inputs from blocking
+        writer = threading.Thread(
+            target=self._feed, args=(process, "".join(revisions).encode("ascii"))
+        )
+        writer.start()
+
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+        batch = []
+        inserted = 0
+        for data in iter(lambda: process.stdout.read(1024 * 1024), b""):
+            records = (pending + decoder.decode(data)).split("\x1e")
+            pending = records.pop()
+            for record in records:
+                parsed = parse_log_record(record)
+                if parsed:
+                    batch.append(parsed)
+            if len(batch) >= _BATCH_SIZE:
+                inserted += self._insert(batch)
+                batch = []
+        parsed = parse_log_record(pending + decoder.decode(b"", final=True))
+        if parsed:
+            batch.append(parsed)
+        if batch:
+            inserted += self._insert(batch)
+
+        writer.join()
+        stderr = process.stderr.read().decode("utf-8", errors="replace").strip()
+        if process.wait() != 0:
+            raise GitError(stderr or f"git log exited with {process.returncode}")
+        return inserted
+
+    @staticmethod
+    def _feed(process: subprocess.Popen, data: bytes):
+        try:
+            process.stdin.write(data)
+            process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def _rev_list(self, include: set[str], exclude: set[str]) -> set[str]:
+        revisions = [f"{sha}\n" for sha in include] + [f"^{sha}\n" for sha in exclude]
+        result = subprocess.run(
+            ["git", "rev-list", "--stdin"],
+            cwd=str(self.repo_root),
+            input="".join(revisions).encode("ascii"),
+            capture_output=True,
+            timeout=300,
+        )
+        if result.returncode != 0:
+            raise GitError(result.stderr.decode("utf-8", errors="replace").strip())
+        return set(result.stdout.decode("ascii", errors="replace").split())
+
+    def _orphans(self, removed: set[str], present: set[str], tips: set[str]) -> set[str]:
+        """Indexed commits no longer reachable once the removed tips are gone."""
+        if not removed:
+            return set()
+        if removed <= present:
+            # Only what the old tips reached and the current ones don't
+            return self._rev_list(removed, tips)
+        # An old tip was garbage-collected: compare against everything reachable
+        reachable = self._rev_list(tips, set()) if tips else set()
+        return {sha for (sha,) in self._db.execute("SELECT sha FROM commits")} - reachable
+
+    def _delete(self, shas: set[str]):
+        shas = list(shas)
+        for start in range(0, len(shas), _BATCH_SIZE):
+            ids = list(self._commit_ids(shas[start : start + _BATCH_SIZE]).values())
+            placeholders = ",".join("?" * len(ids))
+            self._db.execute(f"DELETE FROM changes WHERE commit_id IN ({placeholders})", ids)
+            self._db.execute(f"DELETE FROM commits WHERE id IN ({placeholders})", ids)
+
+    def update(self) -> dict:
+        """
+        Index commits reachable from the current refs that aren't indexed
+        yet, and drop commits that rewritten or deleted branches left behind.
+        """
+        with self._lock:
+            started = time.time()
+            tips = self._ref_tips()
+            known = {sha for (sha,) in self._db.execute("SELECT sha FROM tips")}
+            if tips == known:
+                self.last_update = {"new_commits": 0, "removed_commits": 0, "seconds": 0.0}
+                return self.last_update
+
+            # Everything behind a previously indexed tip is already indexed
+            # (tips of rewritten or deleted branches may be gone from git)
+            exclude = self._existing(known)
+            try:
+                orphans = self._orphans(known - tips, exclude, tips)
+                self._delete(orphans)
+                exclude -= orphans
+                inserted = self._walk(tips - exclude, exclude) if tips - exclude else 0
+                self._db.execute("DELETE FROM tips")
+                self._db.executemany("INSERT INTO tips (sha) VALUES (?)", [(t,) for t in tips])
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                self._path_ids.clear()
+                raise
+
+            seconds = round(time.time() - started, 3)
+            if inserted or orphans:
+                logger.info(
+                    f"Git history of {self.repo_root}: {inserted} commits indexed, "
+                    f"{len(orphans)} removed in {seconds}s"
+                )
+            self.last_update = {
+                "new_commits": inserted,
+                "removed_commits": len(orphans),
+                "seconds": seconds,
+            }
+            return self.last_update
+
+    # ---------- Queries ----------
+
+    def query(
+        self,
+        path: str = "",
+        author: str = "",
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        text: str = "",
+        limit: int = 50,
+    ) -> dict:
+        """
+        Commits newest first matching every given filter: path (a file, or
+        a folder and everything under it, relative to the repository root),
+        author (name or email substring), committer date range (epoch
+        seconds) and message substring. All filters are case-insensitive
+        except path.
+        """
+        where, params = [], []
+        path_filter = ""
+        if path:
+            path = path.strip("/")
+            path_filter = "(path = ? OR path LIKE ? ESCAPE '\\')"
+            path_params = [path, f"{_like_escape(path)}/%"]
+            where.append(
+                "c.id IN (SELECT commit_id FROM changes WHERE path_id IN "
+                f"(SELECT id FROM paths WHERE {path_filter}))"
+            )
+            params += path_params
+        if author:
+            where.append("(c.author LIKE ? ESCAPE '\\' OR c.email LIKE ? ESCAPE '\\')")
+            params += [f"%{_like_escape(author)}%"] * 2
+        if since is not None:
+            where.append("c.committed_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("c.committed_at < ?")
+            params.append(until)
+        if text:
+            where.append("(c.subject LIKE ? ESCAPE '\\' OR c.body LIKE ? ESCAPE '\\')")
+            params += [f"%{_like_escape(text)}%"] * 2
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+        with self._lock:
+            total = self._db.execute(
+                f"SELECT count(*) FROM commits c {where_sql}", params
+            ).fetchone()[0]
+            authors = self._db.execute(
+                f"SELECT c.author, count(*), max(c.committed_at) FROM commits c {where_sql} "
+                "GROUP BY c.author ORDER BY count(*) DESC, max(c.committed_at) DESC LIMIT 20",
+                params,
+            ).fetchall()
+            rows = self._db.execute(
+                "SELECT c.id, c.sha, c.author, c.email, c.authored_at, c.committed_at, "
+                f"c.subject, c.body FROM commits c {where_sql} "
+                "ORDER BY c.committed_at DESC, c.id LIMIT ?",
+                params + [limit],
+            ).fetchall()
+
+            commits = []
+            for commit_id, sha, name, email, authored_at, committed_at, subject, body in rows:
+                sql = (
+                    "SELECT ch.status, p.path FROM changes ch JOIN paths p ON p.id = ch.path_id "
+                    "WHERE ch.commit_id = ?"
+                )
+                file_params: list = [commit_id]
+                if path_filter:
+                    sql += f" AND {path_filter.replace('path', 'p.path')}"
+                    file_params += path_params
+                files = self._db.execute(sql + " ORDER BY p.path", file_params).fetchall()
+                commits.append(
+                    {
+                        "sha": sha,
+                        "short_sha": sha[:7],
+                        "author": name,
+                        "author_email": email,
+                        "date": _iso(authored_at),
+                        "committed_at": _iso(committed_at),
+                        "subject": subject,
+                        "body": body,
+                        "files": [
+                            {"status": status, "file": file}
+                            for status, file in files[:FILES_PER_COMMIT]
+                        ],
+                        "files_total": len(files),
+                    }
+                )
+        return {
+            "total": total,
+            "authors": [
+                {"author": name, "commits": count, "last_committed_at": _iso(last)}
+                for name, count, last in authors
+            ],
+            "commits": commits,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            commits = self._db.execute("SELECT count(*) FROM commits").fetchone()[0]
+            paths = self._db.execute("SELECT count(*) FROM paths").fetchone()[0]
+        return {"commits": commits, "paths": paths}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class GitHistory:
+    """History indexes of the workspace's repositories, one SQLite file each."""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self._lock = threading.Lock()
+        self._indexes: OrderedDict[str, HistoryIndex] = OrderedDict()
+
+    def index(self, repo_root: Path) -> HistoryIndex:
+        key = str(Path(repo_root).resolve())
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+                index = HistoryIndex(self.cache_dir / f"{name}.sqlite", Path(key))
+                self._indexes[key] = index
+                while len(self._indexes) > MAX_OPEN_REPOS:
+                    _, evicted = self._indexes.popitem(last=False)
+                    evicted.close()
+            else:
+                self._indexes.move_to_end(key)
+            return index
+
+    def stats(self) -> dict:
+        with self._lock:
+            indexes = list(self._indexes.values())
+        try:
+            stored = sum(1 for name in os.listdir(self.cache_dir) if name.endswith(".sqlite"))
+        except OSError:
+            stored = 0
+        return {
+            "open_repos": len(indexes),
+            "stored_repos": stored,
+            "commits": sum(index.stats()["commits"] for index in indexes),
+        }
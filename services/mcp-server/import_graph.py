@@ -0,0 +1,358 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           IMPORT GRAPH                                        ║
+║  Python / TS / JS dependencies for test-impact selection      ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Backs select_tests:
+- Each source file's imports are extracted once per (mtime, size):
+  `ast` for Python, import/require/export-from scanning for TS/JS
+- Import specs are stored raw and resolved against the current file set
+  when the graph is queried, so adding a module fixes its importers
+  without re-parsing them
+- Walking the reversed graph from the changed files yields every test
+  file that transitively imports them
+"""
+
+import os
+import re
+import ast
+import time
+import pickle
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+PYTHON_EXTENSIONS = (".py",)
+SCRIPT_EXTENSIONS = (".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".mts", ".cts")
+GRAPH_EXTENSIONS = set(PYTHON_EXTENSIONS + SCRIPT_EXTENSIONS)
+
+# Files larger than this are skipped (bundles, generated code)
+GRAPH_MAX_FILE_SIZE = 1024 * 1024
+
+GRAPH_VERSION = 1
+
+# Changing one of these can affect any test, so a full run is safer
+CONFIG_FILES = {
+    "pyproject.toml",
+    "setup.cfg",
+    "setup.py",
+    "pytest.ini",
+    "tox.ini",
+    "requirements.txt",
+    "package.json",
+    "package-lock.json",
+    "pnpm-lock.yaml",
+    "yarn.lock",
+    "tsconfig.json",
+    "jest.config.js",
+    "jest.config.ts",
+    "vitest.config.ts",
+    "vitest.config.js",
+    "vite.config.ts",
+    "babel.config.js",
+}
+
+_SCRIPT_IMPORT = re.compile(
+    r"""(?:\bimport\s+(?:[\w*${}\s,]+\s+from\s+)?|\bexport\s+[\w*${}\s,]+\s+from\s+|"""
+    r"""\brequire\s*\(\s*|\bimport\s*\(\s*)['"]([^'"\n]+)['"]"""
+)
+_COMMENTS = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+
+# Specifier aliases commonly configured in tsconfig paths / vite
+_ALIASES = {"@/": "src/", "~/": "src/"}
+
+
+def is_test_file(rel_path: str) -> bool:
+    name = os.path.basename(rel_path)
+    if name.endswith(".py"):
+        return name.startswith("test_") or name.endswith("_test.py")
+    if os.path.splitext(name)[1] in SCRIPT_EXTENSIONS:
+        return ".test." in name or ".spec." in name or "__tests__" in Path(rel_path).parts
+    return False
+
+
+def extract_imports(rel_path: str, source: str) -> tuple:
+    """Raw import specs: ("py", module, level) or ("js", specifier)."""
+    if rel_path.endswith(".py"):
+        specs = []
+        for node in ast.walk(ast.parse(source)):
+            if isinstance(node, ast.Import):
+                specs.extend(("py", alias.name, 0) for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                module = node.module or ""
+                # `from pkg import mod` may name a submodule; try those first
+                specs.extend(
+                    ("py", f"{module}.{alias.name}" if module else alias.name, node.level)
+                    for alias in node.names
+                    if alias.name != "*"
+                )
+                specs.append(("py", module, node.level))
+        return tuple(dict.fromkeys(specs))
+    text = _COMMENTS.sub(" ", source)
+    return tuple(dict.fromkeys(("js", spec) for spec in _SCRIPT_IMPORT.findall(text)))
+
+
+class ImportGraph:
+    """Incremental import graph of a workspace, persisted with pickle."""
+
+    def __init__(self, index_path: Path, root: Path):
+        self.index_path = Path(index_path)
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._files: dict[str, tuple[int, int, tuple]] = {}  # path -> (mtime_ns, size, specs)
+        self._reverse: Optional[dict[str, set[str]]] = None  # target -> importers
+        self._dirty = False
+        self.last_refresh = 0.0
+        self._refreshed_in_process = False
+        self._load()
+
+    # ────────────────────────────────────────────────────────────
+    # Persistence / maintenance
+    # ────────────────────────────────────────────────────────────
+
+    def _load(self):
+        try:
+            with open(self.index_path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") == GRAPH_VERSION and state.get("root") == str(self.root):
+                self._files = state["files"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Could not load import graph, rebuilding: {e}")
+
+    def _save(self):
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(
+                    {"version": GRAPH_VERSION, "root": str(self.root), "files": self._files},
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Could not persist import graph: {e}")
+
+    def _parse(self, rel_path: str, mtime_ns: int, size: int):
+        try:
+            with open(self.root / rel_path, "r", encoding="utf-8", errors="replace") as f:
+                specs = extract_imports(rel_path, f.read())
+        except (OSError, SyntaxError, ValueError, RecursionError):
+            specs = ()
+        self._files[rel_path] = (mtime_ns, size, specs)
+
+    def refresh(self, iter_files: Callable[[], Iterable[tuple[str, int, int]]]) -> dict:
+        """Re-parse files whose (mtime, size) changed; drop files that are gone."""
+        with self._lock:
+            started = time.time()
+            seen = set()
+            changed = []
+            for rel_path, mtime_ns, size in iter_files():
+                seen.add(rel_path)
+                entry = self._files.get(rel_path)
+                if entry is None or entry[0] != mtime_ns or entry[1] != size:
+                    changed.append((rel_path, mtime_ns, size))
+            removed = [rel_path for rel_path in self._files if rel_path not in seen]
+
+            for rel_path in removed:
+                del self._files[rel_path]
+            for rel_path, mtime_ns, size in changed:
+                self._parse(rel_path, mtime_ns, size)
+
+            self.last_refresh = time.time()
+            self._refreshed_in_process = True
+            if changed or removed or self._dirty:
+                self._reverse = None
+                self._save()
+                logger.info(
+                    f"Import graph refreshed: {len(changed)} parsed, "
+                    f"{len(removed)} removed in {time.time() - started:.2f}s"
+                )
+            return {"parsed_files": len(changed), "removed_files": len(removed)}
+
+    def ensure_fresh(
+        self, iter_files: Callable[[], Iterable[tuple[str, int, int]]], max_age: float
+    ) -> dict:
+        """Refresh only if the last refresh is older than max_age seconds."""
+        if self._refreshed_in_process and time.time() - self.last_refresh <= max_age:
+            return {"refreshed": False}
+        return {"refreshed": True, **self.refresh(iter_files)}
+
+    def mark_stale(self):
+        self.last_refresh = 0.0
+
+    def update_files(self, files: Iterable[tuple[str, Optional[int], Optional[int]]]):
+        """Re-parse specific files now; mtime_ns=None removes the file."""
+        with self._lock:
+            for rel_path, mtime_ns, size in files:
+                if mtime_ns is None:
+                    self._files.pop(rel_path, None)
+                else:
+                    self._parse(rel_path, mtime_ns, size)
+            self._reverse = None
+            self._dirty = True  # Persisted on the next refresh
+
+    # ────────────────────────────────────────────────────────────
+    # Resolution
+    # ────────────────────────────────────────────────────────────
+
+    def _project_root(self, rel_path: str) -> str:
+        parts = Path(rel_path).parts
+        return parts[0] if len(parts) > 1 else ""
+
+    def _ancestors(self, importer: str) -> list[str]:
+        """Folders from the importer's folder up to its project root."""
+        project = self._project_root(importer)
+        folders, current = [], os.path.dirname(importer)
+        while True:
+            folders.append(current)
+            if current == project or not current:
+                return folders
+            current = os.path.dirname(current)
+
+    def _resolve_python(self, importer: str, module: str, level: int) -> Optional[str]:
+        files = self._files
+        module_path = module.replace(".", os.sep) if module else ""
+
+        if level:
+            base = os.path.dirname(importer)
+            for _ in range(level - 1):
+                base = os.path.dirname(base)
+            bases = [base]
+        else:
+            # Any folder between the importer and its project root may be a
+            # source root (flat layout, src layout, nested packages)
+            project = self._project_root(importer)
+            bases = self._ancestors(importer)
+            bases.append(os.path.join(project, "src") if project else "src")
+
+        for base in bases:
+            stem = os.path.join(base, module_path) if module_path else base
+            for candidate in (stem + ".py", os.path.join(stem, "__init__.py")):
+                if candidate in files:
+                    return candidate
+        return None
+
+    def _resolve_stem(self, stem: str) -> Optional[str]:
+        files = self._files
+        if stem in files:
+            return stem
+        # "./util.js" may refer to util.ts in TS projects
+        base, ext = os.path.splitext(stem)
+        candidates = [stem + e for e in SCRIPT_EXTENSIONS]
+        candidates += [os.path.join(stem, "index" + e) for e in SCRIPT_EXTENSIONS]
+        if ext in SCRIPT_EXTENSIONS:
+            candidates += [base + e for e in SCRIPT_EXTENSIONS]
+        return next((c for c in candidates if c in files), None)
+
+    def _resolve_script(self, importer: str, spec: str) -> Optional[str]:
+        if spec.startswith("."):
+            return self._resolve_stem(
+                os.path.normpath(os.path.join(os.path.dirname(importer), spec))
+            )
+        alias = next((a for a in _ALIASES if spec.startswith(a)), None)
+        if alias is None:
+            return None  # Package import
+        # The aliased folder sits next to the app's package.json, which may
+        # be nested inside the project (monorepos)
+        for folder in self._ancestors(importer):
+            stem = os.path.join(folder, _ALIASES[alias], spec[len(alias):])
+            target = self._resolve_stem(stem)
+            if target:
+                return target
+        return None
+
+    def _build_reverse(self) -> dict[str, set[str]]:
+        reverse: dict[str, set[str]] = {}
+        for importer, (_, _, specs) in self._files.items():
+            for spec in specs:
+                if spec[0] == "py":
+                    target = self._resolve_python(importer, spec[1], spec[2])
+                else:
+                    target = self._resolve_script(importer, spec[1])
+                if target and target != importer:
+                    reverse.setdefault(target, set()).add(importer)
+        return reverse
+
+    # ────────────────────────────────────────────────────────────
+    # Queries
+    # ────────────────────────────────────────────────────────────
+
+    def select_tests(self, changed: Iterable[str]) -> dict:
+        """
+        Test files affected by the changed files.
+
+        Returns tests (sorted), a reason chain per test (changed file ->
+        ... -> test), changed files the graph does not know, and whether a
+        config change makes a full run advisable.
+        """
+        with self._lock:
+            if self._reverse is None:
+                self._reverse = self._build_reverse()
+            reverse = self._reverse
+            files = self._files
+
+            changed = list(dict.fromkeys(changed))
+            came_from: dict[str, Optional[str]] = {}
+            queue = deque()
+            unmapped = []
+            full_suite = False
+
+            for rel_path in changed:
+                name = os.path.basename(rel_path)
+                if name in CONFIG_FILES:
+                    full_suite = True
+                if rel_path in files:
+                    came_from.setdefault(rel_path, None)
+                    queue.append(rel_path)
+                else:
+                    unmapped.append(rel_path)
+
+            while queue:
+                node = queue.popleft()
+                for importer in reverse.get(node, ()):
+                    if importer not in came_from:
+                        came_from[importer] = node
+                        queue.append(importer)
+
+            tests = {path for path in came_from if is_test_file(path)}
+
+            # pytest loads conftest.py for every test below its folder
+            for conftest in (p for p in came_from if os.path.basename(p) == "conftest.py"):
+                folder = os.path.dirname(conftest)
+                prefix = folder + os.sep if folder else ""
+                for path in files:
+                    if path.startswith(prefix) and is_test_file(path) and path.endswith(".py"):
+                        if path not in came_from:
+                            came_from[path] = conftest
+                        tests.add(path)
+
+        reasons = {}
+        for test in tests:
+            chain, node = [], test
+            while node is not None and len(chain) < 50:
+                chain.append(node)
+                node = came_from.get(node)
+            reasons[test] = list(reversed(chain))
+
+        return {
+            "tests": sorted(tests),
+            "reasons": reasons,
+            "unmapped": unmapped,
+            "full_suite_recommended": full_suite,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "imports": sum(len(entry[2]) for entry in self._files.values()),
+            }
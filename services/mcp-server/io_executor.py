@@ -0,0 +1,69 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           BOUNDED I/O EXECUTOR                                ║
+║  Keeps blocking file-system work off the event loop           ║
+╚═══════════════════════════════════════════════════════════════╝
+
+The file tools are async, but open/stat/scandir block. Running them on
+the event loop lets one slow search on a network drive stall every MCP
+and HTTP client. This executor:
+- Runs blocking tool bodies on a dedicated thread pool
+- Caps concurrency per tool (e.g. at most 2 searches at once), so long
+  walks can never occupy every worker and starve quick reads
+- Reports in-flight/queued counts for monitoring
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedIOExecutor:
+    """Thread pool with a per-tool concurrency limit."""
+
+    def __init__(self, max_workers: int, limits: dict[str, int], default_limit: int = 4):
+        self.max_workers = max_workers
+        self.limits = limits
+        self.default_limit = default_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-io")
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._in_flight: dict[str, int] = {}
+        self._waiting: dict[str, int] = {}
+
+    def _semaphore(self, tool: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(tool)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.limits.get(tool, self.default_limit))
+            self._semaphores[tool] = semaphore
+        return semaphore
+
+    async def run(self, tool: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on the pool under the tool's concurrency limit."""
+        semaphore = self._semaphore(tool)
+        self._waiting[tool] = self._waiting.get(tool, 0) + 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting[tool] -= 1
+
+        self._in_flight[tool] = self._in_flight.get(tool, 0) + 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(fn, *args, **kwargs)
+            )
+        finally:
+            self._in_flight[tool] -= 1
+            semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "limits": {**self.limits, "default": self.default_limit},
+            "in_flight": {k: v for k, v in self._in_flight.items() if v},
+            "waiting": {k: v for k, v in self._waiting.items() if v},
+        }
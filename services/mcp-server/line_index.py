@@ -0,0 +1,144 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           LINE OFFSET INDEX                                   ║
+║  Seek-based ranged reads for read_file                        ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Maps line numbers to byte offsets so read_file can seek straight to
+lines 4000-4050 instead of reading and splitting the whole file:
+- Offsets are cached in memory, keyed by (path, mtime, size)
+- Large files also get an on-disk sidecar so restarts don't rescan them
+- Building an index streams the file in chunks (no full read in memory)
+"""
+
+import os
+import re
+import struct
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Files at least this large get a persisted sidecar index
+SIDECAR_MIN_SIZE = 1024 * 1024
+
+# Chunk size used while scanning for newlines
+SCAN_CHUNK = 1024 * 1024
+
+# Sidecar header: mtime_ns, size, number of offsets
+_HEADER = struct.Struct("<QQQ")
+
+_NEWLINE = re.compile(b"\n")
+
+
+class LineIndex:
+    """Byte offset of the start of every line of one file version."""
+
+    def __init__(self, starts: array, size: int):
+        self.starts = starts
+        self.size = size
+
+    @property
+    def total_lines(self) -> int:
+        return len(self.starts)
+
+    def byte_range(self, start_line: int, end_line: int) -> tuple[int, int]:
+        """Byte span [begin, end) covering 1-indexed lines start_line..end_line."""
+        begin = self.starts[start_line - 1]
+        end = self.starts[end_line] if end_line < len(self.starts) else self.size
+        return begin, end
+
+
+def build_line_index(path: Path, size: int) -> LineIndex:
+    """Scan a file for newlines without holding it in memory."""
+    starts = array("Q")
+    if size == 0:
+        return LineIndex(starts, 0)
+
+    starts.append(0)
+    base = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(SCAN_CHUNK)
+            if not chunk:
+                break
+            starts.extend(base + m.end() for m in _NEWLINE.finditer(chunk))
+            base += len(chunk)
+
+    # A trailing newline does not start another line
+    if starts and starts[-1] >= base:
+        starts.pop()
+    return LineIndex(starts, base)
+
+
+class LineIndexCache:
+    """LRU of line indexes, backed by sidecar files for large files."""
+
+    def __init__(self, sidecar_dir: Path, max_entries: int = 128):
+        self.sidecar_dir = Path(sidecar_dir)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[int, int, LineIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sidecar_path(self, path: Path) -> Path:
+        digest = hashlib.sha1(str(path).encode("utf-8")).hexdigest()
+        return self.sidecar_dir / f"{digest}.lidx"
+
+    def _load_sidecar(self, path: Path, mtime_ns: int, size: int) -> Optional[LineIndex]:
+        sidecar = self._sidecar_path(path)
+        try:
+            with open(sidecar, "rb") as f:
+                header = f.read(_HEADER.size)
+                if len(header) != _HEADER.size:
+                    return None
+                saved_mtime, saved_size, count = _HEADER.unpack(header)
+                if saved_mtime != mtime_ns or saved_size != size:
+                    return None
+                starts = array("Q")
+                starts.fromfile(f, count)
+                return LineIndex(starts, size)
+        except (OSError, EOFError):
+            return None
+
+    def _save_sidecar(self, path: Path, mtime_ns: int, index: LineIndex):
+        sidecar = self._sidecar_path(path)
+        try:
+            self.sidecar_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = sidecar.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER.pack(mtime_ns, index.size, len(index.starts)))
+                index.starts.tofile(f)
+            os.replace(tmp_path, sidecar)
+        except OSError as e:
+            logger.warning(f"Could not save line index for {path}: {e}")
+
+    def get(self, path: Path, stat: os.stat_result) -> LineIndex:
+        """Line index for the current version of path (built on a miss)."""
+        key = str(path)
+        mtime_ns, size = stat.st_mtime_ns, stat.st_size
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached[0] == mtime_ns and cached[1] == size:
+                self._entries.move_to_end(key)
+                return cached[2]
+
+        index = None
+        if size >= SIDECAR_MIN_SIZE:
+            index = self._load_sidecar(path, mtime_ns, size)
+        if index is None:
+            index = build_line_index(path, size)
+            if size >= SIDECAR_MIN_SIZE and index.size == size:
+                self._save_sidecar(path, mtime_ns, index)
+
+        with self._lock:
+            self._entries[key] = (mtime_ns, size, index)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
@@ -0,0 +1,294 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           ATOMIC PATCH APPLICATION                            ║
+║  Multi-file edits that apply completely or not at all         ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Used by apply_patch (and workspace-wide replace):
+- Parses unified diffs into per-file hunks
+- Applies hunks / exact-text edits in memory, validating everything
+  before a single byte is written
+- Commits a set of file changes via temp files + os.replace, rolling
+  back already-replaced files if a later one fails
+- Per-path locks so concurrent tools never interleave on one file
+"""
+
+import os
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+
+class PatchError(ValueError):
+    """A patch or edit that does not apply to the current file content."""
+
+
+# ════════════════════════════════════════════════════════════
+# Unified diff parsing
+# ════════════════════════════════════════════════════════════
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+@dataclass
+class Hunk:
+    old_start: int
+    old_lines: list[str] = field(default_factory=list)
+    new_lines: list[str] = field(default_factory=list)
+
+
+@dataclass
+class FilePatch:
+    old_path: Optional[str]  # None = /dev/null (file is created)
+    new_path: Optional[str]  # None = /dev/null (file is deleted)
+    hunks: list[Hunk] = field(default_factory=list)
+
+    @property
+    def path(self) -> str:
+        return self.new_path or self.old_path
+
+
+def _diff_path(raw: str) -> Optional[str]:
+    path = raw.split("\t", 1)[0].strip()
+    if path == "/dev/null":
+        return None
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+
+def parse_unified_diff(text: str) -> list[FilePatch]:
+    """Split a unified diff into file patches. Raises PatchError if malformed."""
+    patches: list[FilePatch] = []
+    lines = text.replace("\r\n", "\n").split("\n")
+    current: Optional[FilePatch] = None
+    i = 0
+
+    while i < len(lines):
+        line = lines[i]
+
+        if line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            current = FilePatch(_diff_path(line[4:]), _diff_path(lines[i + 1][4:]))
+            if current.path is None:
+                raise PatchError(f"Patch header without a file path at line {i + 1}")
+            patches.append(current)
+            i += 2
+            continue
+
+        header = _HUNK_HEADER.match(line)
+        if header:
+            if current is None:
+                raise PatchError(f"Hunk without a file header at line {i + 1}")
+            old_count = int(header.group(2)) if header.group(2) is not None else 1
+            new_count = int(header.group(4)) if header.group(4) is not None else 1
+            hunk = Hunk(old_start=int(header.group(1)))
+            i += 1
+            while (len(hunk.old_lines) < old_count or len(hunk.new_lines) < new_count) and i < len(lines):
+                body = lines[i]
+                tag, content = body[:1], body[1:] + "\n"
+                if tag == " " or body == "":
+                    hunk.old_lines.append(content if body else "\n")
+                    hunk.new_lines.append(content if body else "\n")
+                elif tag == "-":
+                    hunk.old_lines.append(content)
+                elif tag == "+":
+                    hunk.new_lines.append(content)
+                elif tag != "\\":
+                    raise PatchError(f"Unexpected line in hunk at line {i + 1}: {body[:80]!r}")
+                i += 1
+                # "\ No newline at end of file" applies to the line just read
+                if i < len(lines) and lines[i].startswith("\\"):
+                    if tag in (" ", "-") and hunk.old_lines:
+                        hunk.old_lines[-1] = hunk.old_lines[-1][:-1]
+                    if tag in (" ", "+") and hunk.new_lines:
+                        hunk.new_lines[-1] = hunk.new_lines[-1][:-1]
+                    i += 1
+            if len(hunk.old_lines) != old_count or len(hunk.new_lines) != new_count:
+                raise PatchError(f"Truncated hunk for {current.path}")
+            current.hunks.append(hunk)
+            continue
+
+        i += 1
+
+    if not patches:
+        raise PatchError("No file headers (---/+++) found in patch")
+    return patches
+
+
+# ════════════════════════════════════════════════════════════
+# Applying changes in memory
+# ════════════════════════════════════════════════════════════
+
+
+def _find_block(lines: list[str], block: list[str], expected: int) -> int:
+    """Index of block in lines, preferring the position closest to expected."""
+    size = len(block)
+    limit = len(lines) - size
+    if limit < 0:
+        return -1
+    expected = min(max(expected, 0), limit)
+    for distance in range(limit + 1):
+        for start in (expected - distance, expected + distance):
+            if 0 <= start <= limit and lines[start:start + size] == block:
+                return start
+        if expected - distance < 0 and expected + distance > limit:
+            break
+    return -1
+
+
+def apply_hunks(content: str, hunks: list[Hunk], path: str) -> str:
+    """Apply hunks in order. Context may have drifted; it must still match exactly."""
+    lines = content.splitlines(keepends=True)
+    offset = 0
+    for number, hunk in enumerate(hunks, 1):
+        # A pure insertion's old_start is the line it goes after, not the first line replaced
+        base = hunk.old_start - 1 if hunk.old_lines else hunk.old_start
+        start = _find_block(lines, hunk.old_lines, base + offset)
+        if start < 0:
+            raise PatchError(
+                f"{path}: hunk {number} (line {hunk.old_start}) does not match the file"
+            )
+        lines[start:start + len(hunk.old_lines)] = hunk.new_lines
+        offset = start - base + len(hunk.new_lines) - len(hunk.old_lines)
+    return "".join(lines)
+
+
+def apply_text_edit(content: str, old_text: str, new_text: str, path: str) -> str:
+    """Replace one unique occurrence of old_text (edit_file semantics)."""
+    count = content.count(old_text)
+    if count == 0:
+        raise PatchError(f"{path}: text to replace not found")
+    if count > 1:
+        raise PatchError(f"{path}: text found {count} times; add context to make it unique")
+    return content.replace(old_text, new_text, 1)
+
+
+# ════════════════════════════════════════════════════════════
+# Atomic commit
+# ════════════════════════════════════════════════════════════
+
+
+@dataclass
+class FileChange:
+    path: Path
+    original: Optional[bytes]  # None = file does not exist yet
+    new: Optional[bytes]  # None = delete the file
+
+
+def _temp_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def write_replace(path: Path, data: bytes, mode: Optional[int] = None):
+    """Replace path's content atomically (temp file next to it, then rename)."""
+    tmp_path = _temp_path(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def commit_changes(changes: list[FileChange]):
+    """
+    Write every change or none of them.
+
+    New content is first written to temp files next to each target; only
+    when all of those succeed are they renamed into place. If a rename
+    fails, files already replaced are restored from their original bytes.
+    """
+    staged: list[tuple[FileChange, Optional[Path]]] = []
+    try:
+        for change in changes:
+            if change.new is None:
+                staged.append((change, None))
+                continue
+            change.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = _temp_path(change.path)
+            with open(tmp_path, "wb") as f:
+                f.write(change.new)
+            if change.original is not None:
+                os.chmod(tmp_path, os.stat(change.path).st_mode)
+            staged.append((change, tmp_path))
+    except OSError:
+        for _, tmp_path in staged:
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+        raise
+
+    applied: list[FileChange] = []
+    try:
+        for change, tmp_path in staged:
+            if tmp_path is None:
+                os.unlink(change.path)
+            else:
+                os.replace(tmp_path, change.path)
+            applied.append(change)
+    except OSError:
+        for change in reversed(applied):
+            try:
+                if change.original is None:
+                    os.unlink(change.path)
+                else:
+                    write_replace(change.path, change.original)
+            except OSError:
+                pass
+        for _, tmp_path in staged:
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+        raise
+
+
+# ════════════════════════════════════════════════════════════
+# Per-path locks
+# ════════════════════════════════════════════════════════════
+
+
+class PathLocks:
+    """
+    One lock per file path; multi-path holders lock in sorted order. A lock
+    is dropped once nothing holds or waits on it.
+    """
+
+    def __init__(self):
+        # key -> [lock, holders + waiters]
+        self._locks: dict[str, list] = {}
+        self._guard = threading.Lock()
+
+    def _use(self, key: str) -> threading.Lock:
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def _unuse(self, key: str):
+        with self._guard:
+            entry = self._locks[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    @contextmanager
+    def hold(self, paths: Iterable[Path]) -> Iterator[None]:
+        keys = sorted({str(Path(p).resolve()) for p in paths})
+        locks = [self._use(key) for key in keys]
+        acquired = 0
+        try:
+            for lock in locks:
+                lock.acquire()
+                acquired += 1
+            yield
+        finally:
+            for lock in reversed(locks[:acquired]):
+                lock.release()
+            for key in keys:
+                self._unuse(key)
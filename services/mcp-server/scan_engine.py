@@ -0,0 +1,374 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           CONTENT SCAN ENGINE                                 ║
+║  Parallel, memory-mapped file scanning for search_files       ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Scans candidate files on a thread pool:
+- Files are searched as raw bytes (mmap for large files, read() for small)
+- Case-insensitive matching uses byte patterns with every case variant
+  encoded up front, so lines are never decoded or lowercased just to test
+- Only matching lines are decoded; CRLF line endings are stripped so
+  regex anchors like `$` behave the same as on LF files
+- Results come back per file in walk order; the shared result budget is
+  applied in that order, so which matches survive truncation never
+  depends on thread timing, and once it is spent no new file is started
+- Many patterns can share one pass through an Aho-Corasick automaton
+"""
+
+import os
+import re
+import mmap
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from search_index import required_literals
+
+logger = logging.getLogger(__name__)
+
+# Below this size a plain read() is cheaper than setting up a mapping
+MMAP_THRESHOLD = 64 * 1024
+
+# Characters of a matching line returned to the client
+MAX_LINE_PREVIEW = 200
+
+
+def case_insensitive_bytes(text: str) -> bytes:
+    """
+    Build a bytes regex source matching text in any letter case.
+
+    Every character is expanded to its lower/upper UTF-8 encodings, e.g.
+    "Việt" -> [Vv]i(?:\\xe1\\xbb\\x87|\\xe1\\xbb\\x86)[Tt]
+    """
+    parts = []
+    for ch in text:
+        variants = {v.encode("utf-8") for v in (ch, ch.lower(), ch.upper()) if len(v) == 1}
+        if len(variants) == 1:
+            parts.append(re.escape(variants.pop()))
+        elif all(len(v) == 1 for v in variants):
+            parts.append(b"[" + b"".join(re.escape(v) for v in sorted(variants)) + b"]")
+        else:
+            parts.append(b"(?:" + b"|".join(re.escape(v) for v in sorted(variants)) + b")")
+    return b"".join(parts)
+
+
+def iter_matching_lines(buf, prefilter: "re.Pattern[bytes]") -> Iterator[tuple[int, bytes]]:
+    """
+    Yield (line_number, line_bytes) once for every line containing a
+    prefilter match; line_bytes has no line ending (\n or \r\n).
+    """
+    size = len(buf)
+    pos = 0
+    line_no = 1
+    counted_to = 0
+
+    while pos < size:
+        match = prefilter.search(buf, pos)
+        if match is None:
+            return
+
+        start = match.start()
+        line_start = buf.rfind(b"\n", 0, start) + 1
+        line_end = buf.find(b"\n", start)
+        if line_end == -1:
+            line_end = size
+
+        # mmap has no count(); slicing copies each byte at most once per file
+        line_no += buf[counted_to:line_start].count(b"\n")
+        counted_to = line_start
+
+        content_end = line_end
+        if content_end > line_start and buf[content_end - 1:content_end] == b"\r":
+            content_end -= 1
+        yield line_no, buf[line_start:content_end]
+        pos = line_end + 1
+
+
+def preview_line(line: bytes) -> str:
+    return line.decode("utf-8", errors="replace").strip()[:MAX_LINE_PREVIEW]
+
+
+class ResultBudget:
+    """
+    Thread-safe result counter for one scan. Workers get a fresh copy per
+    file (a file never needs more than limit matches); the engine then
+    takes from the shared one in walk order.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(0, limit)
+        self.count = 0
+        self._lock = threading.Lock()
+        self._exhausted = threading.Event()
+        if self.limit == 0:
+            self._exhausted.set()
+
+    def take(self, key=None) -> bool:
+        with self._lock:
+            if self.count >= self.limit:
+                return False
+            self.count += 1
+            if self.count >= self.limit:
+                self._exhausted.set()
+            return True
+
+    @property
+    def exhausted(self) -> bool:
+        return self._exhausted.is_set()
+
+    def fresh(self) -> "ResultBudget":
+        return ResultBudget(self.limit)
+
+
+class LiteralMatcher:
+    """Case-insensitive substring search on raw bytes."""
+
+    def __init__(self, query: str):
+        self._pattern = re.compile(case_insensitive_bytes(query))
+
+    def scan(self, buf, rel_path: str, budget: ResultBudget) -> list[dict]:
+        results = []
+        for line_no, line in iter_matching_lines(buf, self._pattern):
+            if not budget.take():
+                break
+            results.append({"file": rel_path, "line": line_no, "content": preview_line(line)})
+        return results
+
+
+class RegexMatcher:
+    """
+    Case-insensitive regex search.
+
+    The longest literal the pattern requires is used as a byte prefilter;
+    only lines containing it are decoded and checked with the real regex.
+    """
+
+    def __init__(self, pattern: str):
+        self._regex = re.compile(pattern, re.IGNORECASE)
+        literals = required_literals(pattern)
+        longest = max(literals, key=len) if literals else ""
+        self._prefilter = re.compile(case_insensitive_bytes(longest)) if longest else None
+
+    def scan(self, buf, rel_path: str, budget: ResultBudget) -> list[dict]:
+        results = []
+
+        if self._prefilter is None:
+            text = buf[:].decode("utf-8", errors="replace")
+            lines = enumerate((line.removesuffix("\r") for line in text.split("\n")), 1)
+        else:
+            lines = (
+                (line_no, line.decode("utf-8", errors="replace"))
+                for line_no, line in iter_matching_lines(buf, self._prefilter)
+            )
+
+        for line_no, line in lines:
+            if budget.exhausted:
+                break
+            if not self._regex.search(line):
+                continue
+            if not budget.take():
+                break
+            results.append({"file": rel_path, "line": line_no, "content": line.strip()[:MAX_LINE_PREVIEW]})
+        return results
+
+
+class PatternBudget:
+    """Per-pattern result limits; exhausted once every pattern is full."""
+
+    def __init__(self, patterns: list[str], limit_per_pattern: int):
+        self.patterns = patterns
+        self.limit = max(0, limit_per_pattern)
+        self.counts = {pattern: 0 for pattern in patterns}
+        self._remaining = len(patterns) if self.limit else 0
+        self._lock = threading.Lock()
+
+    def take(self, key=None) -> bool:
+        with self._lock:
+            count = self.counts[key]
+            if count >= self.limit:
+                return False
+            self.counts[key] = count + 1
+            if count + 1 >= self.limit:
+                self._remaining -= 1
+            return True
+
+    def is_full(self, key) -> bool:
+        return self.counts[key] >= self.limit
+
+    def fresh(self) -> "PatternBudget":
+        return PatternBudget(self.patterns, self.limit)
+
+    @property
+    def exhausted(self) -> bool:
+        return self._remaining <= 0
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over lowercased text.
+
+    find(text) reports every pattern occurring in text (overlaps included)
+    in a single left-to-right pass.
+    """
+
+    def __init__(self, patterns: list[str]):
+        self.patterns = patterns
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[set[int]] = [set()]
+
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern.lower():
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(set())
+                state = next_state
+            self._out[state].add(index)
+
+        # Breadth-first failure links; outputs inherit along the links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0)
+                if self._fail[next_state] == next_state:
+                    self._fail[next_state] = 0
+                self._out[next_state] |= self._out[self._fail[next_state]]
+
+    def find(self, text: str) -> set[int]:
+        """Indexes of all patterns contained in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found: set[int] = set()
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+class MultiPatternMatcher:
+    """
+    Case-insensitive search for many literal patterns in one pass.
+
+    A single byte alternation finds every line that contains at least one
+    pattern; the automaton then reports all patterns present on that line.
+    """
+
+    def __init__(self, patterns: list[str]):
+        self.patterns = patterns
+        self._automaton = AhoCorasick(patterns)
+        alternation = b"|".join(
+            case_insensitive_bytes(p) for p in sorted(patterns, key=len, reverse=True)
+        )
+        self._prefilter = re.compile(alternation)
+
+    def scan(self, buf, rel_path: str, budget: PatternBudget) -> list[dict]:
+        results = []
+        for line_no, line in iter_matching_lines(buf, self._prefilter):
+            if budget.exhausted:
+                break
+            text = line.decode("utf-8", errors="replace")
+            for index in sorted(self._automaton.find(text)):
+                pattern = self.patterns[index]
+                if budget.take(pattern):
+                    results.append(
+                        {
+                            "pattern": pattern,
+                            "file": rel_path,
+                            "line": line_no,
+                            "content": text.strip()[:MAX_LINE_PREVIEW],
+                        }
+                    )
+        return results
+
+
+class ScanEngine:
+    """Runs a matcher over many files on a shared thread pool."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 4) * 2)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="scan"
+        )
+
+    def _scan_file(self, path: Path, rel_path: str, matcher, budget: ResultBudget):
+        if budget.exhausted:
+            return None
+        budget = budget.fresh()  # Matches are taken from the shared budget in order
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return []
+                if size < MMAP_THRESHOLD:
+                    return matcher.scan(f.read(), rel_path, budget)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return matcher.scan(mm, rel_path, budget)
+        except (OSError, ValueError):
+            return None
+
+    def scan(
+        self,
+        files: Iterable[tuple[Path, str]],
+        matcher,
+        budget: ResultBudget,
+    ) -> Iterator[tuple[str, list[dict]]]:
+        """
+        Scan files and stream (relative_path, matches) per scanned file, in
+        the order the files were given.
+
+        Args:
+            files: (absolute path, path relative to workspace) pairs; consumed lazily
+            matcher: Object with scan(buf, rel_path, budget) -> list of matches
+            budget: Shared result budget, taken from in file order (keyed by
+                each match's "pattern", if any); scanning stops when it is exhausted
+        """
+        window = self.max_workers * 4
+        pending: deque = deque()
+        file_iter = iter(files)
+        exhausted_input = False
+
+        try:
+            while True:
+                while not exhausted_input and len(pending) < window and not budget.exhausted:
+                    try:
+                        path, rel_path = next(file_iter)
+                    except StopIteration:
+                        exhausted_input = True
+                        break
+                    future = self._executor.submit(self._scan_file, path, rel_path, matcher, budget)
+                    future.rel_path = rel_path
+                    pending.append(future)
+
+                if not pending:
+                    return
+
+                # Later files keep scanning while we wait for the oldest one
+                future = pending.popleft()
+                matches = future.result()
+                if matches is not None:
+                    yield future.rel_path, [
+                        match for match in matches if budget.take(match.get("pattern"))
+                    ]
+
+                if budget.exhausted:
+                    return
+        finally:
+            for future in pending:
+                future.cancel()
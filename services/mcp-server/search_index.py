@@ -0,0 +1,360 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           WORKSPACE SEARCH INDEX                              ║
+║  Persistent trigram index that narrows search_files           ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Keeps an on-disk inverted index of lowercased byte trigrams so that
+search_files only opens files that can possibly contain the query:
+- Incremental refresh: only files whose mtime/size changed are re-read
+- Substring queries: every trigram of the query must be present
+- Regex queries: literal runs the pattern requires are used as filters
+- Removed/changed files are tombstoned and compacted in bulk
+
+The index only narrows the candidate set; matches are always verified
+against the current file contents by the caller.
+"""
+
+import os
+import re
+import time
+import pickle
+import logging
+import threading
+from array import array
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+try:
+    import re._parser as sre_parse
+    import re._constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout changes (old index files are rebuilt)
+INDEX_VERSION = 1
+
+# Files larger than this are not tokenized; they are always candidates
+INDEX_MAX_FILE_SIZE = int(os.getenv("MCP_SEARCH_INDEX_MAX_FILE", str(1024 * 1024)))
+
+# Compact posting lists once this share of file ids is tombstoned
+COMPACT_RATIO = 0.25
+
+_REPEAT_OPS = tuple(
+    getattr(sre_constants, name)
+    for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_constants, name)
+)
+
+
+def _trigrams(data: bytes) -> set:
+    """Distinct 3-byte grams of already-normalized bytes."""
+    return {data[i : i + 3] for i in range(len(data) - 2)}
+
+
+def normalize_text(text: str) -> bytes:
+    """Normalization shared by indexing and querying (case-insensitive)."""
+    return text.lower().encode("utf-8")
+
+
+def required_literals(pattern: str) -> list[str]:
+    """
+    Extract literal runs that every match of a regex must contain.
+    Conservative: alternations and optional parts contribute nothing.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+
+    runs: list[str] = []
+    _collect_literals(parsed, runs)
+    return runs
+
+
+def _collect_literals(items, runs: list[str]) -> None:
+    current: list[str] = []
+
+    def flush():
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            current.append(chr(av))
+            continue
+
+        flush()
+        if op is sre_constants.SUBPATTERN:
+            _collect_literals(av[-1], runs)
+        elif op in _REPEAT_OPS and av[0] >= 1:
+            _collect_literals(av[2], runs)
+
+    flush()
+
+
+class TrigramIndex:
+    """
+    Inverted index: trigram -> sorted array of file ids.
+
+    File ids are never reused; a changed file gets a fresh id and its old
+    id is tombstoned, so posting lists stay append-only between compactions.
+    """
+
+    def __init__(self, index_path: Path, root: Path):
+        self.index_path = Path(index_path)
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._refreshed_in_process = False
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self._paths: list[Optional[str]] = []  # id -> relative path (None = dead)
+        self._files: dict[str, tuple[int, int, int]] = {}  # path -> (id, mtime_ns, size)
+        self._postings: dict[bytes, array] = {}
+        self._unindexed: set[str] = set()  # too large / unreadable: always scanned
+        self._dead = 0
+        self.last_refresh = 0.0
+
+    # ────────────────────────────────────────────────────────────
+    # Persistence
+    # ────────────────────────────────────────────────────────────
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") != INDEX_VERSION or state.get("root") != str(self.root):
+                logger.info("Search index is outdated, rebuilding")
+                return
+            self._paths = state["paths"]
+            self._files = state["files"]
+            self._postings = state["postings"]
+            self._unindexed = state["unindexed"]
+            self._dead = state["dead"]
+            self.last_refresh = state["last_refresh"]
+            logger.info(f"Search index loaded: {len(self._files)} files")
+        except Exception as e:
+            logger.warning(f"Could not load search index, rebuilding: {e}")
+            self._reset()
+
+    def _save(self):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        state = {
+            "version": INDEX_VERSION,
+            "root": str(self.root),
+            "paths": self._paths,
+            "files": self._files,
+            "postings": self._postings,
+            "unindexed": self._unindexed,
+            "dead": self._dead,
+            "last_refresh": self.last_refresh,
+        }
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.index_path)
+
+    # ────────────────────────────────────────────────────────────
+    # Maintenance
+    # ────────────────────────────────────────────────────────────
+
+    def _drop(self, rel_path: str):
+        entry = self._files.pop(rel_path, None)
+        if entry is None:
+            return
+        file_id = entry[0]
+        if file_id < 0:
+            self._unindexed.discard(rel_path)
+        else:
+            self._paths[file_id] = None
+            self._dead += 1
+
+    def _add(self, rel_path: str, mtime_ns: int, size: int):
+        if size > INDEX_MAX_FILE_SIZE:
+            self._files[rel_path] = (-1, mtime_ns, size)
+            self._unindexed.add(rel_path)
+            return
+
+        try:
+            with open(self.root / rel_path, "rb") as f:
+                data = f.read()
+            grams = _trigrams(normalize_text(data.decode("utf-8", errors="replace")))
+        except OSError:
+            self._files[rel_path] = (-1, mtime_ns, size)
+            self._unindexed.add(rel_path)
+            return
+
+        file_id = len(self._paths)
+        self._paths.append(rel_path)
+        self._files[rel_path] = (file_id, mtime_ns, size)
+        postings = self._postings
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = array("I", (file_id,))
+            else:
+                posting.append(file_id)
+
+    def _compact(self):
+        remap: dict[int, int] = {}
+        paths: list[Optional[str]] = []
+        for old_id, rel_path in enumerate(self._paths):
+            if rel_path is not None:
+                remap[old_id] = len(paths)
+                paths.append(rel_path)
+
+        postings = {}
+        for gram, posting in self._postings.items():
+            kept = array("I", (remap[i] for i in posting if i in remap))
+            if kept:
+                postings[gram] = kept
+
+        self._files = {
+            rel_path: (remap[file_id] if file_id >= 0 else -1, mtime_ns, size)
+            for rel_path, (file_id, mtime_ns, size) in self._files.items()
+        }
+        self._paths = paths
+        self._postings = postings
+        self._dead = 0
+        logger.info(f"Search index compacted: {len(paths)} live files")
+
+    def refresh(self, iter_files: Callable[[], Iterable[tuple[str, int, int]]]) -> dict:
+        """
+        Bring the index up to date.
+
+        Args:
+            iter_files: Callable yielding (relative_path, mtime_ns, size) for
+                every searchable file in the workspace
+
+        Returns:
+            Counts of updated and removed files
+        """
+        with self._lock:
+            started = time.time()
+            seen = set()
+            changed = []
+
+            for rel_path, mtime_ns, size in iter_files():
+                seen.add(rel_path)
+                entry = self._files.get(rel_path)
+                if entry is None or entry[1] != mtime_ns or entry[2] != size:
+                    changed.append((rel_path, mtime_ns, size))
+
+            removed = [rel_path for rel_path in self._files if rel_path not in seen]
+            for rel_path in removed:
+                self._drop(rel_path)
+
+            for rel_path, mtime_ns, size in changed:
+                self._drop(rel_path)
+                self._add(rel_path, mtime_ns, size)
+
+            if self._dead > 1000 and self._dead > len(self._paths) * COMPACT_RATIO:
+                self._compact()
+
+            self.last_refresh = time.time()
+            self._refreshed_in_process = True
+            if changed or removed:
+                try:
+                    self._save()
+                except OSError as e:
+                    logger.warning(f"Could not persist search index: {e}")
+
+            if changed or removed:
+                logger.info(
+                    f"Search index refreshed: {len(changed)} updated, "
+                    f"{len(removed)} removed in {time.time() - started:.2f}s"
+                )
+
+            return {"updated_files": len(changed), "removed_files": len(removed)}
+
+    def update_files(self, files: Iterable[tuple[str, Optional[int], Optional[int]]]):
+        """
+        Re-index specific files right after the server changed them.
+
+        Args:
+            files: (relative_path, mtime_ns, size) tuples; mtime_ns=None
+                means the file was removed (or is no longer searchable)
+        """
+        with self._lock:
+            for rel_path, mtime_ns, size in files:
+                self._drop(rel_path)
+                if mtime_ns is not None:
+                    self._add(rel_path, mtime_ns, size)
+
+    def mark_stale(self):
+        """Force the next ensure_fresh to re-walk (e.g. after lost watch events)."""
+        self.last_refresh = 0.0
+
+    def ensure_fresh(
+        self, iter_files: Callable[[], Iterable[tuple[str, int, int]]], max_age: float
+    ) -> dict:
+        """Refresh only if the last refresh is older than max_age seconds."""
+        fresh = time.time() - self.last_refresh <= max_age
+        if fresh and self._refreshed_in_process:
+            return {"refreshed": False, **self.freshness()}
+        counts = self.refresh(iter_files)
+        return {"refreshed": True, **counts, **self.freshness()}
+
+    def freshness(self) -> dict:
+        return {
+            "indexed_files": len(self._files),
+            "last_refresh": (
+                time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.last_refresh))
+                if self.last_refresh
+                else None
+            ),
+            "age_seconds": (
+                round(time.time() - self.last_refresh, 1) if self.last_refresh else None
+            ),
+        }
+
+    # ────────────────────────────────────────────────────────────
+    # Queries
+    # ────────────────────────────────────────────────────────────
+
+    def _lookup(self, literals: list[str]) -> Optional[set[int]]:
+        grams = set()
+        for literal in literals:
+            grams |= _trigrams(normalize_text(literal))
+        if not grams:
+            return None
+
+        postings = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                return set()
+            postings.append(posting)
+
+        postings.sort(key=len)
+        ids = set(postings[0])
+        for posting in postings[1:]:
+            ids.intersection_update(posting)
+            if not ids:
+                break
+        return ids
+
+    def candidates(self, query: str, regex: bool = False) -> Optional[set[str]]:
+        """
+        Relative paths of files that may match the query.
+
+        Returns None when the query has no usable trigrams (caller must
+        fall back to scanning every file).
+        """
+        literals = required_literals(query) if regex else [query]
+        with self._lock:
+            ids = self._lookup(literals)
+            if ids is None:
+                return None
+            paths = self._paths
+            result = {paths[i] for i in ids if paths[i] is not None}
+            result |= self._unindexed
+            return result
@@ -0,0 +1,411 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           SEMANTIC CODE SEARCH                                ║
+║  Offline hashed TF-IDF over code chunks (NumPy, no network)   ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Backs semantic_search_code:
+- Files are cut into chunks at top-level definitions (or every
+  CHUNK_MAX_LINES lines); identifiers are split on camelCase/snake_case
+  and lightly stemmed, so "refreshYoutubeToken" matches
+  "refresh youtube tokens"
+- Each chunk is a sparse vector of hashed terms (2^20 buckets) with
+  float16 weights; all chunks live in a few flat arrays persisted as one
+  .npz file
+- IDF is computed from the current bucket frequencies at query time, so
+  incremental updates never re-weight stored vectors
+- Queries walk only the postings of the query terms (bucket-sorted
+  arrays + searchsorted), then rank by cosine similarity
+"""
+
+import os
+import re
+import json
+import math
+import time
+import zlib
+import logging
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    SEMANTIC_AVAILABLE = True
+except ImportError:
+    SEMANTIC_AVAILABLE = False
+    logger.warning("numpy not available. Semantic code search disabled.")
+
+SEMANTIC_EXTENSIONS = {
+    ".py", ".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".vue", ".svelte",
+    ".go", ".rs", ".java", ".kt", ".rb", ".php", ".cs", ".sql", ".sh", ".md",
+}
+
+# Files larger than this are skipped (bundles, generated code, dumps)
+SEMANTIC_MAX_FILE_SIZE = 512 * 1024
+
+INDEX_VERSION = 1
+
+# Hashed term space; large enough that collisions are rare
+HASH_BITS = 20
+HASH_MASK = (1 << HASH_BITS) - 1
+
+# A chunk ends at the next top-level definition once it has CHUNK_MIN_LINES,
+# and unconditionally at CHUNK_MAX_LINES
+CHUNK_MIN_LINES = 8
+CHUNK_MAX_LINES = 60
+
+# Path segments describe a chunk too, but less than its content
+PATH_TERM_WEIGHT = 0.5
+
+_WORD = re.compile(r"[^\W\d_][\w]*")
+_SUBWORD = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[^\W\d_]+")
+_TOP_LEVEL = re.compile(
+    r"^(?:async\s+def|def|class|export|function|async\s+function|interface|type|enum|"
+    r"const\s+\w+\s*=|func|fn|pub\s+fn|impl|struct|#{1,3}\s)"
+)
+
+_STOPWORDS = frozenset(
+    """
+    a an and are as at be by do else for from if in is it of on or the to with
+    def class return self cls import export default const let var function new
+    this true false none null undefined async await try except catch finally
+    raise throw pass elif while not str int dict list bool any void string number
+    public private protected static final package func fn pub use mut impl
+    """.split()
+)
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("ed"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Search terms of a text: identifier parts, lowercased and stemmed."""
+    terms = []
+    for word in _WORD.findall(text):
+        parts = [part.lower() for part in _SUBWORD.findall(word.replace("_", " "))]
+        for part in parts:
+            if len(part) > 1 and part not in _STOPWORDS:
+                terms.append(_stem(part))
+        if len(parts) > 1:
+            terms.append("".join(parts))  # Whole identifier, for exact-name queries
+    return terms
+
+
+def _bucket(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8")) & HASH_MASK
+
+
+def split_chunks(lines: list[str]) -> list[tuple[int, int]]:
+    """(start_line, end_line) 1-based ranges covering the file."""
+    chunks = []
+    start = 0
+    for i, line in enumerate(lines):
+        length = i - start
+        if length >= CHUNK_MAX_LINES or (length >= CHUNK_MIN_LINES and _TOP_LEVEL.match(line)):
+            chunks.append((start + 1, i))
+            start = i
+    if start < len(lines):
+        chunks.append((start + 1, len(lines)))
+    return chunks
+
+
+def _chunk_vector(text: str, path_terms: Counter) -> dict[int, float]:
+    counts = Counter(_bucket(term) for term in tokenize(text))
+    if not counts:
+        return {}
+    vector = {bucket: 1.0 + math.log(count) for bucket, count in counts.items()}
+    for bucket, weight in path_terms.items():
+        vector[bucket] = vector.get(bucket, 0.0) + weight
+    return vector
+
+
+class SemanticIndex:
+    """
+    Incremental sparse TF-IDF index of code chunks.
+
+    Per-file segments are kept separately so an update only re-tokenizes
+    the files that changed; they are concatenated into flat query arrays
+    lazily, on the first search after a change.
+    """
+
+    def __init__(self, index_path: Path, root: Path):
+        self.index_path = Path(index_path)
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        # rel_path -> (mtime_ns, size, lines[n,2] int32, counts[n] int32,
+        #              buckets[nnz] int32, weights[nnz] float16)
+        self._files: dict[str, tuple] = {}
+        self._compiled = None
+        self._dirty = False
+        self.last_refresh = 0.0
+        self._refreshed_in_process = False
+        self._load()
+
+    # ────────────────────────────────────────────────────────────
+    # Persistence
+    # ────────────────────────────────────────────────────────────
+
+    def _load(self):
+        try:
+            with np.load(self.index_path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("version") != INDEX_VERSION or meta.get("root") != str(self.root):
+                    return
+                lines, counts = data["lines"], data["counts"]
+                buckets, weights = data["buckets"], data["weights"]
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Could not load semantic index, rebuilding: {e}")
+            return
+
+        chunk_at = entry_at = 0
+        for rel_path, mtime_ns, size, n_chunks in meta["files"]:
+            file_counts = counts[chunk_at:chunk_at + n_chunks]
+            nnz = int(file_counts.sum())
+            self._files[rel_path] = (
+                mtime_ns,
+                size,
+                lines[chunk_at:chunk_at + n_chunks],
+                file_counts,
+                buckets[entry_at:entry_at + nnz],
+                weights[entry_at:entry_at + nnz],
+            )
+            chunk_at += n_chunks
+            entry_at += nnz
+
+    def _save(self):
+        files = list(self._files.items())
+        meta = {
+            "version": INDEX_VERSION,
+            "root": str(self.root),
+            "files": [[path, e[0], e[1], len(e[3])] for path, e in files],
+        }
+        arrays = self._concat([e for _, e in files])
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Could not persist semantic index: {e}")
+
+    @staticmethod
+    def _concat(entries: list[tuple]) -> dict:
+        if not entries:
+            return {
+                "lines": np.zeros((0, 2), dtype=np.int32),
+                "counts": np.zeros(0, dtype=np.int32),
+                "buckets": np.zeros(0, dtype=np.int32),
+                "weights": np.zeros(0, dtype=np.float16),
+            }
+        return {
+            "lines": np.concatenate([e[2] for e in entries]),
+            "counts": np.concatenate([e[3] for e in entries]),
+            "buckets": np.concatenate([e[4] for e in entries]),
+            "weights": np.concatenate([e[5] for e in entries]),
+        }
+
+    # ────────────────────────────────────────────────────────────
+    # Maintenance
+    # ────────────────────────────────────────────────────────────
+
+    def _parse(self, rel_path: str, mtime_ns: int, size: int):
+        try:
+            with open(self.root / rel_path, "r", encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            lines = []
+
+        path_terms = Counter()
+        for term in tokenize(rel_path.replace(os.sep, " ")):
+            path_terms[_bucket(term)] = PATH_TERM_WEIGHT
+
+        ranges, counts, buckets, weights = [], [], [], []
+        for start, end in split_chunks(lines):
+            vector = _chunk_vector("\n".join(lines[start - 1:end]), path_terms)
+            if not vector:
+                continue
+            ranges.append((start, end))
+            counts.append(len(vector))
+            buckets.extend(vector.keys())
+            weights.extend(vector.values())
+
+        self._files[rel_path] = (
+            mtime_ns,
+            size,
+            np.array(ranges, dtype=np.int32).reshape(-1, 2),
+            np.array(counts, dtype=np.int32),
+            np.array(buckets, dtype=np.int32),
+            np.array(weights, dtype=np.float16),
+        )
+
+    def refresh(self, iter_files: Callable[[], Iterable[tuple[str, int, int]]]) -> dict:
+        """Re-index files whose (mtime, size) changed; drop files that are gone."""
+        with self._lock:
+            started = time.time()
+            seen = set()
+            changed = []
+            for rel_path, mtime_ns, size in iter_files():
+                seen.add(rel_path)
+                entry = self._files.get(rel_path)
+                if entry is None or entry[0] != mtime_ns or entry[1] != size:
+                    changed.append((rel_path, mtime_ns, size))
+            removed = [rel_path for rel_path in self._files if rel_path not in seen]
+
+            for rel_path in removed:
+                del self._files[rel_path]
+            for rel_path, mtime_ns, size in changed:
+                self._parse(rel_path, mtime_ns, size)
+
+            self.last_refresh = time.time()
+            self._refreshed_in_process = True
+            if changed or removed or self._dirty:
+                self._compiled = None
+                self._save()
+                logger.info(
+                    f"Semantic index refreshed: {len(changed)} indexed, "
+                    f"{len(removed)} removed in {time.time() - started:.2f}s"
+                )
+            return {"indexed_files": len(changed), "removed_files": len(removed)}
+
+    def ensure_fresh(
+        self, iter_files: Callable[[], Iterable[tuple[str, int, int]]], max_age: float
+    ) -> dict:
+        """Refresh only if the last refresh is older than max_age seconds."""
+        if self._refreshed_in_process and time.time() - self.last_refresh <= max_age:
+            return {"refreshed": False}
+        return {"refreshed": True, **self.refresh(iter_files)}
+
+    def mark_stale(self):
+        self.last_refresh = 0.0
+
+    def update_files(self, files: Iterable[tuple[str, Optional[int], Optional[int]]]):
+        """Re-index specific files now; mtime_ns=None removes the file."""
+        with self._lock:
+            for rel_path, mtime_ns, size in files:
+                if mtime_ns is None:
+                    self._files.pop(rel_path, None)
+                else:
+                    self._parse(rel_path, mtime_ns, size)
+            self._compiled = None
+            self._dirty = True  # Persisted on the next refresh
+
+    # ────────────────────────────────────────────────────────────
+    # Queries
+    # ────────────────────────────────────────────────────────────
+
+    def _compile(self) -> dict:
+        """Flat, bucket-sorted postings plus per-chunk norms under current IDF."""
+        paths = list(self._files)
+        entries = [self._files[path] for path in paths]
+        arrays = self._concat(entries)
+        counts = arrays["counts"]
+        n_chunks = len(counts)
+
+        chunk_file = np.repeat(
+            np.arange(len(paths), dtype=np.int32),
+            np.array([len(e[3]) for e in entries], dtype=np.int64),
+        )
+        rows = np.repeat(np.arange(n_chunks, dtype=np.int32), counts)
+        buckets = arrays["buckets"]
+
+        # Every chunk lists a bucket at most once, so bincount is the DF
+        df = np.bincount(buckets, minlength=HASH_MASK + 1).astype(np.float32)
+        idf = np.log((n_chunks + 1) / (df + 1)) + 1.0
+        weights = arrays["weights"].astype(np.float32) * idf[buckets]
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=n_chunks))
+
+        order = np.argsort(buckets, kind="stable")
+        return {
+            "paths": paths,
+            "chunk_file": chunk_file,
+            "lines": arrays["lines"],
+            "idf": idf,
+            "norms": np.maximum(norms, 1e-9),
+            "sorted_buckets": buckets[order],
+            "sorted_rows": rows[order],
+            "sorted_weights": weights[order],
+        }
+
+    def search(self, query: str, path_prefix: str = "", limit: int = 10) -> list[dict]:
+        """Chunks most similar to query, best first."""
+        terms = Counter(_bucket(term) for term in tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            if self._compiled is None:
+                self._compiled = self._compile()
+            compiled = self._compiled
+        n_chunks = len(compiled["norms"])
+        if not n_chunks:
+            return []
+
+        query_buckets = np.array(sorted(terms), dtype=np.int32)
+        query_weights = np.array(
+            [1.0 + math.log(terms[b]) for b in sorted(terms)], dtype=np.float32
+        ) * compiled["idf"][query_buckets]
+
+        sorted_buckets = compiled["sorted_buckets"]
+        starts = np.searchsorted(sorted_buckets, query_buckets, side="left")
+        ends = np.searchsorted(sorted_buckets, query_buckets, side="right")
+        scores = np.zeros(n_chunks, dtype=np.float32)
+        matched = np.zeros(n_chunks, dtype=np.int32)
+        for start, end, weight in zip(starts, ends, query_weights):
+            if start == end:
+                continue
+            rows = compiled["sorted_rows"][start:end]
+            scores[rows] += compiled["sorted_weights"][start:end] * weight
+            matched[rows] += 1
+        scores /= compiled["norms"] * float(np.linalg.norm(query_weights))
+
+        if path_prefix:
+            allowed = np.array(
+                [path.startswith(path_prefix) for path in compiled["paths"]], dtype=bool
+            )
+            scores[~allowed[compiled["chunk_file"]]] = 0.0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            top = np.argpartition(-scores[candidates], limit)[:limit]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        results = []
+        for chunk in candidates:
+            start_line, end_line = compiled["lines"][chunk]
+            results.append(
+                {
+                    "file": compiled["paths"][compiled["chunk_file"][chunk]],
+                    "start_line": int(start_line),
+                    "end_line": int(end_line),
+                    "score": round(float(scores[chunk]), 4),
+                    "matched_terms": int(matched[chunk]),
+                }
+            )
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = list(self._files.values())
+        return {
+            "files": len(entries),
+            "chunks": sum(len(e[3]) for e in entries),
+            "postings": sum(len(e[4]) for e in entries),
+        }
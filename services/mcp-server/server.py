@@ -15,11 +15,15 @@ Port: 3002 (configured in .env as MCP_PORT)
 """
 
 import os
+import re
 import sys
 import json
 import subprocess
 import asyncio
 import logging
+import time
+import codecs
+import inspect
 from pathlib import Path
 from typing import Any, Optional
 from datetime import datetime
@@ -32,7 +36,7 @@ if sys.platform == "win32":
 # Add parent directory for config access
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 
 # ════════════════════════════════════════════════════════════
 # CONFIGURATION
@@ -152,11 +156,44 @@ ALLOWED_EXTENSIONS = [
 # Maximum file size to read (5MB)
 MAX_FILE_SIZE = 5 * 1024 * 1024
 
+# Worker threads for blocking file-system work (see io_executor.py)
+IO_WORKERS = int(os.getenv("MCP_IO_WORKERS", "16"))
+
+# Server-side caches (search index, ...) - never inside the workspace
+CACHE_DIR = Path(os.getenv("MCP_CACHE_DIR", str(Path(__file__).parent / ".mcp-cache")))
+
+# Trigram index used by search_files (set MCP_SEARCH_INDEX=0 to disable)
+SEARCH_INDEX_ENABLED = os.getenv("MCP_SEARCH_INDEX", "1") != "0"
+
+# Seconds before search_files re-walks the workspace to refresh the index
+SEARCH_INDEX_MAX_AGE = float(os.getenv("MCP_SEARCH_INDEX_MAX_AGE", "30"))
+
+# Size cap for file snapshots kept for undo_edit (oldest evicted first)
+SNAPSHOT_MAX_BYTES = int(os.getenv("MCP_SNAPSHOT_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Workspace file watcher: "1" = inotify (off where unavailable), "auto" = inotify
+# or polling, "poll", "0" = off. Polling re-walks the workspace every interval,
+# so without inotify the caches' own max-age re-walks are cheaper
+WATCH_MODE = os.getenv("MCP_WATCH", "1")
+
+# Seconds between scans when the watcher is polling
+WATCH_POLL_INTERVAL = float(os.getenv("MCP_WATCH_INTERVAL", "5"))
+
+# Characters of output kept per background command (older output is dropped)
+JOB_OUTPUT_MAX_CHARS = int(os.getenv("MCP_JOB_OUTPUT_CHARS", str(1_000_000)))
+
+# Commands (builds, tests, scripts) allowed to run at once; default: CPU cores
+COMMAND_CPU_SLOTS = int(os.getenv("MCP_COMMAND_SLOTS", str(os.cpu_count() or 4)))
+
+# Size cap for cached build outputs (npm run build & co.); 0 disables the cache
+BUILD_CACHE_MAX_BYTES = int(os.getenv("MCP_BUILD_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
 # Logging configuration with UTF-8 encoding for Windows
 log_formatter = logging.Formatter("%(asctime)s [MCP] %(levelname)s: %(message)s")
 
 # File handler with UTF-8
-file_handler = logging.FileHandler(Path(__file__).parent / "mcp-server.log", encoding="utf-8")
+LOG_FILE = Path(__file__).parent / "mcp-server.log"
+file_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
 file_handler.setFormatter(log_formatter)
 
 # Stream handler with UTF-8 for Windows
@@ -202,6 +239,15 @@ mcp = FastMCP(
 # SECURITY HELPERS
 # ════════════════════════════════════════════════════════════
 
+from workspace_walker import PathMatcher, WorkspaceWalker, compile_name_pattern
+
+# Block lists compiled once; shared by is_path_safe and the workspace walker
+path_matcher = PathMatcher(BLOCKED_FOLDERS, BLOCKED_EXTENSIONS)
+
+# The server's own cache and log may sit inside the workspace; never walk or watch them
+SERVER_OWN_PATHS = [CACHE_DIR, LOG_FILE]
+workspace_walker = WorkspaceWalker(WORKSPACE_ROOT, path_matcher, ignore=SERVER_OWN_PATHS)
+
 
 def is_path_safe(file_path: str) -> tuple[bool, str]:
     """
@@ -217,12 +263,9 @@ def is_path_safe(file_path: str) -> tuple[bool, str]:
             return False, f"Path must be within workspace: {WORKSPACE_ROOT}"
 
         # Check blocked folders
-        path_parts = str(resolved).replace("\\", "/").lower()
-        for blocked in BLOCKED_FOLDERS:
-            if f"/{blocked.lower()}/" in path_parts or path_parts.endswith(
-                f"/{blocked.lower()}"
-            ):
-                return False, f"Access denied: {blocked} is a protected path"
+        blocked = path_matcher.blocked_folder(resolved.parts)
+        if blocked:
+            return False, f"Access denied: {blocked} is a protected path"
 
         return True, ""
     except Exception as e:
@@ -238,7 +281,7 @@ def is_extension_allowed(file_path: str, for_write: bool = False) -> tuple[bool,
     name = path.name.lower()
 
     # Check blocked extensions
-    if ext in BLOCKED_EXTENSIONS:
+    if path_matcher.extension_blocked(path.name):
         return False, f"File type {ext} is not allowed"
 
     # For writing, must be in allowed list
@@ -265,22 +308,60 @@ def format_size(size: int) -> str:
 # CORE TOOLS: File Operations
 # ════════════════════════════════════════════════════════════
 
+from io_executor import BoundedIOExecutor
+
+# Blocking file-system work never runs on the event loop. Slow tools get a
+# low concurrency cap so they can't occupy every worker and stall reads.
+io_executor = BoundedIOExecutor(
+    max_workers=IO_WORKERS,
+    limits={
+        "read_file": 16,
+        "write_file": 8,
+        "delete_file": 4,
+        "list_files": 4,
+        "search_files": 2,
+        "search_many": 2,
+        "replace_in_workspace": 1,
+        "select_tests": 2,
+        "build_cache": 2,
+        "git": 8,
+        "git_history": 2,
+        "semantic_search_code": 2,
+    },
+)
 
-@mcp.tool()
-async def read_file(file_path: str, start_line: int = 1, end_line: int = None) -> dict:
-    """
-    Read contents of a file in the workspace.
 
-    Args:
-        file_path: Path to file (absolute or relative to workspace root)
-        start_line: Starting line number (1-indexed, default: 1)
-        end_line: Ending line number (optional, reads to end if not specified)
+from line_index import LineIndexCache
+
+# Line-number -> byte-offset maps for ranged reads, keyed by (path, mtime, size)
+line_index_cache = LineIndexCache(CACHE_DIR / "line-index")
+
+
+def _count_lines(text: str) -> int:
+    """Number of lines as readlines() would split them."""
+    if not text:
+        return 0
+    return text.count("\n") + (0 if text.endswith("\n") else 1)
 
-    Returns:
-        File contents with metadata
-    """
-    logger.info(f"📖 read_file: {file_path}")
 
+def _decode_head(data: bytes) -> str:
+    """Decode bytes cut at an arbitrary point, dropping a split trailing character."""
+    return codecs.getincrementaldecoder("utf-8")(errors="replace").decode(data)
+
+
+def _read_file_sync(
+    file_path: str,
+    start_line: int = 1,
+    end_line: int = None,
+    byte_offset: int = None,
+    byte_length: int = None,
+    max_bytes: int = None,
+) -> dict:
+    """
+    Blocking body of read_file (runs on the I/O executor). max_bytes caps
+    what line modes read from disk (read_files' remaining budget); content
+    cut short by it is marked truncated.
+    """
     try:
         # Resolve path
         if not os.path.isabs(file_path):
@@ -302,31 +383,106 @@ async def read_file(file_path: str, start_line: int = 1, end_line: int = None) -
         if not path.is_file():
             return {"success": False, "error": f"Not a file: {file_path}"}
 
+        stat = path.stat()
+        size = stat.st_size
+
+        # Byte-range mode: any file size, bounded slice
+        if byte_offset is not None:
+            if byte_length is not None and byte_length <= 0:
+                return {
+                    "success": False,
+                    "error": f"byte_length must be positive (max {MAX_FILE_SIZE} bytes)",
+                }
+            offset = max(0, byte_offset)
+            length = max(1, min(byte_length or MAX_FILE_SIZE, MAX_FILE_SIZE))
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read(length)
+
+            return {
+                "success": True,
+                "file_path": str(path),
+                "content": data.decode("utf-8", errors="replace"),
+                "byte_offset": offset,
+                "bytes_read": len(data),
+                "next_offset": offset + len(data),
+                "eof": offset + len(data) >= size,
+                "size": format_size(size),
+            }
+
+        # Ranged read: seek to the byte span of the requested lines
+        if start_line > 1 or end_line:
+            index = line_index_cache.get(path, stat)
+            total_lines = index.total_lines
+            first = max(1, start_line)
+            last = min(end_line or total_lines, total_lines)
+
+            content = ""
+            truncated = False
+            if first <= last:
+                begin, end = index.byte_range(first, last)
+                if end - begin > MAX_FILE_SIZE:
+                    return {
+                        "success": False,
+                        "error": f"Requested range too large ({format_size(end - begin)}). Max: {format_size(MAX_FILE_SIZE)}",
+                    }
+                truncated = max_bytes is not None and end - begin > max_bytes
+                with open(path, "rb") as f:
+                    f.seek(begin)
+                    data = f.read(max_bytes if truncated else end - begin)
+                if truncated:
+                    content = _decode_head(data)
+                else:
+                    content = data.decode("utf-8", errors="replace")
+                content = content.replace("\r\n", "\n")
+                if truncated:
+                    last = first + _count_lines(content) - 1
+
+            result = {
+                "success": True,
+                "file_path": str(path),
+                "content": content,
+                "total_lines": total_lines,
+                "lines_read": f"{start_line}-{last}",
+                "size": format_size(size),
+            }
+            if truncated:
+                result["truncated"] = True
+            return result
+
         # Check file size
-        size = path.stat().st_size
         if size > MAX_FILE_SIZE:
             return {
                 "success": False,
-                "error": f"File too large ({format_size(size)}). Max: {format_size(MAX_FILE_SIZE)}",
+                "error": f"File too large ({format_size(size)}). Max: {format_size(MAX_FILE_SIZE)}. Use start_line/end_line or byte_offset to read part of it",
+            }
+
+        if max_bytes is not None and size > max_bytes:
+            # Only the head fits the caller's budget; read no more than that
+            with open(path, "rb") as f:
+                data = f.read(max_bytes)
+            content = _decode_head(data).replace("\r\n", "\n").replace("\r", "\n")
+            return {
+                "success": True,
+                "file_path": str(path),
+                "content": content,
+                "lines_read": f"1-{_count_lines(content)}",
+                "size": format_size(size),
+                "truncated": True,
             }
 
         # Read file
         with open(path, "r", encoding="utf-8", errors="replace") as f:
-            lines = f.readlines()
-
-        total_lines = len(lines)
-        start_idx = max(0, start_line - 1)
-        end_idx = end_line if end_line else total_lines
+            content = f.read()
 
-        selected_lines = lines[start_idx:end_idx]
-        content = "".join(selected_lines)
+        total_lines = _count_lines(content)
 
         return {
             "success": True,
             "file_path": str(path),
             "content": content,
             "total_lines": total_lines,
-            "lines_read": f"{start_line}-{min(end_idx, total_lines)}",
+            "lines_read": f"{start_line}-{total_lines}",
             "size": format_size(size),
         }
 
@@ -335,22 +491,284 @@ async def read_file(file_path: str, start_line: int = 1, end_line: int = None) -
         return {"success": False, "error": str(e)}
 
 
+def _read_span_sync(file_path: str, start_line: int = 1, end_line: int = None) -> int:
+    """
+    Bytes _read_file_sync will read for this line range (the whole file by
+    default); 0 when the read is going to fail. Used to split read_files'
+    budget before reading.
+    """
+    try:
+        if not os.path.isabs(file_path):
+            file_path = str(WORKSPACE_ROOT / file_path)
+        if not is_path_safe(file_path)[0] or not is_extension_allowed(file_path)[0]:
+            return 0
+        path = Path(file_path)
+        stat = path.stat()
+        if not path.is_file():
+            return 0
+        if start_line > 1 or end_line:
+            index = line_index_cache.get(path, stat)
+            first = max(1, start_line)
+            last = min(end_line or index.total_lines, index.total_lines)
+            if first > last:
+                return 0
+            begin, end = index.byte_range(first, last)
+            return end - begin if end - begin <= MAX_FILE_SIZE else 0
+        return stat.st_size if stat.st_size <= MAX_FILE_SIZE else 0
+    except Exception:
+        return 0  # The read reports the error
+
+
 @mcp.tool()
-async def write_file(file_path: str, content: str, create_dirs: bool = True) -> dict:
+async def read_file(
+    file_path: str,
+    start_line: int = 1,
+    end_line: int = None,
+    byte_offset: int = None,
+    byte_length: int = None,
+) -> dict:
     """
-    Write content to a file in the workspace.
-    Creates parent directories if needed.
+    Read contents of a file in the workspace.
+
+    Line ranges seek straight to the requested lines using a cached line
+    index. Byte-range mode reads a slice of any file, even one larger than
+    the size limit (useful for big logs).
 
     Args:
         file_path: Path to file (absolute or relative to workspace root)
-        content: Content to write
-        create_dirs: Create parent directories if they don't exist (default: True)
+        start_line: Starting line number (1-indexed, default: 1)
+        end_line: Ending line number (optional, reads to end if not specified)
+        byte_offset: Read raw bytes from this offset instead of lines (optional)
+        byte_length: Number of bytes for byte-range mode (default/max: size limit)
 
     Returns:
-        Success status and file info
+        File contents with metadata
     """
-    logger.info(f"✏️ write_file: {file_path}")
+    logger.info(f"📖 read_file: {file_path}")
+
+    return await io_executor.run(
+        "read_file",
+        _read_file_sync,
+        file_path,
+        start_line,
+        end_line,
+        byte_offset,
+        byte_length,
+    )
+
+
+# Aggregate content budget for one read_files call (1MB)
+READ_FILES_MAX_BYTES = 1024 * 1024
+
+# Maximum number of files in one read_files call
+READ_FILES_MAX_COUNT = 50
+
+
+@mcp.tool()
+async def read_files(files: list[str | dict], max_total_bytes: int = 0) -> dict:
+    """
+    Read many files in one call (one round-trip instead of one per file).
+    Files are read concurrently with the same security checks as read_file.
+    The byte budget is handed out in request order from each file's size
+    (or line range span) before anything is read; files past the budget
+    are not read at all.
+
+    Args:
+        files: Paths, or objects like {"path": "src/app.ts", "start_line": 10, "end_line": 80}
+        max_total_bytes: Total content budget across all files (default/max: 1MB)
+
+    Returns:
+        Per-file results (content or error) in request order
+    """
+    logger.info(f"📚 read_files: {len(files)} files")
+
+    if len(files) > READ_FILES_MAX_COUNT:
+        return {
+            "success": False,
+            "error": f"Too many files ({len(files)}). Max: {READ_FILES_MAX_COUNT}",
+        }
+
+    budget = min(max_total_bytes or READ_FILES_MAX_BYTES, READ_FILES_MAX_BYTES)
+
+    requests = []
+    for item in files:
+        if isinstance(item, str):
+            requests.append({"path": item})
+        elif isinstance(item, dict) and item.get("path"):
+            requests.append(item)
+        else:
+            requests.append({"path": "", "error": f"Invalid file entry: {item!r}"})
+
+    async def span(request: dict) -> int:
+        if request.get("error"):
+            return 0
+        return await io_executor.run(
+            "read_file",
+            _read_span_sync,
+            request["path"],
+            request.get("start_line") or 1,
+            request.get("end_line"),
+        )
+
+    # Hand out the byte budget in request order, before reading
+    spans = await asyncio.gather(*(span(request) for request in requests))
+    caps: list[Optional[int]] = []
+    remaining = budget
+    for request, needed in zip(requests, spans):
+        if request.get("error") or (needed and remaining <= 0):
+            caps.append(None)  # Not read
+            continue
+        caps.append(min(needed, remaining))
+        remaining -= caps[-1]
+
+    async def read_one(request: dict, cap: Optional[int]) -> Optional[dict]:
+        if cap is None:
+            return None
+        return await io_executor.run(
+            "read_file",
+            _read_file_sync,
+            request["path"],
+            request.get("start_line") or 1,
+            request.get("end_line"),
+            None,
+            None,
+            cap,
+        )
+
+    results = await asyncio.gather(
+        *(read_one(request, cap) for request, cap in zip(requests, caps))
+    )
+
+    remaining = budget
+    used = 0
+    budget_exhausted = False
+    output = []
+    for request, result in zip(requests, results):
+        if request.get("error"):
+            output.append(
+                {"path": request["path"], "success": False, "error": request["error"]}
+            )
+            continue
+        if result is None:
+            output.append(
+                {
+                    "path": request["path"],
+                    "success": False,
+                    "error": "Byte budget exhausted; request this file separately",
+                }
+            )
+            budget_exhausted = True
+            continue
+
+        entry = {"path": request["path"], **result}
+        if result.get("success"):
+            data = result["content"].encode("utf-8")
+            # Replacement characters, or a file that grew since it was
+            # sized, can make the text longer than its share of the budget
+            if len(data) > remaining:
+                data = data[:remaining]
+                entry["content"] = data.decode("utf-8", errors="ignore")
+                entry["truncated"] = True
+            used += len(data)
+            remaining -= len(data)
+            if entry.get("truncated"):
+                budget_exhausted = True
+        output.append(entry)
+
+    return {
+        "success": True,
+        "count": len(output),
+        "errors": sum(1 for entry in output if not entry.get("success")),
+        "total_bytes": used,
+        "max_total_bytes": budget,
+        "budget_exhausted": budget_exhausted,
+        "files": output,
+    }
+
+
+from snapshot_store import MAX_SNAPSHOTS_PER_FILE, SnapshotStore
+
+# Previous versions of files changed by write/edit/delete, for undo_edit
+snapshot_store = SnapshotStore(CACHE_DIR / "snapshots", SNAPSHOT_MAX_BYTES)
+
+
+from patch_apply import (
+    FileChange,
+    PatchError,
+    PathLocks,
+    apply_hunks,
+    apply_text_edit,
+    commit_changes,
+    parse_unified_diff,
+    write_replace,
+)
+
+# Serializes writers of the same file (write/delete/apply_patch)
+path_locks = PathLocks()
+
+
+def _snapshot_key(path: Path) -> str:
+    """Workspace-relative key used for a file's snapshot journal."""
+    try:
+        return path.resolve().relative_to(WORKSPACE_ROOT.resolve()).as_posix()
+    except ValueError:
+        return str(path.resolve())
+
+
+def _skipped_snapshot(size: int) -> dict:
+    return {
+        "id": None,
+        "skipped": f"Previous version too large to snapshot ({format_size(size)}, "
+        f"max {format_size(MAX_FILE_SIZE)}); this change cannot be undone",
+    }
+
 
+def _take_snapshot(path: Path, op: str) -> Optional[dict]:
+    """
+    Snapshot path's current bytes (one read) before op changes it. Files
+    above MAX_FILE_SIZE are not read; the returned entry then has no id
+    and a "skipped" reason instead.
+    """
+    try:
+        data = None
+        if path.is_file():
+            size = path.stat().st_size
+            if size > MAX_FILE_SIZE:
+                return _skipped_snapshot(size)
+            with open(path, "rb") as f:
+                data = f.read()
+        return snapshot_store.snapshot(_snapshot_key(path), data, op)
+    except Exception as e:
+        logger.warning(f"Snapshot failed for {path}: {e}")
+        return None
+
+
+def _record_snapshot(path: Path, data: Optional[bytes], op: str) -> Optional[dict]:
+    """
+    Like _take_snapshot, for bytes already read before op changed path.
+    Never raises: the change has been made by the time this runs.
+    """
+    try:
+        if data is not None and len(data) > MAX_FILE_SIZE:
+            return _skipped_snapshot(len(data))
+        return snapshot_store.snapshot(_snapshot_key(path), data, op)
+    except Exception as e:
+        logger.warning(f"Snapshot failed for {path}: {e}")
+        return None
+
+
+def _snapshot_fields(snapshot: Optional[dict]) -> dict:
+    """snapshot_id (and snapshot_skipped when there is none) for a tool result."""
+    fields = {"snapshot_id": snapshot["id"] if snapshot else None}
+    if snapshot and "skipped" in snapshot:
+        fields["snapshot_skipped"] = snapshot["skipped"]
+    return fields
+
+
+def _write_file_sync(
+    file_path: str, content: str, create_dirs: bool = True, op: str = "write"
+) -> dict:
+    """Blocking body of write_file/edit_file (runs on the I/O executor)."""
     try:
         # Resolve path
         if not os.path.isabs(file_path):
@@ -371,16 +789,15 @@ async def write_file(file_path: str, content: str, create_dirs: bool = True) ->
         if create_dirs:
             path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Backup existing file
-        existed = path.exists()
-        backup_content = None
-        if existed:
-            with open(path, "r", encoding="utf-8", errors="replace") as f:
-                backup_content = f.read()
+        with path_locks.hold([path]):
+            # Snapshot the previous content so the write can be undone
+            existed = path.exists()
+            snapshot = _take_snapshot(path, op)
 
-        # Write file
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(content)
+            # Write file
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+        _reindex_files([path])
 
         lines = content.count("\n") + 1
         size = len(content.encode("utf-8"))
@@ -393,7 +810,8 @@ async def write_file(file_path: str, content: str, create_dirs: bool = True) ->
             "action": "updated" if existed else "created",
             "lines": lines,
             "size": format_size(size),
-            "backed_up": existed,
+            "backed_up": existed and bool(snapshot and snapshot["id"]),
+            **_snapshot_fields(snapshot),
         }
 
     except Exception as e:
@@ -401,6 +819,27 @@ async def write_file(file_path: str, content: str, create_dirs: bool = True) ->
         return {"success": False, "error": str(e)}
 
 
+@mcp.tool()
+async def write_file(file_path: str, content: str, create_dirs: bool = True) -> dict:
+    """
+    Write content to a file in the workspace.
+    Creates parent directories if needed.
+
+    Args:
+        file_path: Path to file (absolute or relative to workspace root)
+        content: Content to write
+        create_dirs: Create parent directories if they don't exist (default: True)
+
+    Returns:
+        Success status and file info
+    """
+    logger.info(f"✏️ write_file: {file_path}")
+
+    return await io_executor.run(
+        "write_file", _write_file_sync, file_path, content, create_dirs
+    )
+
+
 @mcp.tool()
 async def edit_file(file_path: str, old_text: str, new_text: str) -> dict:
     """
@@ -445,8 +884,10 @@ async def edit_file(file_path: str, old_text: str, new_text: str) -> dict:
         # Replace
         new_content = content.replace(old_text, new_text, 1)
 
-        # Write back
-        write_result = await write_file(file_path, new_content)
+        # Write back (snapshot recorded as an edit)
+        write_result = await io_executor.run(
+            "write_file", _write_file_sync, file_path, new_content, True, "edit"
+        )
         if not write_result.get("success"):
             return write_result
 
@@ -454,6 +895,11 @@ async def edit_file(file_path: str, old_text: str, new_text: str) -> dict:
             "success": True,
             "file_path": file_path,
             "action": "edited",
+            **{
+                key: value
+                for key, value in write_result.items()
+                if key in ("snapshot_id", "snapshot_skipped")
+            },
             "old_text_preview": (
                 old_text[:100] + "..." if len(old_text) > 100 else old_text
             ),
@@ -467,27 +913,8 @@ async def edit_file(file_path: str, old_text: str, new_text: str) -> dict:
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
-async def delete_file(file_path: str, confirm: bool = False) -> dict:
-    """
-    Delete a file from the workspace.
-
-    Args:
-        file_path: Path to file
-        confirm: Must be True to actually delete
-
-    Returns:
-        Success status
-    """
-    logger.info(f"🗑️ delete_file: {file_path}")
-
-    if not confirm:
-        return {
-            "success": False,
-            "error": "Deletion not confirmed. Set confirm=True to delete.",
-            "file_path": file_path,
-        }
-
+def _delete_file_sync(file_path: str) -> dict:
+    """Blocking body of delete_file (runs on the I/O executor)."""
     try:
         if not os.path.isabs(file_path):
             file_path = str(WORKSPACE_ROOT / file_path)
@@ -506,188 +933,1630 @@ async def delete_file(file_path: str, confirm: bool = False) -> dict:
                 "error": "Cannot delete directories with this tool",
             }
 
-        path.unlink()
+        with path_locks.hold([path]):
+            snapshot = _take_snapshot(path, "delete")
+            path.unlink()
+        _reindex_files([path])
         logger.info(f"[OK] Deleted: {file_path}")
 
-        return {"success": True, "action": "deleted", "file_path": str(path)}
+        return {
+            "success": True,
+            "action": "deleted",
+            "file_path": str(path),
+            **_snapshot_fields(snapshot),
+        }
 
     except Exception as e:
         logger.error(f"delete_file error: {e}")
         return {"success": False, "error": str(e)}
 
 
-# ════════════════════════════════════════════════════════════
-# CORE TOOLS: Search
-# ════════════════════════════════════════════════════════════
-
-
 @mcp.tool()
-async def search_files(
-    query: str, path: str = "", file_pattern: str = "*", max_results: int = 50
-) -> dict:
+async def delete_file(file_path: str, confirm: bool = False) -> dict:
     """
-    Search for text content in files.
+    Delete a file from the workspace.
 
     Args:
-        query: Text to search for (case-insensitive)
-        path: Folder to search in (relative to workspace, default: entire workspace)
-        file_pattern: Glob pattern for files (e.g., "*.py", "*.js")
-        max_results: Maximum results to return (default: 50)
+        file_path: Path to file
+        confirm: Must be True to actually delete
 
     Returns:
-        List of matches with file paths and context
+        Success status
     """
-    logger.info(f"[SEARCH] search_files: '{query}' in {path or 'workspace'}")
-
-    try:
-        search_path = WORKSPACE_ROOT / path if path else WORKSPACE_ROOT
-
-        is_safe, error = is_path_safe(str(search_path))
-        if not is_safe:
-            return {"success": False, "error": error}
+    logger.info(f"🗑️ delete_file: {file_path}")
 
-        if not search_path.exists():
-            return {"success": False, "error": f"Path not found: {path}"}
+    if not confirm:
+        return {
+            "success": False,
+            "error": "Deletion not confirmed. Set confirm=True to delete.",
+            "file_path": file_path,
+        }
 
-        results = []
-        files_searched = 0
-        query_lower = query.lower()
+    return await io_executor.run("delete_file", _delete_file_sync, file_path)
 
-        for file_path in search_path.rglob(file_pattern):
-            if not file_path.is_file():
-                continue
 
-            # Skip blocked paths
-            is_safe, _ = is_path_safe(str(file_path))
-            if not is_safe:
-                continue
+def _snapshot_info(entry: dict) -> dict:
+    return {
+        "snapshot_id": entry["id"],
+        "file": entry["file"],
+        "op": entry["op"],
+        "time": datetime.fromtimestamp(entry["time"]).strftime("%Y-%m-%d %H:%M:%S"),
+        "existed": entry["hash"] is not None,
+        "size": format_size(entry["size"]),
+    }
 
-            is_allowed, _ = is_extension_allowed(str(file_path))
-            if not is_allowed:
-                continue
 
-            # Skip large files
-            if file_path.stat().st_size > MAX_FILE_SIZE:
-                continue
+def _undo_edit_sync(file_path: str, snapshot_id: str = "") -> dict:
+    """Blocking body of undo_edit (runs on the I/O executor)."""
+    try:
+        if not os.path.isabs(file_path):
+            file_path = str(WORKSPACE_ROOT / file_path)
 
-            files_searched += 1
+        is_safe, error = is_path_safe(file_path)
+        if not is_safe:
+            return {"success": False, "error": error}
 
+        path = Path(file_path)
+        key = _snapshot_key(path)
+        with path_locks.hold([path]):
             try:
-                with open(file_path, "r", encoding="utf-8", errors="replace") as f:
-                    for line_num, line in enumerate(f, 1):
-                        if query_lower in line.lower():
-                            results.append(
-                                {
-                                    "file": str(file_path.relative_to(WORKSPACE_ROOT)),
-                                    "line": line_num,
-                                    "content": line.strip()[:200],
-                                }
-                            )
-
-                            if len(results) >= max_results:
-                                break
-
-                if len(results) >= max_results:
-                    break
+                entry, data = snapshot_store.get(key, snapshot_id or None)
+            except KeyError as e:
+                return {"success": False, "error": e.args[0]}
+
+            if data is None:
+                # The file did not exist before the change
+                if path.is_file():
+                    path.unlink()
+                action = "removed"
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                mode = path.stat().st_mode if path.is_file() else None
+                write_replace(path, data, mode)
+                action = "restored"
+            # Only consumed once the file is back
+            snapshot_store.drop(key, entry["id"])
+        _reindex_files([path])
 
-            except Exception:
-                continue
+        logger.info(f"[OK] Undo {entry['op']} on {file_path}: {action}")
 
         return {
             "success": True,
-            "query": query,
-            "files_searched": files_searched,
-            "matches": len(results),
-            "results": results,
-            "truncated": len(results) >= max_results,
+            "action": action,
+            "file_path": str(path),
+            "restored": _snapshot_info(entry),
+            "remaining": len(snapshot_store.list(entry["file"], limit=MAX_SNAPSHOTS_PER_FILE)),
         }
 
     except Exception as e:
-        logger.error(f"search_files error: {e}")
+        logger.error(f"undo_edit error: {e}")
         return {"success": False, "error": str(e)}
 
 
 @mcp.tool()
-async def list_files(
-    path: str = "",
+async def undo_edit(file_path: str, snapshot_id: str = "") -> dict:
+    """
+    Undo write_file/edit_file/delete_file changes to a file.
+
+    Restores the content the file had before the most recent change (or
+    before the change that created snapshot_id). That snapshot and any
+    newer ones are consumed, so calling again steps further back.
+
+    Args:
+        file_path: Path to file
+        snapshot_id: Snapshot to restore (default: the most recent)
+
+    Returns:
+        Restored snapshot info
+    """
+    logger.info(f"↩️ undo_edit: {file_path}")
+
+    return await io_executor.run("undo_edit", _undo_edit_sync, file_path, snapshot_id)
+
+
+def _list_snapshots_sync(file_path: str = "", limit: int = 20) -> dict:
+    """Blocking body of list_snapshots (runs on the I/O executor)."""
+    try:
+        key = None
+        if file_path:
+            if not os.path.isabs(file_path):
+                file_path = str(WORKSPACE_ROOT / file_path)
+            is_safe, error = is_path_safe(file_path)
+            if not is_safe:
+                return {"success": False, "error": error}
+            key = _snapshot_key(Path(file_path))
+
+        snapshots = [_snapshot_info(entry) for entry in snapshot_store.list(key, limit)]
+        return {
+            "success": True,
+            "file_path": file_path or None,
+            "count": len(snapshots),
+            "snapshots": snapshots,
+            "store": snapshot_store.stats(),
+        }
+
+    except Exception as e:
+        logger.error(f"list_snapshots error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+async def list_snapshots(file_path: str = "", limit: int = 20) -> dict:
+    """
+    List snapshots available to undo_edit, newest first.
+
+    Args:
+        file_path: Only this file's snapshots (default: all files)
+        limit: Maximum snapshots to return (default: 20)
+
+    Returns:
+        Snapshots with id, operation, time and size
+    """
+    logger.info(f"🕘 list_snapshots: {file_path or 'all files'}")
+
+    return await io_executor.run("list_snapshots", _list_snapshots_sync, file_path, limit)
+
+
+# Maximum number of files one apply_patch call may touch
+APPLY_PATCH_MAX_FILES = 200
+
+
+def _decode_for_patch(raw: Optional[bytes], rel: str) -> tuple[Optional[str], str]:
+    """(text with \n line endings, original newline) of a file's bytes."""
+    if raw is None:
+        return None, "\n"
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        raise PatchError(f"{rel}: not a UTF-8 text file")
+    newline = "\r\n" if "\r\n" in text else "\n"
+    return text.replace("\r\n", "\n"), newline
+
+
+def _apply_file_ops(text: Optional[str], ops: list[tuple], rel: str) -> Optional[str]:
+    """Apply one file's diff/edit operations in memory (None = file absent)."""
+    for op in ops:
+        if op[0] == "diff":
+            file_patch = op[1]
+            if file_patch.old_path is None:
+                if text is not None:
+                    raise PatchError(f"{rel}: file already exists")
+                text = ""
+            elif text is None:
+                raise PatchError(f"{rel}: file not found")
+            text = apply_hunks(text, file_patch.hunks, rel)
+            if file_patch.new_path is None:
+                if text:
+                    raise PatchError(f"{rel}: delete patch does not remove all content")
+                text = None
+        else:
+            _, old_text, new_text = op
+            if text is None:
+                if old_text:
+                    raise PatchError(f"{rel}: file not found")
+                text = new_text  # Create the file
+            elif not old_text:
+                raise PatchError(f"{rel}: old_text is required to edit an existing file")
+            else:
+                text = apply_text_edit(text, old_text, new_text, rel)
+    return text
+
+
+def _apply_patch_sync(
+    patch: str = "", edits: Optional[list[dict]] = None, dry_run: bool = False
+) -> dict:
+    """Blocking body of apply_patch (runs on the I/O executor)."""
+    try:
+        # Every operation with its target, in request order
+        requested: list[tuple[Path, tuple]] = []
+        try:
+            if patch:
+                for file_patch in parse_unified_diff(patch):
+                    old_path, new_path = file_patch.old_path, file_patch.new_path
+                    if old_path and new_path and old_path != new_path:
+                        raise PatchError(f"Renames are not supported: {old_path} -> {new_path}")
+                    requested.append((WORKSPACE_ROOT / file_patch.path, ("diff", file_patch)))
+            for edit in edits or []:
+                if not edit.get("file_path"):
+                    raise PatchError("Each edit needs a file_path")
+                requested.append(
+                    (
+                        WORKSPACE_ROOT / edit["file_path"],
+                        ("edit", edit.get("old_text", ""), edit.get("new_text", "")),
+                    )
+                )
+        except PatchError as e:
+            return {"success": False, "error": str(e)}
+
+        # Group by resolved file, so src/x.py and src/../src/x.py are read and
+        # written once
+        operations: dict[Path, list[tuple]] = {}
+        for path, operation in requested:
+            is_safe, error = is_path_safe(str(path))
+            if not is_safe:
+                return {"success": False, "error": error}
+            is_allowed, error = is_extension_allowed(str(path), for_write=True)
+            if not is_allowed:
+                return {"success": False, "error": error}
+            operations.setdefault(path.resolve(), []).append(operation)
+
+        if not operations:
+            return {
+                "success": False,
+                "error": "Nothing to apply: pass a unified diff or edits",
+            }
+        if len(operations) > APPLY_PATCH_MAX_FILES:
+            return {
+                "success": False,
+                "error": f"Too many files ({len(operations)}). Max: {APPLY_PATCH_MAX_FILES}",
+            }
+
+        with path_locks.hold(operations):
+            # Validate every file before writing anything (one read per file)
+            changes, files, errors = [], [], []
+            for path, ops in operations.items():
+                rel = _snapshot_key(path)
+                try:
+                    original = None
+                    if path.is_file():
+                        size = path.stat().st_size
+                        if size > MAX_FILE_SIZE:
+                            raise PatchError(
+                                f"{rel}: file too large ({format_size(size)}). "
+                                f"Max: {format_size(MAX_FILE_SIZE)}"
+                            )
+                        original = path.read_bytes()
+                    text, newline = _decode_for_patch(original, rel)
+                    text = _apply_file_ops(text, ops, rel)
+                except PatchError as e:
+                    errors.append(str(e))
+                    continue
+
+                new = None if text is None else text.replace("\n", newline).encode("utf-8")
+                if new == original:
+                    files.append(
+                        {"file_path": rel, "action": "unchanged", "operations": len(ops)}
+                    )
+                    continue
+                if new is None:
+                    action = "deleted"
+                else:
+                    action = "created" if original is None else "modified"
+                changes.append(FileChange(path, original, new))
+                files.append(
+                    {
+                        "file_path": rel,
+                        "action": action,
+                        "operations": len(ops),
+                        "size": format_size(len(new or b"")),
+                    }
+                )
+
+            if errors:
+                return {
+                    "success": False,
+                    "error": "Patch does not apply; no files were changed",
+                    "errors": errors,
+                }
+
+            if not dry_run:
+                commit_changes(changes)
+                _reindex_files([change.path for change in changes])
+                changed = iter(changes)
+                for item in files:
+                    if item["action"] != "unchanged":
+                        change = next(changed)
+                        snapshot = _record_snapshot(change.path, change.original, "patch")
+                        item.update(_snapshot_fields(snapshot))
+
+        verb = "Validated" if dry_run else "Applied"
+        logger.info(f"[OK] {verb} patch to {len(changes)} file(s)")
+
+        return {
+            "success": True,
+            "dry_run": dry_run,
+            "files_changed": len(changes),
+            "files": files,
+        }
+
+    except Exception as e:
+        logger.error(f"apply_patch error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+async def apply_patch(
+    patch: str = "",
+    edits: Optional[list[dict]] = None,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Apply many edits across many files atomically: all or nothing.
+
+    Every hunk/edit is validated against the current files before anything
+    is written; files are then replaced via temp file + rename. Each file
+    is read once and written once, and can be reverted with undo_edit.
+
+    Args:
+        patch: Unified diff (git diff / diff -u format; /dev/null creates or deletes)
+        edits: List of {"file_path", "old_text", "new_text"}; old_text must be
+               unique in the file (empty old_text creates a new file)
+        dry_run: Only validate, don't write
+
+    Returns:
+        Per-file action (modified/created/deleted) or the list of errors
+    """
+    logger.info(f"🩹 apply_patch: {len(patch)} chars diff, {len(edits or [])} edits")
+
+    return await io_executor.run("apply_patch", _apply_patch_sync, patch, edits, dry_run)
+
+
+# ════════════════════════════════════════════════════════════
+# CORE TOOLS: Search
+# ════════════════════════════════════════════════════════════
+
+
+from search_index import TrigramIndex
+from scan_engine import (
+    LiteralMatcher,
+    MultiPatternMatcher,
+    PatternBudget,
+    RegexMatcher,
+    ResultBudget,
+    ScanEngine,
+)
+
+# Thread pool that scans candidate files (mmap'd bytes, no per-line lower())
+scan_engine = ScanEngine()
+
+search_index = (
+    TrigramIndex(CACHE_DIR / "search-index.pkl", WORKSPACE_ROOT)
+    if SEARCH_INDEX_ENABLED
+    else None
+)
+
+
+def _reindex_files(paths: list[Path]):
+    """Update the search and code indexes for files the server itself just changed."""
+    _reindex_code(paths)
+    if search_index is None:
+        return
+    updates = []
+    for path in paths:
+        try:
+            rel = path.resolve().relative_to(WORKSPACE_ROOT.resolve())
+        except ValueError:
+            continue
+        try:
+            stat = os.stat(path)
+            searchable = (
+                not path_matcher.blocked_folder(rel.parts)
+                and not path_matcher.extension_blocked(rel.name)
+                and stat.st_size <= MAX_FILE_SIZE
+            )
+        except OSError:
+            searchable = False
+        if searchable:
+            updates.append((str(rel), stat.st_mtime_ns, stat.st_size))
+        else:
+            updates.append((str(rel), None, None))
+    search_index.update_files(updates)
+
+
+def _iter_searchable_files():
+    """Yield (relative_path, mtime_ns, size) for every file search_files may read."""
+    for rel_path, entry in workspace_walker.walk():
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if stat.st_size > MAX_FILE_SIZE:
+            continue
+        yield rel_path, stat.st_mtime_ns, stat.st_size
+
+
+def _iter_candidate_files(candidates: set[str], search_path: Path, file_pattern: str):
+    """Yield (path, size) for indexed candidates below search_path matching file_pattern."""
+    prefix = search_path.relative_to(WORKSPACE_ROOT)
+    name_matches = compile_name_pattern(file_pattern)
+    for rel_path in sorted(candidates):
+        rel = Path(rel_path)
+        if prefix.parts and rel.parts[: len(prefix.parts)] != prefix.parts:
+            continue
+        if not name_matches(str(rel.relative_to(prefix)), rel.name):
+            continue
+        if path_matcher.blocked_folder(rel.parts):
+            continue
+        try:
+            stat = os.stat(WORKSPACE_ROOT / rel)
+        except OSError:
+            continue
+        yield WORKSPACE_ROOT / rel, stat.st_size
+
+
+def _iter_walked_files(search_path: Path, file_pattern: str):
+    """Yield (path, size) for every searchable file below search_path."""
+    prefix = search_path.relative_to(WORKSPACE_ROOT)
+    name_matches = compile_name_pattern(file_pattern)
+    for rel_path, entry in workspace_walker.walk(search_path):
+        rel = Path(rel_path)
+        if not name_matches(str(rel.relative_to(prefix)), entry.name):
+            continue
+        try:
+            yield Path(entry.path), entry.stat().st_size
+        except OSError:
+            continue
+
+
+def _search_targets(
+    search_path: Path,
+    file_pattern: str,
+    queries: list[str],
+    regex: bool,
+    use_index: bool,
+):
+    """
+    Pick the files to scan for one or more queries.
+
+    Returns (iterator of (path, relative_path), index_info). The trigram
+    index narrows the set when every query has a usable literal; otherwise
+    the workspace walker supplies every searchable file.
+    """
+    index_info = {"used": False}
+    candidates = None
+    if use_index and search_index is not None:
+        # With inotify the index is kept current by the watcher; re-walk
+        # only on first use or after lost events (see mark_stale)
+        max_age = float("inf") if _index_is_watched() else SEARCH_INDEX_MAX_AGE
+        freshness = search_index.ensure_fresh(_iter_searchable_files, max_age)
+        candidates = set()
+        for query in queries:
+            query_candidates = search_index.candidates(query, regex)
+            if query_candidates is None:
+                candidates = None
+                break
+            candidates |= query_candidates
+        index_info = {"used": candidates is not None, **freshness}
+        if candidates is None:
+            index_info["reason"] = "Query has no literal of 3+ characters"
+
+    # Blocked folders/extensions are pruned by the walker (or were
+    # pruned when the index was built)
+    if candidates is None:
+        file_iter = _iter_walked_files(search_path, file_pattern)
+    else:
+        file_iter = _iter_candidate_files(candidates, search_path, file_pattern)
+
+    def targets():
+        for file_path, size in file_iter:
+            # Skip large files
+            if size <= MAX_FILE_SIZE:
+                yield file_path, str(file_path.relative_to(WORKSPACE_ROOT))
+
+    return targets(), index_info
+
+
+def _search_files_sync(
+    query: str,
+    path: str = "",
+    file_pattern: str = "*",
+    max_results: int = 50,
+    regex: bool = False,
+    use_index: bool = True,
+) -> dict:
+    """Blocking body of search_files (runs on the I/O executor)."""
+    try:
+        search_path = WORKSPACE_ROOT / path if path else WORKSPACE_ROOT
+
+        is_safe, error = is_path_safe(str(search_path))
+        if not is_safe:
+            return {"success": False, "error": error}
+
+        if not search_path.exists():
+            return {"success": False, "error": f"Path not found: {path}"}
+
+        if regex:
+            try:
+                matcher = RegexMatcher(query)
+            except re.error as e:
+                return {"success": False, "error": f"Invalid regex: {e}"}
+        else:
+            matcher = LiteralMatcher(query)
+
+        targets, index_info = _search_targets(
+            search_path, file_pattern, [query], regex, use_index
+        )
+
+        # Workers stop as soon as max_results matches have been taken
+        budget = ResultBudget(max_results)
+        results = []
+        files_searched = 0
+        for _, matches in scan_engine.scan(targets, matcher, budget):
+            files_searched += 1
+            results.extend(matches)
+
+        results.sort(key=lambda r: (r["file"], r["line"]))
+
+        return {
+            "success": True,
+            "query": query,
+            "files_searched": files_searched,
+            "matches": len(results),
+            "results": results,
+            "truncated": len(results) >= max_results,
+            "index": index_info,
+        }
+
+    except Exception as e:
+        logger.error(f"search_files error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+async def search_files(
+    query: str,
+    path: str = "",
+    file_pattern: str = "*",
+    max_results: int = 50,
+    regex: bool = False,
+    use_index: bool = True,
+) -> dict:
+    """
+    Search for text content in files.
+
+    Args:
+        query: Text to search for (case-insensitive)
+        path: Folder to search in (relative to workspace, default: entire workspace)
+        file_pattern: Glob pattern for files (e.g., "*.py", "*.js")
+        max_results: Maximum results to return (default: 50)
+        regex: Treat query as a regular expression (default: False)
+        use_index: Narrow candidate files with the trigram index (default: True)
+
+    Returns:
+        List of matches with file paths and context, plus index freshness
+    """
+    logger.info(f"[SEARCH] search_files: '{query}' in {path or 'workspace'}")
+
+    return await io_executor.run(
+        "search_files",
+        _search_files_sync,
+        query,
+        path,
+        file_pattern,
+        max_results,
+        regex,
+        use_index,
+    )
+
+
+def _search_many_sync(
+    patterns: list[str],
+    path: str = "",
+    file_pattern: str = "*",
+    max_results: int = 20,
+    use_index: bool = True,
+) -> dict:
+    """Blocking body of search_many (runs on the I/O executor)."""
+    try:
+        # Drop empty and case-insensitive duplicate patterns, keep order
+        unique = {}
+        for pattern in patterns:
+            if pattern and pattern.lower() not in unique:
+                unique[pattern.lower()] = pattern
+        patterns = list(unique.values())
+        if not patterns:
+            return {"success": False, "error": "No patterns given"}
+
+        search_path = WORKSPACE_ROOT / path if path else WORKSPACE_ROOT
+
+        is_safe, error = is_path_safe(str(search_path))
+        if not is_safe:
+            return {"success": False, "error": error}
+
+        if not search_path.exists():
+            return {"success": False, "error": f"Path not found: {path}"}
+
+        targets, index_info = _search_targets(
+            search_path, file_pattern, patterns, False, use_index
+        )
+
+        # One automaton, one pass; each pattern stops at its own max_results
+        matcher = MultiPatternMatcher(patterns)
+        budget = PatternBudget(patterns, max_results)
+        grouped = {pattern: [] for pattern in patterns}
+        files_searched = 0
+        for _, matches in scan_engine.scan(targets, matcher, budget):
+            files_searched += 1
+            for match in matches:
+                grouped[match.pop("pattern")].append(match)
+
+        return {
+            "success": True,
+            "files_searched": files_searched,
+            "results": {
+                pattern: {
+                    "matches": len(matches),
+                    "truncated": budget.is_full(pattern),
+                    "results": sorted(matches, key=lambda r: (r["file"], r["line"])),
+                }
+                for pattern, matches in grouped.items()
+            },
+            "index": index_info,
+        }
+
+    except Exception as e:
+        logger.error(f"search_many error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+async def search_many(
+    patterns: list[str],
+    path: str = "",
+    file_pattern: str = "*",
+    max_results: int = 20,
+    use_index: bool = True,
+) -> dict:
+    """
+    Search for several text patterns in a single pass over the files.
+    Cheaper than calling search_files once per pattern.
+
+    Args:
+        patterns: Texts to search for (case-insensitive)
+        path: Folder to search in (relative to workspace, default: entire workspace)
+        file_pattern: Glob pattern for files (e.g., "*.py", "*.js")
+        max_results: Maximum results per pattern (default: 20)
+        use_index: Narrow candidate files with the trigram index (default: True)
+
+    Returns:
+        Matches grouped by pattern
+    """
+    logger.info(f"[SEARCH] search_many: {patterns} in {path or 'workspace'}")
+
+    return await io_executor.run(
+        "search_many",
+        _search_many_sync,
+        patterns,
+        path,
+        file_pattern,
+        max_results,
+        use_index,
+    )
+
+
+from workspace_replace import (
+    compile_substitute,
+    plan_replacements,
+    plan_token,
+    preview_diff,
+)
+
+# Maximum files one replace_in_workspace call may change
+REPLACE_MAX_FILES = 2000
+
+# Preview diff lines returned across all files
+REPLACE_PREVIEW_LINES = 400
+
+
+def _read_or_none(path: Path) -> Optional[bytes]:
+    try:
+        return path.read_bytes()
+    except OSError:
+        return None
+
+
+def _replace_in_workspace_sync(
+    query: str,
+    replacement: str,
+    path: str = "",
+    file_pattern: str = "*",
+    regex: bool = False,
+    case_sensitive: bool = True,
+    confirm: bool = False,
+    plan: str = "",
+    use_index: bool = True,
+) -> dict:
+    """Blocking body of replace_in_workspace (runs on the I/O executor)."""
+    try:
+        if not query:
+            return {"success": False, "error": "query must not be empty"}
+
+        search_path = WORKSPACE_ROOT / path if path else WORKSPACE_ROOT
+        is_safe, error = is_path_safe(str(search_path))
+        if not is_safe:
+            return {"success": False, "error": error}
+
+        try:
+            substitute = compile_substitute(query, replacement, regex, case_sensitive)
+        except re.error as e:
+            return {"success": False, "error": f"Invalid regex: {e}"}
+
+        targets, index_info = _search_targets(
+            search_path, file_pattern, [query], regex, use_index
+        )
+
+        # Only files write_file could write are eligible
+        skipped = []
+        writable = []
+        for file_path, rel_path in targets:
+            is_allowed, _ = is_extension_allowed(str(file_path), for_write=True)
+            if is_allowed:
+                writable.append((file_path, rel_path))
+            else:
+                skipped.append({"file": rel_path, "reason": "extension not writable"})
+
+        probe = query.encode("utf-8") if not regex and case_sensitive else None
+        request = {
+            "query": query,
+            "replacement": replacement,
+            "path": path,
+            "file_pattern": file_pattern,
+            "regex": regex,
+            "case_sensitive": case_sensitive,
+        }
+
+        # Plan without locks; only the files that change are locked to apply it
+        changed, unreadable = plan_replacements(writable, substitute, probe)
+        skipped.extend(unreadable)
+        token = plan_token(request, changed)
+        occurrences = sum(item.count for item in changed)
+
+        result = {
+            "success": True,
+            "query": query,
+            "files_searched": len(writable),
+            "files_changed": len(changed),
+            "occurrences": occurrences,
+            "plan": token,
+            "index": index_info,
+            "skipped": skipped[:50],
+        }
+
+        if len(changed) > REPLACE_MAX_FILES:
+            result.update(
+                success=False,
+                error=f"Too many files ({len(changed)}). Max: {REPLACE_MAX_FILES}. "
+                "Narrow path or file_pattern",
+            )
+            return result
+
+        if not confirm:
+            preview, remaining, truncated = [], REPLACE_PREVIEW_LINES, False
+            for item in changed:
+                if remaining <= 0:
+                    truncated = True  # Listed without a diff
+                    diff = []
+                else:
+                    diff = preview_diff(item)
+                    truncated = truncated or len(diff) > remaining
+                preview.append(
+                    {
+                        "file": item.rel_path,
+                        "occurrences": item.count,
+                        "diff": "\n".join(diff[:remaining]),
+                    }
+                )
+                remaining -= len(diff)
+            result.update(
+                applied=False,
+                files=preview,
+                preview_truncated=truncated,
+                hint="Call again with confirm=True and plan=<plan> to apply",
+            )
+            return result
+
+        with path_locks.hold([item.path for item in changed]):
+            if plan and plan != token:
+                result.update(
+                    success=False,
+                    error="Files changed since the preview (plan mismatch); preview again",
+                )
+                return result
+
+            stale = [
+                item.rel_path for item in changed if _read_or_none(item.path) != item.original
+            ]
+            if stale:
+                result.update(
+                    success=False,
+                    error="Files changed while the replacement was planned; try again",
+                    stale_files=stale[:50],
+                )
+                return result
+
+            commit_changes(
+                [FileChange(item.path, item.original, item.new) for item in changed]
+            )
+            _reindex_files([item.path for item in changed])
+            for item in changed:
+                _record_snapshot(item.path, item.original, "replace")
+
+        logger.info(
+            f"[OK] Replaced {occurrences} occurrence(s) of {query!r} in {len(changed)} file(s)"
+        )
+        result.update(
+            applied=True,
+            files=[{"file": item.rel_path, "occurrences": item.count} for item in changed],
+        )
+        return result
+
+    except Exception as e:
+        logger.error(f"replace_in_workspace error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+async def replace_in_workspace(
+    query: str,
+    replacement: str,
+    path: str = "",
+    file_pattern: str = "*",
+    regex: bool = False,
+    case_sensitive: bool = True,
+    confirm: bool = False,
+    plan: str = "",
+    use_index: bool = True,
+) -> dict:
+    """
+    Search and replace text across the workspace.
+
+    Without confirm, returns a preview diff and a plan token. With
+    confirm=True every file is written atomically (all or nothing); pass
+    the plan from the preview to refuse if any file changed since then.
+    Changed files can be reverted one by one with undo_edit.
+
+    Args:
+        query: Text (or regex) to find
+        replacement: Replacement text (regex mode supports \\1 / \\g<name>)
+        path: Subdirectory to search in (default: entire workspace)
+        file_pattern: Glob pattern for files (e.g., "*.py", "src/**/*.ts")
+        regex: Treat query as a regular expression
+        case_sensitive: Match case exactly (default: True)
+        confirm: Apply the replacements (default: preview only)
+        plan: Plan token from the preview, checked before writing
+        use_index: Use the trigram index to skip files without a match
+
+    Returns:
+        Preview diff (or applied files), occurrence counts and plan token
+    """
+    logger.info(f"🔁 replace_in_workspace: {query!r} -> {replacement!r} (confirm={confirm})")
+
+    return await io_executor.run(
+        "replace_in_workspace",
+        _replace_in_workspace_sync,
+        query,
+        replacement,
+        path,
+        file_pattern,
+        regex,
+        case_sensitive,
+        confirm,
+        plan,
+        use_index,
+    )
+
+
+from dir_listing import DirectoryCache, DirectoryLister, decode_cursor, encode_cursor
+
+# Sorted directory contents, reused until the directory's mtime changes
+dir_cache = DirectoryCache()
+dir_lister = DirectoryLister(WORKSPACE_ROOT, path_matcher, dir_cache, ignore=SERVER_OWN_PATHS)
+
+# Default / maximum number of entries per list_files page
+LIST_FILES_PAGE_SIZE = 200
+LIST_FILES_MAX_PAGE_SIZE = 1000
+
+
+def _list_files_sync(
+    path: str = "",
+    pattern: str = "*",
+    recursive: bool = False,
+    show_hidden: bool = False,
+    limit: int = LIST_FILES_PAGE_SIZE,
+    cursor: str = "",
+) -> dict:
+    """Blocking body of list_files (runs on the I/O executor)."""
+    try:
+        list_path = WORKSPACE_ROOT / path if path else WORKSPACE_ROOT
+
+        is_safe, error = is_path_safe(str(list_path))
+        if not is_safe:
+            return {"success": False, "error": error}
+
+        if not list_path.exists():
+            return {"success": False, "error": f"Path not found: {path}"}
+
+        display_path = str(list_path.relative_to(WORKSPACE_ROOT)) if path else "/"
+        limit = max(1, min(limit, LIST_FILES_MAX_PAGE_SIZE))
+
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor, display_path)
+            except ValueError as e:
+                return {"success": False, "error": str(e)}
+
+        items = []
+        prefix = list_path.relative_to(WORKSPACE_ROOT)
+        name_matches = compile_name_pattern(pattern)
+        last_key = None
+        has_more = False
+
+        # Blocked folders are pruned by the lister, never descended into
+        for rel_path, is_dir, abs_path, key_path, is_symlink in dir_lister.iter_entries(
+            list_path, recursive, after
+        ):
+            name = os.path.basename(rel_path)
+
+            # Skip hidden if not requested
+            if not show_hidden and name.startswith("."):
+                continue
+
+            if not name_matches(str(Path(rel_path).relative_to(prefix)), name):
+                continue
+
+            # Symlinked files may point outside the workspace
+            if is_symlink and not is_path_safe(abs_path)[0]:
+                continue
+
+            if len(items) >= limit:
+                has_more = True
+                break
+
+            # Only entries on this page are stat'ed
+            try:
+                if is_dir:
+                    item = {
+                        "name": rel_path + "/",
+                        "type": "folder",
+                        "items": len(dir_cache.children(abs_path)),
+                    }
+                else:
+                    stat = os.stat(abs_path)
+                    item = {
+                        "name": rel_path,
+                        "type": "file",
+                        "size": format_size(stat.st_size),
+                        "modified": datetime.fromtimestamp(stat.st_mtime).strftime(
+                            "%Y-%m-%d %H:%M"
+                        ),
+                    }
+            except OSError:
+                continue  # Removed since the directory was cached
+
+            items.append(item)
+            last_key = key_path
+
+        return {
+            "success": True,
+            "path": display_path,
+            "count": len(items),
+            "items": items,
+            "has_more": has_more,
+            "next_cursor": encode_cursor(display_path, last_key) if has_more else None,
+        }
+
+    except Exception as e:
+        logger.error(f"list_files error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+async def list_files(
+    path: str = "",
     pattern: str = "*",
     recursive: bool = False,
     show_hidden: bool = False,
+    limit: int = LIST_FILES_PAGE_SIZE,
+    cursor: str = "",
+) -> dict:
+    """
+    List files and folders in a directory, one page at a time.
+
+    Folders come before files; in recursive mode each folder is followed
+    by its own contents. Pass the returned next_cursor to get the next page.
+
+    Args:
+        path: Directory path (relative to workspace, default: workspace root)
+        pattern: Glob pattern to filter files (e.g., "*.py")
+        recursive: Search recursively in subdirectories
+        show_hidden: Show hidden files/folders (starting with .)
+        limit: Maximum items per page (default: 200, max: 1000)
+        cursor: next_cursor from the previous page (empty for the first page)
+
+    Returns:
+        Items on this page, has_more and next_cursor
+    """
+    logger.info(f"📂 list_files: {path or 'workspace root'}")
+
+    return await io_executor.run(
+        "list_files",
+        _list_files_sync,
+        path,
+        pattern,
+        recursive,
+        show_hidden,
+        limit,
+        cursor,
+    )
+
+
+# ════════════════════════════════════════════════════════════
+# CORE TOOLS: Workspace Changes
+# ════════════════════════════════════════════════════════════
+
+from fs_watcher import FileWatcher
+
+# Started in main(); caches below subscribe to its invalidation events.
+# The server's own cache and log are ignored so they don't feed back.
+fs_watcher = FileWatcher(
+    WORKSPACE_ROOT,
+    path_matcher,
+    workspace_walker,
+    ignore=SERVER_OWN_PATHS,
+    poll_interval=WATCH_POLL_INTERVAL,
+)
+
+# Larger bursts (checkout, npm install) re-walk instead of re-indexing inline
+WATCH_REINDEX_MAX = 200
+
+# Longest a changes_since call may wait for new events
+CHANGES_MAX_WAIT = 60
+
+
+def _index_is_watched() -> bool:
+    """True when inotify keeps the search index current between re-walks."""
+    return fs_watcher.running and fs_watcher.backend == "inotify"
+
+
+def _on_changes_search_index(events: list[dict]):
+    if search_index is None:
+        return
+    # Folders moved away or lost events: contents weren't reported one by one
+    if len(events) > WATCH_REINDEX_MAX or any(
+        event["type"] == "overflow" or (event["is_dir"] and event["type"] == "deleted")
+        for event in events
+    ):
+        search_index.mark_stale()
+        return
+    _reindex_files([WORKSPACE_ROOT / event["path"] for event in events if not event["is_dir"]])
+
+
+def _on_changes_dir_cache(events: list[dict]):
+    for event in events:
+        if event["type"] == "overflow":
+            dir_cache.invalidate()
+            return
+        path = WORKSPACE_ROOT / event["path"]
+        dir_cache.invalidate(str(path.parent))
+        if event["is_dir"]:
+            dir_cache.invalidate(str(path))
+
+
+fs_watcher.subscribe(_on_changes_search_index)
+fs_watcher.subscribe(_on_changes_dir_cache)
+
+
+@mcp.tool()
+async def changes_since(cursor: str = "", limit: int = 500, wait_seconds: float = 0) -> dict:
+    """
+    Get workspace file changes since a cursor, for incremental sync.
+
+    Call with an empty cursor first to get the current position, then list
+    files once and keep calling with the returned cursor. If reset is True,
+    changes were lost (server restart or too many events): list again.
+
+    Args:
+        cursor: Cursor from the previous call (empty = start from now)
+        limit: Maximum changes to return (default: 500)
+        wait_seconds: Wait up to this long for a change if there is none yet (max 60)
+
+    Returns:
+        Changes (created/modified/deleted with path), next cursor, reset flag
+    """
+    logger.info(f"🔔 changes_since: {cursor or 'now'}")
+
+    if not fs_watcher.running:
+        return {
+            "success": False,
+            "error": "File watcher is not running (MCP_WATCH=0, or no inotify: set MCP_WATCH=poll)",
+        }
+
+    deadline = time.monotonic() + min(max(wait_seconds, 0), CHANGES_MAX_WAIT)
+    while True:
+        result = fs_watcher.journal.since(cursor, max(1, limit))
+        if result["changes"] or result["reset"] or not cursor or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(0.25)
+
+    return {"success": True, "backend": fs_watcher.backend, **result}
+
+
+# ════════════════════════════════════════════════════════════
+# CORE TOOLS: Code Navigation
+# ════════════════════════════════════════════════════════════
+
+from import_graph import GRAPH_EXTENSIONS, GRAPH_MAX_FILE_SIZE, ImportGraph
+from semantic_search import (
+    SEMANTIC_AVAILABLE,
+    SEMANTIC_EXTENSIONS,
+    SEMANTIC_MAX_FILE_SIZE,
+    SemanticIndex,
+)
+from symbol_index import SYMBOL_EXTENSIONS, SYMBOL_MAX_FILE_SIZE, SymbolIndex
+
+# Python/TS/JS definitions in SQLite, re-parsed only when a file changes
+symbol_index = SymbolIndex(CACHE_DIR / "symbols.sqlite", WORKSPACE_ROOT)
+
+# Python/TS/JS import edges, used by select_tests
+import_graph = ImportGraph(CACHE_DIR / "import-graph.pkl", WORKSPACE_ROOT)
+
+# Code indexes kept in sync with the workspace: (index, extensions, max file size)
+CODE_INDEXES = [
+    (symbol_index, SYMBOL_EXTENSIONS, SYMBOL_MAX_FILE_SIZE),
+    (import_graph, GRAPH_EXTENSIONS, GRAPH_MAX_FILE_SIZE),
+]
+
+# Hashed TF-IDF vectors of code chunks, used by semantic_search_code (needs numpy)
+semantic_index = None
+if SEMANTIC_AVAILABLE:
+    semantic_index = SemanticIndex(CACHE_DIR / "semantic-index.npz", WORKSPACE_ROOT)
+    CODE_INDEXES.append((semantic_index, SEMANTIC_EXTENSIONS, SEMANTIC_MAX_FILE_SIZE))
+
+
+def _code_file_state(
+    rel_path: str, max_size: int
+) -> tuple[str, Optional[int], Optional[int]]:
+    """(rel_path, mtime_ns, size) for a code index; None values mean not indexable."""
+    try:
+        stat = os.stat(WORKSPACE_ROOT / rel_path)
+    except OSError:
+        return rel_path, None, None
+    if stat.st_size > max_size:
+        return rel_path, None, None
+    return rel_path, stat.st_mtime_ns, stat.st_size
+
+
+def _code_files(extensions: set[str], max_size: int):
+    """Callable yielding (relative_path, mtime_ns, size) for one code index."""
+
+    def iter_files():
+        for rel_path, entry in workspace_walker.walk():
+            if os.path.splitext(entry.name)[1].lower() not in extensions:
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if stat.st_size <= max_size:
+                yield rel_path, stat.st_mtime_ns, stat.st_size
+
+    return iter_files
+
+
+def _update_code_indexes(rel_paths: list[str]):
+    for index, extensions, max_size in CODE_INDEXES:
+        updates = [
+            _code_file_state(rel_path, max_size)
+            for rel_path in rel_paths
+            if os.path.splitext(rel_path)[1].lower() in extensions
+        ]
+        if updates:
+            index.update_files(updates)
+
+
+def _reindex_code(paths: list[Path]):
+    """Re-parse code files the server itself just changed."""
+    rel_paths = []
+    for path in paths:
+        try:
+            rel_paths.append(str(path.resolve().relative_to(WORKSPACE_ROOT.resolve())))
+        except ValueError:
+            continue
+    _update_code_indexes(rel_paths)
+
+
+def _on_changes_code_indexes(events: list[dict]):
+    if len(events) > WATCH_REINDEX_MAX or any(
+        event["type"] == "overflow" or (event["is_dir"] and event["type"] == "deleted")
+        for event in events
+    ):
+        for index, _, _ in CODE_INDEXES:
+            index.mark_stale()
+        return
+    _update_code_indexes([event["path"] for event in events if not event["is_dir"]])
+
+
+fs_watcher.subscribe(_on_changes_code_indexes)
+
+
+def _ensure_code_index_fresh(index, extensions: set[str], max_size: int) -> dict:
+    max_age = float("inf") if _index_is_watched() else SEARCH_INDEX_MAX_AGE
+    return index.ensure_fresh(_code_files(extensions, max_size), max_age)
+
+
+def _find_symbol_sync(
+    name: str, kind: str = "", path: str = "", exact: bool = False, limit: int = 50
+) -> dict:
+    """Blocking body of find_symbol (runs on the I/O executor)."""
+    try:
+        if not name:
+            return {"success": False, "error": "name must not be empty"}
+
+        if path:
+            is_safe, error = is_path_safe(str(WORKSPACE_ROOT / path))
+            if not is_safe:
+                return {"success": False, "error": error}
+            path = str(Path(path)) + os.sep
+
+        started = time.perf_counter()
+        freshness = _ensure_code_index_fresh(
+            symbol_index, SYMBOL_EXTENSIONS, SYMBOL_MAX_FILE_SIZE
+        )
+        symbols = symbol_index.find(name, kind, path, exact, max(1, min(limit, 500)))
+
+        return {
+            "success": True,
+            "name": name,
+            "count": len(symbols),
+            "symbols": symbols,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "index": {**freshness, **symbol_index.stats()},
+        }
+
+    except Exception as e:
+        logger.error(f"find_symbol error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+async def find_symbol(
+    name: str, kind: str = "", path: str = "", exact: bool = False, limit: int = 50
+) -> dict:
+    """
+    Find where a class/function/method/variable is defined (Python, TS, JS).
+
+    Much faster than search_files for "where is X defined": answers come
+    from a symbol index that only re-parses changed files.
+
+    Args:
+        name: Symbol name (case-insensitive; partial names match unless exact)
+        kind: Filter by kind: class, function, method, variable, property,
+              interface, type, enum, namespace
+        path: Only symbols under this subdirectory
+        exact: Only exact name matches
+        limit: Maximum results (default: 50)
+
+    Returns:
+        Definitions with file, line, end_line, parent and signature
+    """
+    logger.info(f"🔎 find_symbol: {name}")
+
+    return await io_executor.run(
+        "find_symbol", _find_symbol_sync, name, kind, path, exact, limit
+    )
+
+
+def _list_symbols_sync(file_path: str) -> dict:
+    """Blocking body of list_symbols (runs on the I/O executor)."""
+    try:
+        if not os.path.isabs(file_path):
+            file_path = str(WORKSPACE_ROOT / file_path)
+
+        is_safe, error = is_path_safe(file_path)
+        if not is_safe:
+            return {"success": False, "error": error}
+
+        path = Path(file_path)
+        if not path.is_file():
+            return {"success": False, "error": f"File not found: {file_path}"}
+        if path.suffix.lower() not in SYMBOL_EXTENSIONS:
+            return {
+                "success": False,
+                "error": f"Unsupported file type: {path.suffix or 'none'}",
+                "supported": sorted(SYMBOL_EXTENSIONS),
+            }
+
+        # Only this file needs to be current
+        rel_path = str(path.resolve().relative_to(WORKSPACE_ROOT.resolve()))
+        symbol_index.update_files([_code_file_state(rel_path, SYMBOL_MAX_FILE_SIZE)])
+
+        return {
+            "success": True,
+            "file_path": rel_path,
+            "symbols": symbol_index.list_file(rel_path),
+            "parse_error": symbol_index.file_error(rel_path),
+        }
+
+    except Exception as e:
+        logger.error(f"list_symbols error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+async def list_symbols(file_path: str) -> dict:
+    """
+    List the symbols defined in one file (outline), in line order.
+
+    Args:
+        file_path: Path to a .py/.ts/.tsx/.js/.jsx file
+
+    Returns:
+        Symbols with kind, line range, parent and signature
+    """
+    logger.info(f"🧭 list_symbols: {file_path}")
+
+    return await io_executor.run("find_symbol", _list_symbols_sync, file_path)
+
+
+# Config files that mark the folder a test runner should start in
+PYTHON_TEST_ROOT_FILES = ("pyproject.toml", "pytest.ini", "setup.cfg", "tox.ini", "setup.py")
+
+
+def _quote_arg(arg: str) -> str:
+    return f'"{arg}"' if any(ch.isspace() for ch in arg) else arg
+
+
+def _nearest_root(rel_path: str, markers: tuple[str, ...]) -> str:
+    """Closest folder above rel_path (within its project) containing a marker file."""
+    parts = Path(rel_path).parts
+    for depth in range(len(parts) - 1, 0, -1):
+        folder = WORKSPACE_ROOT.joinpath(*parts[:depth])
+        if any((folder / marker).exists() for marker in markers):
+            return str(Path(*parts[:depth]))
+    return parts[0] if len(parts) > 1 else ""
+
+
+def _test_commands(tests: list[str]) -> list[dict]:
+    """Group selected tests into one runner command per project folder."""
+    groups: dict[tuple[str, str], list[str]] = {}
+    for test in tests:
+        if test.endswith(".py"):
+            key = ("pytest", _nearest_root(test, PYTHON_TEST_ROOT_FILES))
+        else:
+            key = ("js", _nearest_root(test, ("package.json",)))
+        groups.setdefault(key, []).append(test)
+
+    commands = []
+    for (runner, folder), files in sorted(groups.items()):
+        args = " ".join(_quote_arg(os.path.relpath(f, folder or ".")) for f in files)
+        if runner == "pytest":
+            command = f"python -m pytest -q {args}"
+        else:
+            try:
+                package_json = WORKSPACE_ROOT / folder / "package.json"
+                with open(package_json, "r", encoding="utf-8") as f:
+                    pkg = json.load(f)
+            except (OSError, ValueError):
+                pkg = {}
+            deps = {**pkg.get("dependencies", {}), **pkg.get("devDependencies", {})}
+            if "vitest" in deps:
+                command = f"npx vitest run {args}"
+            elif "jest" in deps:
+                command = f"npx jest {args}"
+            else:
+                command = f"npm test -- {args}"
+        commands.append({"working_dir": folder, "command": command, "tests": len(files)})
+    return commands
+
+
+def _git_changed_files(project_dir: Path) -> tuple[list[str], str]:
+    """Workspace-relative paths with uncommitted changes in project_dir's repo."""
+    top = subprocess.run(
+        ["git", "rev-parse", "--show-toplevel"],
+        cwd=str(project_dir),
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+    if top.returncode != 0:
+        return [], top.stderr.strip() or "Not a git repository"
+    repo_root = Path(top.stdout.strip())
+    status = subprocess.run(
+        ["git", "status", "--porcelain", "--untracked-files=all"],
+        cwd=str(repo_root),
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    if status.returncode != 0:
+        return [], status.stderr.strip()
+
+    changed = []
+    for line in status.stdout.splitlines():
+        path = line[3:].split(" -> ")[-1].strip('"')
+        try:
+            resolved = (repo_root / path).resolve()
+            changed.append(str(resolved.relative_to(WORKSPACE_ROOT.resolve())))
+        except ValueError:
+            continue
+    return changed, ""
+
+
+def _select_tests_sync(changed_files: Optional[list[str]], project: str) -> dict:
+    """Blocking body of select_tests (runs on the I/O executor)."""
+    try:
+        project_dir = WORKSPACE_ROOT / project if project else WORKSPACE_ROOT
+        is_safe, error = is_path_safe(str(project_dir))
+        if not is_safe:
+            return {"success": False, "error": error}
+
+        if changed_files:
+            changed = []
+            for file_path in changed_files:
+                path = Path(file_path)
+                if not path.is_absolute() and project and not (WORKSPACE_ROOT / path).exists():
+                    path = project_dir / path  # Allow project-relative paths
+                elif not path.is_absolute():
+                    path = WORKSPACE_ROOT / path
+                try:
+                    changed.append(str(path.resolve().relative_to(WORKSPACE_ROOT.resolve())))
+                except ValueError:
+                    return {"success": False, "error": f"Path outside workspace: {file_path}"}
+            source = "arguments"
+        else:
+            if not project:
+                return {
+                    "success": False,
+                    "error": (
+                        "Pass changed_files, or a project to use its uncommitted git changes"
+                    ),
+                }
+            changed, error = _git_changed_files(project_dir)
+            if error:
+                return {"success": False, "error": error}
+            source = "git status"
+
+        freshness = _ensure_code_index_fresh(
+            import_graph, GRAPH_EXTENSIONS, GRAPH_MAX_FILE_SIZE
+        )
+        selection = import_graph.select_tests(changed)
+        tests = selection["tests"]
+
+        return {
+            "success": True,
+            "changed_files": changed,
+            "changed_source": source,
+            "count": len(tests),
+            "tests": tests,
+            "reasons": selection["reasons"],
+            "unmapped": selection["unmapped"],
+            "full_suite_recommended": selection["full_suite_recommended"],
+            "commands": _test_commands(tests),
+            "graph": {**freshness, **import_graph.stats()},
+        }
+
+    except Exception as e:
+        logger.error(f"select_tests error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+async def select_tests(
+    changed_files: Optional[list[str]] = None,
+    project: str = "",
+    run: bool = False,
+    timeout: int = 300,
 ) -> dict:
     """
-    List files and folders in a directory.
+    Select only the tests affected by a change (test-impact analysis).
+
+    Follows Python/TS/JS imports backwards from the changed files to every
+    test file that imports them, directly or transitively. With run=True
+    the selected tests are run (pytest / vitest / jest / npm test) instead
+    of the whole suite.
 
     Args:
-        path: Directory path (relative to workspace, default: workspace root)
-        pattern: Glob pattern to filter files (e.g., "*.py")
-        recursive: Search recursively in subdirectories
-        show_hidden: Show hidden files/folders (starting with .)
+        changed_files: Changed files (relative to workspace or to project).
+                       Default: uncommitted git changes of project
+        project: Project folder (e.g., "my-app")
+        run: Run the selected tests via run_command
+        timeout: Seconds allowed per test command when run=True (default: 300)
 
     Returns:
-        List of files and folders
+        Selected tests with the import chain that selected each one, the
+        runner commands and, when run=True, their output
     """
-    logger.info(f"📂 list_files: {path or 'workspace root'}")
+    changed_count = len(changed_files or [])
+    logger.info(f"🧪 select_tests: {project or 'workspace'} ({changed_count} files)")
 
-    try:
-        list_path = WORKSPACE_ROOT / path if path else WORKSPACE_ROOT
+    result = await io_executor.run("select_tests", _select_tests_sync, changed_files, project)
+    if not run or not result.get("success"):
+        return result
 
-        is_safe, error = is_path_safe(str(list_path))
-        if not is_safe:
-            return {"success": False, "error": error}
+    if not result["tests"]:
+        result["runs"] = []
+        return result
 
-        if not list_path.exists():
-            return {"success": False, "error": f"Path not found: {path}"}
+    runs = []
+    for command in result["commands"]:
+        runs.append(
+            await run_command(command["command"], command["working_dir"], timeout)
+        )
+    result["runs"] = runs
+    result["success"] = all(r.get("success") for r in runs)
+    return result
 
-        items = []
-        glob_method = list_path.rglob if recursive else list_path.glob
 
-        for item in glob_method(pattern):
-            # Skip hidden if not requested
-            if not show_hidden and item.name.startswith("."):
-                continue
+# Lines of each hit returned as a preview
+SEMANTIC_PREVIEW_LINES = 12
 
-            # Skip blocked folders
-            is_safe, _ = is_path_safe(str(item))
-            if not is_safe:
-                continue
 
-            rel_path = str(item.relative_to(WORKSPACE_ROOT))
+def _chunk_preview(rel_path: str, start_line: int, end_line: int) -> str:
+    try:
+        with open(WORKSPACE_ROOT / rel_path, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()[start_line - 1:end_line]
+    except OSError:
+        return ""
+    while lines and not lines[0].strip():
+        lines.pop(0)
+    return "\n".join(lines[:SEMANTIC_PREVIEW_LINES])
 
-            if item.is_dir():
-                items.append(
-                    {
-                        "name": rel_path + "/",
-                        "type": "folder",
-                        "items": len(list(item.iterdir())) if item.is_dir() else 0,
-                    }
-                )
-            else:
-                items.append(
-                    {
-                        "name": rel_path,
-                        "type": "file",
-                        "size": format_size(item.stat().st_size),
-                        "modified": datetime.fromtimestamp(
-                            item.stat().st_mtime
-                        ).strftime("%Y-%m-%d %H:%M"),
-                    }
-                )
 
-        # Sort: folders first, then files
-        items.sort(key=lambda x: (0 if x["type"] == "folder" else 1, x["name"]))
+def _semantic_search_code_sync(query: str, path: str = "", limit: int = 10) -> dict:
+    """Blocking body of semantic_search_code (runs on the I/O executor)."""
+    try:
+        if not query.strip():
+            return {"success": False, "error": "query must not be empty"}
+
+        if path:
+            is_safe, error = is_path_safe(str(WORKSPACE_ROOT / path))
+            if not is_safe:
+                return {"success": False, "error": error}
+            path = str(Path(path)) + os.sep
+
+        started = time.perf_counter()
+        freshness = _ensure_code_index_fresh(
+            semantic_index, SEMANTIC_EXTENSIONS, SEMANTIC_MAX_FILE_SIZE
+        )
+        hits = semantic_index.search(query, path, max(1, min(limit, 100)))
+        for hit in hits:
+            hit["preview"] = _chunk_preview(hit["file"], hit["start_line"], hit["end_line"])
 
         return {
             "success": True,
-            "path": str(list_path.relative_to(WORKSPACE_ROOT)) if path else "/",
-            "total": len(items),
-            "items": items[:200],  # Limit to 200 items
+            "query": query,
+            "count": len(hits),
+            "results": hits,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "index": {**freshness, **semantic_index.stats()},
         }
 
     except Exception as e:
-        logger.error(f"list_files error: {e}")
+        logger.error(f"semantic_search_code error: {e}")
         return {"success": False, "error": str(e)}
 
 
+@mcp.tool()
+async def semantic_search_code(query: str, path: str = "", limit: int = 10) -> dict:
+    """
+    Search code by meaning rather than exact text, fully offline.
+
+    Use for conceptual questions ("where do we refresh YouTube tokens?")
+    that search_files cannot answer. Identifiers are split into words
+    (refreshYoutubeToken -> refresh youtube token) and code chunks are
+    ranked by TF-IDF similarity to the query.
+
+    Args:
+        query: Natural-language question or keywords
+        path: Only search under this subdirectory
+        limit: Maximum results (default: 10)
+
+    Returns:
+        Best matching chunks with file, line range, score and a preview
+    """
+    logger.info(f"🧠 semantic_search_code: {query}")
+
+    if semantic_index is None:
+        return {
+            "success": False,
+            "error": "Semantic search needs numpy. Run: pip install numpy",
+        }
+    return await io_executor.run(
+        "semantic_search_code", _semantic_search_code_sync, query, path, limit
+    )
+
+
 # ════════════════════════════════════════════════════════════
 # CORE TOOLS: Terminal Commands
 # ════════════════════════════════════════════════════════════
@@ -748,7 +2617,17 @@ ALLOWED_COMMANDS = {
     "cd": None,
     "mkdir": None,
     # Deployment tools
-    "vercel": ["--prod", "deploy", "ls", "logs", "env", "inspect"],
+    "vercel": [
+        "--prod",
+        "--yes",
+        "deploy",
+        "build",
+        "pull",
+        "ls",
+        "logs",
+        "env",
+        "inspect",
+    ],
     "netlify": ["deploy", "status", "open"],
     "firebase": ["deploy", "serve", "emulators:start"],
     # Flutter/Dart
@@ -781,16 +2660,134 @@ BLOCKED_PATTERNS = [
 ]
 
 
+from command_jobs import HeadCapture, JobManager, OutputSink, pump, spawn, terminate
+from build_cache import BuildCache, is_vercel_build
+from command_scheduler import CommandScheduler, QueueTimeout
+
+# Characters of stdout/stderr returned by run_command
+RUN_COMMAND_MAX_OUTPUT = 10000
+
+# Seconds between progress notifications while a command runs
+PROGRESS_INTERVAL = 1.0
+
+# Characters returned by one poll_command call
+POLL_MAX_CHARS = 200_000
+
+job_manager = JobManager(JOB_OUTPUT_MAX_CHARS)
+
+# CPU slots, priorities and per-project install/build locks for all commands
+command_scheduler = CommandScheduler(COMMAND_CPU_SLOTS)
+
+# Outputs of earlier builds, keyed by a hash of their inputs
+build_cache = BuildCache(CACHE_DIR / "builds", BUILD_CACHE_MAX_BYTES)
+
+# Single build commands whose outputs can be cached (no chaining)
+_CACHEABLE_BUILD = re.compile(
+    r"^(?:(?:npm|pnpm|yarn|bun)\s+(?:run\s+)?build(?::[\w:-]+)?|vercel\s+build)"
+    r"(?:\s[^&|;]*)?$"
+)
+
+# Older MCP SDKs have no message argument on progress notifications
+_PROGRESS_MESSAGE = "message" in inspect.signature(Context.report_progress).parameters
+
+
+def _check_command(command: str, working_dir: str) -> tuple[Optional[Path], Optional[dict]]:
+    """Validate a command against the allowlist; returns (cwd, None) or (None, error)."""
+    # Security: Check for blocked patterns
+    cmd_lower = command.lower()
+    for pattern in BLOCKED_PATTERNS:
+        if pattern.lower() in cmd_lower:
+            return None, {
+                "success": False,
+                "error": f"Command contains blocked pattern: {pattern}",
+            }
+
+    # Parse command
+    parts = command.split()
+    if not parts:
+        return None, {"success": False, "error": "Empty command"}
+
+    cmd_name = parts[0].lower()
+
+    # Security: Check if command is allowed
+    if cmd_name not in ALLOWED_COMMANDS:
+        return None, {
+            "success": False,
+            "error": f"Command '{cmd_name}' is not in allowlist",
+            "allowed_commands": list(ALLOWED_COMMANDS.keys()),
+        }
+
+    # Check subcommand if restricted
+    allowed_subcommands = ALLOWED_COMMANDS[cmd_name]
+    if allowed_subcommands and len(parts) > 1:
+        subcommand = parts[1].lower()
+        if subcommand not in allowed_subcommands:
+            return None, {
+                "success": False,
+                "error": f"Subcommand '{subcommand}' not allowed for {cmd_name}",
+                "allowed": allowed_subcommands,
+            }
+
+    # Set working directory
+    cwd = WORKSPACE_ROOT / working_dir if working_dir else WORKSPACE_ROOT
+    is_safe, error = is_path_safe(str(cwd))
+    if not is_safe:
+        return None, {"success": False, "error": error}
+
+    if not cwd.exists():
+        return None, {"success": False, "error": f"Directory not found: {working_dir}"}
+
+    return cwd, None
+
+
+async def _report_progress(ctx: Optional[Context], sink: OutputSink):
+    """Progress notification with the latest output line (no-op without a client token)."""
+    if ctx is None:
+        return
+    progress, total = (sink.percent, 100) if sink.percent is not None else (sink.lines, None)
+    try:
+        if _PROGRESS_MESSAGE:
+            await ctx.report_progress(progress, total, message=sink.last_line or None)
+        else:
+            await ctx.report_progress(progress, total)
+    except Exception as e:
+        logger.debug(f"Progress notification failed: {e}")
+
+
+def _command_project(cwd: Path) -> str:
+    """Top-level workspace folder a command runs in ("" for the workspace root)."""
+    parts = cwd.resolve().relative_to(WORKSPACE_ROOT.resolve()).parts
+    return parts[0] if parts else ""
+
+
+def _truncated(capture: HeadCapture) -> str:
+    text = capture.text()
+    if capture.total > capture.max_chars:
+        text += f"\n... (truncated, {capture.total} chars total)"
+    return text
+
+
 @mcp.tool()
-async def run_command(command: str, working_dir: str = "", timeout: int = 60) -> dict:
+async def run_command(
+    command: str,
+    working_dir: str = "",
+    timeout: int = 60,
+    use_build_cache: bool = True,
+    ctx: Context = None,
+) -> dict:
     """
     Run a terminal command in the workspace.
     Commands are restricted for security.
+    For long builds use start_command + poll_command instead.
 
     Args:
         command: Command to run (e.g., "npm install", "git status")
         working_dir: Working directory (relative to workspace, default: workspace root)
-        timeout: Maximum seconds to wait (default: 60)
+        timeout: Maximum seconds to run (default: 60); also the longest it
+                 may wait for a free slot while other commands run
+        use_build_cache: For build commands ("npm run build", ...), restore the
+                         outputs of an identical earlier build instead of
+                         building (default: True)
 
     Returns:
         Command output and exit code
@@ -798,172 +2795,611 @@ async def run_command(command: str, working_dir: str = "", timeout: int = 60) ->
     logger.info(f"🖥️ run_command: {command}")
 
     try:
-        # Security: Check for blocked patterns
-        cmd_lower = command.lower()
-        for pattern in BLOCKED_PATTERNS:
-            if pattern.lower() in cmd_lower:
-                return {
-                    "success": False,
-                    "error": f"Command contains blocked pattern: {pattern}",
-                }
+        cwd, error = _check_command(command, working_dir)
+        if error:
+            return error
 
-        # Parse command
-        parts = command.split()
-        if not parts:
-            return {"success": False, "error": "Empty command"}
+        try:
+            async with command_scheduler.slot(
+                command, _command_project(cwd), wait_timeout=timeout
+            ) as ticket:
+                if use_build_cache and _is_cacheable_build(command, cwd):
+                    result = await _cached_build(command, cwd, timeout, ctx)
+                else:
+                    result = await _execute_command(command, cwd, timeout, ctx)
+        except QueueTimeout as e:
+            return {"success": False, "error": str(e), "scheduler": command_scheduler.stats()}
+
+        result["scheduling"] = ticket.info()
+        return result
 
-        cmd_name = parts[0].lower()
+    except Exception as e:
+        logger.error(f"run_command error: {e}")
+        return {"success": False, "error": str(e)}
 
-        # Security: Check if command is allowed
-        if cmd_name not in ALLOWED_COMMANDS:
-            return {
-                "success": False,
-                "error": f"Command '{cmd_name}' is not in allowlist",
-                "allowed_commands": list(ALLOWED_COMMANDS.keys()),
-            }
 
-        # Check subcommand if restricted
-        allowed_subcommands = ALLOWED_COMMANDS[cmd_name]
-        if allowed_subcommands and len(parts) > 1:
-            subcommand = parts[1].lower()
-            if subcommand not in allowed_subcommands:
-                return {
-                    "success": False,
-                    "error": f"Subcommand '{subcommand}' not allowed for {cmd_name}",
-                    "allowed": allowed_subcommands,
-                }
+async def _execute_command(
+    command: str, cwd: Path, timeout: int, ctx: Optional[Context]
+) -> dict:
+    """Run an admitted command, streaming its output into bounded captures."""
+    logger.info(f"Executing in {cwd}: {command}")
+
+    process = await spawn(command, cwd, merge_stderr=False)
+
+    # Output is consumed while the command runs; only the returned head is kept
+    stdout = HeadCapture(RUN_COMMAND_MAX_OUTPUT)
+    stderr = HeadCapture(RUN_COMMAND_MAX_OUTPUT)
+    readers = asyncio.gather(pump(process.stdout, stdout), pump(process.stderr, stderr))
+    waiter = asyncio.ensure_future(process.wait())
+
+    deadline = time.monotonic() + timeout
+    while not waiter.done():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        await asyncio.wait({waiter}, timeout=min(remaining, PROGRESS_INTERVAL))
+        if not waiter.done():
+            await _report_progress(ctx, stdout)
+
+    if not waiter.done():
+        await terminate(process)
+        readers.cancel()
+        return {
+            "success": False,
+            "error": f"Command timed out after {timeout} seconds",
+            "stdout": _truncated(stdout),
+            "stderr": _truncated(stderr),
+        }
+
+    try:
+        await asyncio.wait_for(readers, timeout=5)
+    except asyncio.TimeoutError:
+        pass  # A background child still holds the pipe; return what we have
+
+    return {
+        "success": process.returncode == 0,
+        "command": command,
+        "working_dir": str(cwd.relative_to(WORKSPACE_ROOT)),
+        "exit_code": process.returncode,
+        "stdout": _truncated(stdout),
+        "stderr": _truncated(stderr),
+    }
+
+
+def _is_cacheable_build(command: str, cwd: Path) -> bool:
+    # vercel build needs a linked project; everything else a package.json
+    marker = ".vercel/project.json" if is_vercel_build(command) else "package.json"
+    return (
+        BUILD_CACHE_MAX_BYTES > 0
+        and _CACHEABLE_BUILD.match(command.strip()) is not None
+        and (cwd / marker).is_file()
+    )
+
+
+async def _cached_build(command: str, cwd: Path, timeout: int, ctx: Optional[Context]) -> dict:
+    """Run a build command unless the cache holds the outputs of identical inputs."""
+    try:
+        key, input_files = await io_executor.run("build_cache", build_cache.key, cwd, command)
+        hit = await io_executor.run("build_cache", build_cache.restore, key, cwd)
+    except Exception as e:
+        logger.warning(f"Build cache unavailable, building normally: {e}")
+        return await _execute_command(command, cwd, timeout, ctx)
+
+    if hit:
+        built_at = datetime.fromtimestamp(hit["built_at"]).isoformat(timespec="seconds")
+        action = "restored from cache" if hit["restored"] else "already up to date"
+        return {
+            "success": True,
+            "command": command,
+            "working_dir": str(cwd.relative_to(WORKSPACE_ROOT)),
+            "exit_code": 0,
+            "stdout": (
+                f"Build skipped: inputs unchanged since {built_at}. "
+                f"{', '.join(hit['outputs'])} {action}."
+            ),
+            "stderr": "",
+            "build_cache": {"hit": True, "input_files": input_files, **hit},
+        }
+
+    result = await _execute_command(command, cwd, timeout, ctx)
+    cache_info = {"hit": False, "key": key, "input_files": input_files}
+    if result.get("success"):
+        try:
+            stored = await io_executor.run("build_cache", build_cache.store, key, cwd, command)
+            cache_info["stored"] = stored
+        except Exception as e:
+            logger.warning(f"Could not cache build outputs: {e}")
+    result["build_cache"] = cache_info
+    return result
 
-        # Set working directory
-        cwd = WORKSPACE_ROOT / working_dir if working_dir else WORKSPACE_ROOT
-        is_safe, error = is_path_safe(str(cwd))
-        if not is_safe:
-            return {"success": False, "error": error}
 
-        if not cwd.exists():
-            return {"success": False, "error": f"Directory not found: {working_dir}"}
+@mcp.tool()
+async def start_command(command: str, working_dir: str = "", timeout: int = 1800) -> dict:
+    """
+    Start a terminal command in the background and return immediately.
+    Same allowlist as run_command. Read its output with poll_command.
+
+    Args:
+        command: Command to run (e.g., "npm run build")
+        working_dir: Working directory (relative to workspace, default: workspace root)
+        timeout: Seconds before the command is stopped (default: 1800)
+
+    Returns:
+        job_id and the job's status
+    """
+    logger.info(f"🖥️ start_command: {command}")
 
-        # Run command
-        logger.info(f"Executing in {cwd}: {command}")
+    try:
+        cwd, error = _check_command(command, working_dir)
+        if error:
+            return error
 
-        process = await asyncio.create_subprocess_shell(
+        job = await job_manager.start(
             command,
-            cwd=str(cwd),
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            shell=True,
+            cwd,
+            str(cwd.relative_to(WORKSPACE_ROOT)),
+            timeout,
+            gate=command_scheduler.slot(command, _command_project(cwd)),
         )
+        return {"success": True, **job.info()}
+
+    except Exception as e:
+        logger.error(f"start_command error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+async def poll_command(
+    job_id: str,
+    offset: int = 0,
+    limit: int = 20000,
+    wait_seconds: float = 0,
+    ctx: Context = None,
+) -> dict:
+    """
+    Read a background command's status and output from an offset.
+
+    Pass the previous next_offset to get only new output. stdout and
+    stderr are interleaved as in a terminal. If the job produced more
+    output than the buffer keeps, "dropped" says how many characters
+    before offset were lost.
+
+    Args:
+        job_id: Job id from start_command
+        offset: Output offset to read from (default: 0)
+        limit: Maximum characters to return (default: 20000)
+        wait_seconds: Wait up to this long for new output or exit (max 60)
 
+    Returns:
+        Job status, exit_code, output chunk and next_offset
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return {"success": False, "error": f"Job not found: {job_id}"}
+
+    deadline = time.monotonic() + max(0, min(wait_seconds, CHANGES_MAX_WAIT))
+    while job.running and job.output.total <= offset and time.monotonic() < deadline:
         try:
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(), timeout=timeout
-            )
+            remaining = deadline - time.monotonic()
+            await asyncio.wait_for(job.done.wait(), timeout=min(remaining, 0.25))
         except asyncio.TimeoutError:
-            process.kill()
-            return {
-                "success": False,
-                "error": f"Command timed out after {timeout} seconds",
-            }
+            await _report_progress(ctx, job.output)
+
+    chunk = job.output.read(offset, max(1, min(limit, POLL_MAX_CHARS)))
+    return {
+        "success": True,
+        **job.info(),
+        **chunk,
+        "has_more": chunk["next_offset"] < job.output.total,
+    }
+
+
+@mcp.tool()
+async def cancel_command(job_id: str) -> dict:
+    """
+    Stop a background command (and its child processes).
+
+    Args:
+        job_id: Job id from start_command
+
+    Returns:
+        Final job status
+    """
+    logger.info(f"🛑 cancel_command: {job_id}")
+
+    job = await job_manager.cancel(job_id)
+    if job is None:
+        return {"success": False, "error": f"Job not found: {job_id}"}
+    return {"success": True, **job.info()}
+
+
+@mcp.tool()
+async def list_commands() -> dict:
+    """
+    List background commands, newest first.
+
+    Returns:
+        Jobs with status, exit code and last output line
+    """
+    jobs = job_manager.list()
+    return {"success": True, "count": len(jobs), "jobs": [job.info() for job in jobs]}
+
+
+# ════════════════════════════════════════════════════════════
+# GIT TOOLS
+# ════════════════════════════════════════════════════════════
+
+
+from git_backend import (
+    GitBackend,
+    GitError,
+    decode_diff_cursor,
+    diff_args,
+    diff_fingerprint,
+    encode_diff_cursor,
+    parse_numstat,
+    read_diff_page,
+    run_git,
+)
+
+# Repository handles: persistent cat-file process, cached status
+git_backend = GitBackend()
+
+
+def _on_changes_git(events: list[dict]):
+    if any(event["type"] == "overflow" for event in events):
+        git_backend.invalidate_all()
+        return
+    workspace = WORKSPACE_ROOT.resolve()
+    git_backend.invalidate([workspace / event["path"] for event in events])
+
+
+# Unfiltered: tracked build/icon.png or data.db must invalidate status too
+fs_watcher.subscribe(_on_changes_git, unfiltered=True)
+
+
+def _git_repo_for(path: str):
+    """(repo, cwd, None) for a workspace path, or (None, None, error)."""
+    cwd = WORKSPACE_ROOT / path if path else WORKSPACE_ROOT
+    is_safe, error = is_path_safe(str(cwd))
+    if not is_safe:
+        return None, None, {"success": False, "error": error}
+    if not cwd.is_dir():
+        return None, None, {"success": False, "error": f"Directory not found: {path}"}
+    try:
+        return git_backend.repo(cwd), cwd, None
+    except (GitError, OSError, subprocess.SubprocessError):
+        return None, None, {"success": False, "error": "Not a git repository"}
+
+
+def _git_repo_label(repo) -> str:
+    try:
+        return str(repo.root.relative_to(WORKSPACE_ROOT.resolve())) or "."
+    except ValueError:
+        return str(repo.root)
+
+
+def _git_status_trusted(repo) -> bool:
+    """
+    A cached status is only valid while the watcher sees every change git
+    would: the repository must lie inside the workspace, and the blocked
+    folders in it (never watched) must be ignored by git.
+    """
+    if not _index_is_watched():
+        return False
+    workspace = WORKSPACE_ROOT.resolve()
+    if repo.root != workspace and workspace not in repo.root.parents:
+        return False
+    unwatched = []
+    for rel_dir in fs_watcher.blind_dirs():
+        folder = workspace / rel_dir
+        if repo.root in folder.parents and ".git" not in folder.relative_to(repo.root).parts:
+            unwatched.append(folder)
+    return repo.ignores(unwatched)
+
+
+def _git_status_sync(path: str) -> dict:
+    """Blocking body of git_status (runs on the I/O executor)."""
+    repo, cwd, error = _git_repo_for(path)
+    if error:
+        return error
+    try:
+        # Edits the watcher can't see would go unnoticed: re-run unless trusted
+        status, cached = repo.status(trust_cache=_git_status_trusted(repo))
+    except (GitError, OSError, subprocess.SubprocessError) as e:
+        return {"success": False, "error": str(e)}
+
+    changes = status["entries"]
+    return {
+        "success": True,
+        "working_dir": str(cwd.relative_to(WORKSPACE_ROOT)),
+        "repo": _git_repo_label(repo),
+        "branch": status["branch"],
+        "clean": len(changes) == 0,
+        "changes": changes,
+        "cached": cached,
+    }
+
+
+@mcp.tool()
+async def git_status(path: str = "") -> dict:
+    """
+    Get git status of a repository.
+
+    Args:
+        path: Path to git repository (relative to workspace)
 
-        stdout_text = stdout.decode("utf-8", errors="replace")
-        stderr_text = stderr.decode("utf-8", errors="replace")
+    Returns:
+        Branch (head, upstream, ahead/behind) and changes, each with a
+        two-letter status ("M ", " D", "??"), file and kind (changed,
+        renamed, copied, unmerged, untracked); paths are relative to the
+        repository root
+    """
+    return await io_executor.run("git", _git_status_sync, path)
 
-        # Truncate long output
-        max_output = 10000
-        if len(stdout_text) > max_output:
-            stdout_text = (
-                stdout_text[:max_output]
-                + f"\n... (truncated, {len(stdout_text)} chars total)"
-            )
-        if len(stderr_text) > max_output:
-            stderr_text = (
-                stderr_text[:max_output]
-                + f"\n... (truncated, {len(stderr_text)} chars total)"
-            )
 
-        return {
-            "success": process.returncode == 0,
-            "command": command,
-            "working_dir": str(cwd.relative_to(WORKSPACE_ROOT)),
-            "exit_code": process.returncode,
-            "stdout": stdout_text,
-            "stderr": stderr_text,
-        }
+# Hunk bytes per git_diff page (default / upper bound)
+DIFF_PAGE_BYTES = 20000
+DIFF_PAGE_MAX_BYTES = 500000
 
-    except Exception as e:
-        logger.error(f"run_command error: {e}")
-        return {"success": False, "error": str(e)}
 
+def _git_diff_sync(
+    path: str,
+    file: str,
+    staged: bool,
+    ref: str,
+    cursor: str,
+    max_bytes: int,
+    context_lines: int,
+    summary_only: bool,
+) -> dict:
+    """Blocking body of git_diff (runs on the I/O executor)."""
+    repo, cwd, error = _git_repo_for(path)
+    if error:
+        return error
+    pathspec = [file] if file else []
+    context_lines = max(0, min(context_lines, 100))
+    try:
+        args = diff_args(staged, ref)
+        numstat = run_git(cwd, "diff", *args, "--numstat", "-z", "--", *pathspec)
+        fingerprint = diff_fingerprint(args, context_lines, pathspec, numstat)
+        start = decode_diff_cursor(cursor, fingerprint) if cursor else (0, 0, 0)
+    except (GitError, ValueError, OSError, subprocess.SubprocessError) as e:
+        return {"success": False, "error": str(e)}
 
-# ════════════════════════════════════════════════════════════
-# GIT TOOLS
-# ════════════════════════════════════════════════════════════
+    files = parse_numstat(numstat)
+    result = {
+        "success": True,
+        "working_dir": str(cwd.relative_to(WORKSPACE_ROOT)),
+        "repo": _git_repo_label(repo),
+        "staged": staged,
+        "ref": ref or None,
+        "total_files": len(files),
+        "added": sum(entry["added"] or 0 for entry in files),
+        "deleted": sum(entry["deleted"] or 0 for entry in files),
+    }
+    if not cursor:
+        result["files"] = files
+    if summary_only or not files:
+        result["hunks"] = []
+        result["next_cursor"] = encode_diff_cursor(fingerprint, (0, 0, 0)) if files else None
+        return result
+
+    budget = max(1000, min(max_bytes, DIFF_PAGE_MAX_BYTES))
+    try:
+        hunks, next_position = read_diff_page(
+            cwd, args, context_lines, pathspec, start, budget
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        return {"success": False, "error": str(e)}
+    for hunk in hunks:
+        if hunk["file_index"] < len(files):
+            hunk["file"] = files[hunk["file_index"]]["file"]
+    result["hunks"] = hunks
+    result["bytes"] = sum(len(hunk["diff"].encode("utf-8")) for hunk in hunks)
+    result["next_cursor"] = (
+        encode_diff_cursor(fingerprint, next_position) if next_position else None
+    )
+    return result
 
 
 @mcp.tool()
-async def git_status(path: str = "") -> dict:
+async def git_diff(
+    path: str = "",
+    file: str = "",
+    staged: bool = False,
+    ref: str = "",
+    cursor: str = "",
+    max_bytes: int = DIFF_PAGE_BYTES,
+    context_lines: int = 3,
+    summary_only: bool = False,
+) -> dict:
     """
-    Get git status of a repository.
+    Get git diff of changes, as a per-file summary plus pages of hunks.
+    Pass next_cursor back to get the following hunks.
 
     Args:
-        path: Path to git repository (relative to workspace)
+        path: Path to git repository
+        file: Specific file to diff (optional)
+        staged: Diff the index against HEAD instead of the working tree
+        ref: Commit or branch to diff against (optional)
+        cursor: next_cursor from a previous call (same other arguments)
+        max_bytes: Hunk text per page (default: 20000, max: 500000)
+        context_lines: Context lines around each change (default: 3)
+        summary_only: Return only the per-file summary
 
     Returns:
-        Git status information
+        files (file, added, deleted, binary, orig_file for renames; first
+        page only), totals, hunks (file, header, old/new start and line
+        counts, diff text; a hunk too big for one page is split, its head
+        flagged truncated and the rest resumed with line_offset on the next
+        page) and next_cursor (None when done)
     """
-    result = await run_command("git status --porcelain=v1", path)
-
-    if (
-        not result.get("success")
-        and "not a git repository" in result.get("stderr", "").lower()
-    ):
-        return {"success": False, "error": "Not a git repository"}
+    return await io_executor.run(
+        "git",
+        _git_diff_sync,
+        path,
+        file,
+        staged,
+        ref,
+        cursor,
+        max_bytes,
+        context_lines,
+        summary_only,
+    )
 
-    # Parse status
-    changes = []
-    for line in result.get("stdout", "").strip().split("\n"):
-        if line:
-            status = line[:2]
-            file = line[3:]
-            changes.append({"status": status, "file": file})
 
+def _git_log_sync(path: str, count: int, ref: str) -> dict:
+    """Blocking body of git_log (runs on the I/O executor)."""
+    repo, cwd, error = _git_repo_for(path)
+    if error:
+        return error
+    try:
+        commits = repo.log(ref or "HEAD", max(1, min(count, 500)))
+    except (GitError, ValueError, OSError) as e:
+        return {"success": False, "error": str(e)}
     return {
         "success": True,
-        "working_dir": result.get("working_dir"),
-        "clean": len(changes) == 0,
-        "changes": changes,
+        "working_dir": str(cwd.relative_to(WORKSPACE_ROOT)),
+        "repo": _git_repo_label(repo),
+        "ref": ref or "HEAD",
+        "count": len(commits),
+        "commits": commits,
     }
 
 
 @mcp.tool()
-async def git_diff(path: str = "", file: str = "") -> dict:
+async def git_log(path: str = "", count: int = 10, ref: str = "") -> dict:
     """
-    Get git diff of changes.
+    Get git commit log.
 
     Args:
         path: Path to git repository
-        file: Specific file to diff (optional)
+        count: Number of commits to show (default: 10, max: 500)
+        ref: Branch, tag or commit to start from (default: HEAD)
 
     Returns:
-        Diff output
+        Commits (newest first) with sha, parents, author, author_email,
+        date, committer, committed_at, subject and body
     """
-    cmd = f"git diff {file}" if file else "git diff"
-    return await run_command(cmd, path)
+    return await io_executor.run("git", _git_log_sync, path, count, ref)
+
+
+from git_history import GitHistory
+
+# Per-repository commit index behind git_history_query
+git_history = GitHistory(CACHE_DIR / "git-history")
+
+_RELATIVE_DATE = re.compile(r"^(\d+)\s*(minute|hour|day|week|month|year)s?(\s+ago)?$")
+_DATE_UNITS = {
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+    "month": 30 * 86400,
+    "year": 365 * 86400,
+}
+
+
+def _parse_history_date(value: str) -> Optional[int]:
+    """ISO date/datetime or "<n> days/weeks/months ago" -> epoch seconds."""
+    value = value.strip().lower()
+    if not value:
+        return None
+    match = _RELATIVE_DATE.match(value)
+    if match:
+        return int(time.time()) - int(match.group(1)) * _DATE_UNITS[match.group(2)]
+    try:
+        return int(datetime.fromisoformat(value.replace("z", "+00:00")).timestamp())
+    except ValueError:
+        raise ValueError(
+            f"Invalid date: {value} (use YYYY-MM-DD, an ISO datetime or '30 days ago')"
+        )
+
+
+def _git_history_query_sync(
+    path: str,
+    file: str,
+    author: str,
+    since: str,
+    until: str,
+    text: str,
+    limit: int,
+) -> dict:
+    """Blocking body of git_history_query (runs on the I/O executor)."""
+    repo, cwd, error = _git_repo_for(path)
+    if error:
+        return error
+    try:
+        since_at = _parse_history_date(since)
+        until_at = _parse_history_date(until)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    repo_path = ""
+    if file:
+        target = (cwd / file).resolve()
+        try:
+            repo_path = target.relative_to(repo.root).as_posix()
+        except ValueError:
+            return {"success": False, "error": f"File is outside the repository: {file}"}
+        if repo_path == ".":
+            repo_path = ""
+
+    index = git_history.index(repo.root)
+    try:
+        update = index.update()
+    except (GitError, OSError, subprocess.SubprocessError) as e:
+        return {"success": False, "error": str(e)}
+    result = index.query(
+        path=repo_path,
+        author=author,
+        since=since_at,
+        until=until_at,
+        text=text,
+        limit=max(1, min(limit, 500)),
+    )
+    return {
+        "success": True,
+        "repo": _git_repo_label(repo),
+        "file": repo_path or None,
+        "indexed_commits": index.stats()["commits"],
+        "new_commits_indexed": update["new_commits"],
+        **result,
+    }
 
 
 @mcp.tool()
-async def git_log(path: str = "", count: int = 10) -> dict:
+async def git_history_query(
+    path: str = "",
+    file: str = "",
+    author: str = "",
+    since: str = "",
+    until: str = "",
+    text: str = "",
+    limit: int = 50,
+) -> dict:
     """
-    Get git commit log.
+    Search commit history (all branches and tags) through a persisted index.
+    The index is brought up to date with new commits on every call.
 
     Args:
         path: Path to git repository
-        count: Number of commits to show (default: 10)
+        file: File or folder (relative to path) the commits must touch
+        author: Author name or email contains this (case-insensitive)
+        since: Committed at or after: YYYY-MM-DD, ISO datetime or "30 days ago"
+        until: Committed before (same formats)
+        text: Commit message contains this (case-insensitive)
+        limit: Maximum commits returned (default: 50, max: 500)
 
     Returns:
-        Commit log
+        total matches, authors ranked by matching commits, and commits
+        (newest first) with sha, author, date, subject, body and the files
+        they touched (only the matching ones when file is given)
     """
-    cmd = f"git log --oneline -n {min(count, 50)}"
-    return await run_command(cmd, path)
+    return await io_executor.run(
+        "git_history", _git_history_query_sync, path, file, author, since, until, text, limit
+    )
 
 
 @mcp.tool()
@@ -1021,138 +3457,518 @@ async def git_pull(path: str = "") -> dict:
     return await run_command("git pull", path)
 
 
+# Repositories processed at once by git_status_all / git_fetch_all / git_pull_all
+GIT_ALL_CONCURRENCY = 8
+
+
+async def _git_projects() -> tuple[list[str], Optional[dict]]:
+    """Paths of the projects list_projects reports as git repositories."""
+    catalog = await list_projects()
+    if not catalog.get("success"):
+        return [], catalog
+    return [project["path"] for project in catalog["projects"] if project.get("git")], None
+
+
+async def _fan_out(operation, paths: list[str], concurrency: int) -> list[dict]:
+    """operation(path) for every project, at most concurrency at a time, timed."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(path: str) -> dict:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await operation(path)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            return {
+                "project": path,
+                **result,
+                "elapsed_seconds": round(time.perf_counter() - started, 3),
+            }
+
+    return list(await asyncio.gather(*(run_one(path) for path in paths)))
+
+
+def _git_remote_result(result: dict) -> dict:
+    """Compact run_command result for the *_all reports."""
+    output = "\n".join(
+        part.strip() for part in (result.get("stdout"), result.get("stderr")) if part
+    )
+    compact = {"success": result.get("success", False), "output": output[-1000:]}
+    for key in ("exit_code", "error", "scheduling"):
+        if key in result:
+            compact[key] = result[key]
+    return compact
+
+
+async def _git_sync_one(path: str, command: str, timeout: int) -> dict:
+    """Run a fetch/pull in one repository, then report its fresh branch state."""
+    result = _git_remote_result(await run_command(command, path, timeout=timeout))
+    # Remote-tracking refs aren't part of the cached status stamp
+    git_backend.invalidate([(WORKSPACE_ROOT / path).resolve()])
+    status = await io_executor.run("git", _git_status_sync, path)
+    if status.get("success"):
+        result["branch"] = status["branch"]
+        result["clean"] = status["clean"]
+    return result
+
+
+def _git_all_report(results: list[dict], started: float, **summary) -> dict:
+    return {
+        "success": all(result["success"] for result in results),
+        "repos": len(results),
+        "failed": [result["project"] for result in results if not result["success"]],
+        **summary,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "results": results,
+    }
+
+
+@mcp.tool()
+async def git_status_all(
+    include_clean: bool = False, concurrency: int = GIT_ALL_CONCURRENCY
+) -> dict:
+    """
+    Get git status of every git project in the workspace (as found by list_projects).
+
+    Args:
+        include_clean: Also list clean repositories that are in sync with upstream
+        concurrency: Repositories checked at once (default: 8)
+
+    Returns:
+        Dirty / ahead / behind project lists and per-repository status
+        (branch, changes, elapsed_seconds)
+    """
+    started = time.perf_counter()
+    paths, error = await _git_projects()
+    if error:
+        return error
+
+    async def status(path: str) -> dict:
+        return await io_executor.run("git", _git_status_sync, path)
+
+    results = await _fan_out(status, paths, concurrency)
+    ok = [result for result in results if result["success"]]
+    report = _git_all_report(
+        results,
+        started,
+        dirty=[result["project"] for result in ok if not result["clean"]],
+        ahead=[result["project"] for result in ok if result["branch"]["ahead"]],
+        behind=[result["project"] for result in ok if result["branch"]["behind"]],
+    )
+    if not include_clean:
+        report["results"] = [
+            result
+            for result in results
+            if not result["success"]
+            or not result["clean"]
+            or result["branch"]["ahead"]
+            or result["branch"]["behind"]
+        ]
+    return report
+
+
+@mcp.tool()
+async def git_fetch_all(concurrency: int = GIT_ALL_CONCURRENCY, timeout: int = 120) -> dict:
+    """
+    Fetch (and prune) all remotes of every git project in the workspace.
+
+    Args:
+        concurrency: Repositories fetched at once (default: 8)
+        timeout: Timeout per repository in seconds (default: 120)
+
+    Returns:
+        Projects now behind their upstream and per-repository results
+        (output, branch ahead/behind, elapsed_seconds)
+    """
+    started = time.perf_counter()
+    paths, error = await _git_projects()
+    if error:
+        return error
+
+    async def fetch(path: str) -> dict:
+        return await _git_sync_one(path, "git fetch --all --prune", timeout)
+
+    results = await _fan_out(fetch, paths, concurrency)
+    return _git_all_report(
+        results,
+        started,
+        behind=[
+            result["project"]
+            for result in results
+            if result["success"] and result.get("branch", {}).get("behind")
+        ],
+    )
+
+
+@mcp.tool()
+async def git_pull_all(concurrency: int = 4, timeout: int = 300) -> dict:
+    """
+    Pull every git project in the workspace (fast-forward only, so no
+    merge commits are created; diverged repositories are reported as failed).
+
+    Args:
+        concurrency: Repositories pulled at once (default: 4)
+        timeout: Timeout per repository in seconds (default: 300)
+
+    Returns:
+        Updated project list and per-repository results
+        (output, branch, elapsed_seconds)
+    """
+    started = time.perf_counter()
+    paths, error = await _git_projects()
+    if error:
+        return error
+
+    async def pull(path: str) -> dict:
+        # Compare commits rather than git's (localized) "Already up to date."
+        before = await _git_head(path)
+        result = await _git_sync_one(path, "git pull --ff-only", timeout)
+        after = await _git_head(path)
+        result["updated"] = result["success"] and bool(after) and after != before
+        return result
+
+    results = await _fan_out(pull, paths, concurrency)
+    return _git_all_report(
+        results,
+        started,
+        updated=[result["project"] for result in results if result.get("updated")],
+    )
+
+
 # ════════════════════════════════════════════════════════════
 # DEPLOYMENT TOOLS
 # ════════════════════════════════════════════════════════════
 
 
+_VERCEL_URL = re.compile(r"https://[\w\-]+\.vercel\.app")
+
+# Seconds allowed for each vercel command (pull, build, deploy)
+VERCEL_TIMEOUT = 900
+
+
+def _vercel_step(name: str, result: dict, started: float) -> dict:
+    step = {
+        "step": name,
+        "success": result.get("success", False),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    if "build_cache" in result:
+        step["cached"] = result["build_cache"].get("hit", False)
+    if not step["success"]:
+        step["error"] = result.get("stderr") or result.get("error") or f"{name} failed"
+    return step
+
+
+async def _vercel_build(project: str, production: bool) -> dict:
+    """`vercel pull` then `vercel build`: the Build Output for deploy --prebuilt."""
+    if not (WORKSPACE_ROOT / project / ".vercel" / "project.json").is_file():
+        return {
+            "success": False,
+            "error": "Project is not linked to Vercel (no .vercel/project.json); "
+            "run `vercel link` in it once",
+            "steps": [],
+        }
+    environment = "production" if production else "preview"
+    steps = []
+    for name, command in (
+        ("vercel_pull", f"vercel pull --yes --environment={environment}"),
+        ("vercel_build", "vercel build --prod" if production else "vercel build"),
+    ):
+        started = time.perf_counter()
+        result = await run_command(command, project, timeout=VERCEL_TIMEOUT)
+        steps.append(_vercel_step(name, result, started))
+        if not result.get("success"):
+            return {"success": False, "error": steps[-1]["error"], "steps": steps}
+    return {"success": True, "steps": steps}
+
+
+async def _vercel_deploy(project: str, production: bool, prebuilt: bool) -> dict:
+    if prebuilt:
+        cmd = "vercel deploy --prebuilt --prod" if production else "vercel deploy --prebuilt"
+    else:
+        cmd = "vercel --prod --yes" if production else "vercel --yes"
+    result = await run_command(cmd, project, timeout=VERCEL_TIMEOUT)
+
+    # Extract deployment URL from output
+    if result.get("success"):
+        # Vercel outputs URL like: https://project-xxx.vercel.app
+        url_match = _VERCEL_URL.search(result.get("stdout", ""))
+        if url_match:
+            result["deployment_url"] = url_match.group()
+    return result
+
+
 @mcp.tool()
-async def deploy_vercel(project: str, production: bool = False) -> dict:
+async def deploy_vercel(
+    project: str, production: bool = False, prebuilt: bool = False
+) -> dict:
     """
     Deploy a project to Vercel.
 
     Args:
         project: Project path (relative to workspace)
         production: Deploy to production (default: False = preview)
+        prebuilt: Build locally (vercel pull + vercel build, served by the
+            build cache when nothing changed) and upload the output with
+            `vercel deploy --prebuilt` instead of building on Vercel.
+            Needs a linked project (.vercel/project.json)
 
     Returns:
-        Deployment result with URL
+        Deployment result with URL (and per-step timing when prebuilt)
     """
-    logger.info(f"[DEPLOY] deploy_vercel: {project} (prod={production})")
+    logger.info(f"[DEPLOY] deploy_vercel: {project} (prod={production}, prebuilt={prebuilt})")
 
-    cmd = "vercel --yes" if not production else "vercel --prod --yes"
-    result = await run_command(cmd, project)
+    if not prebuilt:
+        return await _vercel_deploy(project, production, prebuilt=False)
 
-    # Extract deployment URL from output
-    if result.get("success"):
-        stdout = result.get("stdout", "")
-        # Vercel outputs URL like: https://project-xxx.vercel.app
-        import re
+    build = await _vercel_build(project, production)
+    if not build["success"]:
+        return build
+    started = time.perf_counter()
+    result = await _vercel_deploy(project, production, prebuilt=True)
+    result["steps"] = build["steps"] + [_vercel_step("vercel_deploy", result, started)]
+    return result
 
-        url_match = re.search(r"https://[\w\-]+\.vercel\.app", stdout)
-        if url_match:
-            result["deployment_url"] = url_match.group()
 
-    return result
+# Projects deployed at once by deploy_many
+DEPLOY_CONCURRENCY = 3
 
 
 @mcp.tool()
-async def full_deploy_pipeline(
-    project: str, commit_message: str, branch: str = "main", deploy_prod: bool = False
+async def deploy_many(
+    projects: list[str],
+    production: bool = False,
+    prebuilt: bool = False,
+    concurrency: int = DEPLOY_CONCURRENCY,
 ) -> dict:
     """
-    Full deployment pipeline: build -> commit -> push -> deploy.
+    Deploy several projects to Vercel concurrently.
 
     Args:
-        project: Project path
-        commit_message: Git commit message
-        branch: Branch to push to (default: main)
-        deploy_prod: Deploy to production (default: False)
+        projects: Project paths (relative to workspace)
+        production: Deploy to production (default: False = preview)
+        prebuilt: Build locally and upload with --prebuilt (see deploy_vercel)
+        concurrency: Projects deployed at once (default: 3)
 
     Returns:
-        Pipeline results with all steps
+        deployment_urls by project, failed projects and per-project results
+        (deployment_url, error, steps, elapsed_seconds)
     """
-    logger.info(f"[PIPELINE] full_deploy_pipeline: {project}")
+    logger.info(f"[DEPLOY] deploy_many: {len(projects)} projects (prod={production})")
+    started = time.perf_counter()
+    projects = list(dict.fromkeys(projects))
+
+    async def deploy(project: str) -> dict:
+        result = await deploy_vercel(project, production, prebuilt)
+        compact = {"success": result.get("success", False)}
+        for key in ("deployment_url", "steps", "scheduling"):
+            if key in result:
+                compact[key] = result[key]
+        if not compact["success"]:
+            error = result.get("stderr") or result.get("error") or "Deploy failed"
+            compact["error"] = error[-2000:]
+        return compact
+
+    results = await _fan_out(deploy, projects, concurrency)
+    return {
+        "success": all(result["success"] for result in results),
+        "deployed": sum(1 for result in results if result["success"]),
+        "failed": [result["project"] for result in results if not result["success"]],
+        "deployment_urls": {
+            result["project"]: result["deployment_url"]
+            for result in results
+            if result.get("deployment_url")
+        },
+        "production": production,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "results": results,
+    }
 
-    results = {"success": True, "project": project, "steps": []}
 
-    # Step 1: Build (if package.json exists)
-    project_path = WORKSPACE_ROOT / project
-    if (project_path / "package.json").exists():
-        build_result = await run_command("npm run build", project)
-        results["steps"].append(
-            {
-                "step": "build",
-                "success": build_result.get("success", False),
-                "message": (
-                    "Build completed"
-                    if build_result.get("success")
-                    else build_result.get("stderr", "Build failed")
-                ),
-            }
-        )
+from deploy_pipeline import PipelineRunner, PipelineStore, Step
 
-        if not build_result.get("success"):
-            results["success"] = False
-            results["failed_at"] = "build"
-            return results
+# Step graph runner for full_deploy_pipeline, with state kept between runs
+pipeline_runner = PipelineRunner(PipelineStore(CACHE_DIR / "pipelines"))
 
-    # Step 2: Git add all changes
-    add_result = await run_command("git add -A", project)
-    results["steps"].append(
-        {"step": "git_add", "success": add_result.get("success", False)}
-    )
 
-    # Step 3: Git commit
-    safe_message = commit_message.replace('"', '\\"')
-    commit_result = await run_command(f'git commit -m "{safe_message}"', project)
+def _package_scripts(project_path: Path) -> dict:
+    try:
+        package = json.loads((project_path / "package.json").read_text("utf-8"))
+        return package.get("scripts") or {}
+    except (OSError, ValueError, AttributeError):
+        return {}
 
-    # Check if there's nothing to commit (not an error)
-    nothing_to_commit = "nothing to commit" in commit_result.get("stdout", "").lower()
 
-    results["steps"].append(
-        {
-            "step": "git_commit",
-            "success": commit_result.get("success", False) or nothing_to_commit,
+async def _git_head(project: str) -> str:
+    try:
+        head = await io_executor.run(
+            "git", run_git, WORKSPACE_ROOT / project, "rev-parse", "HEAD"
+        )
+        return head.strip()
+    except (GitError, OSError, subprocess.SubprocessError):
+        return ""
+
+
+def _deploy_steps(
+    project: str,
+    commit_message: str,
+    branch: str,
+    deploy_prod: bool,
+    lint: bool,
+    prebuilt: bool,
+) -> list[Step]:
+    """build + lint (concurrently) -> git_add -> git_commit -> git_push -> deploy."""
+    project_path = WORKSPACE_ROOT / project
+    scripts = _package_scripts(project_path)
+    steps = []
+    if prebuilt:
+        build_command = "vercel build --prod" if deploy_prod else "vercel build"
+    else:
+        build_command = "npm run build"
+
+    async def inputs_of(command: str) -> str:
+        """Build-cache key: tracked sources plus ignored .env* / Vercel settings."""
+        key, _ = await io_executor.run("build_cache", build_cache.key, project_path, command)
+        return key
+
+    async def build() -> dict:
+        if prebuilt:
+            # vercel build runs the project's build and leaves .vercel/output for deploy
+            result = await _vercel_build(project, deploy_prod)
+            cached = all(step.get("cached") for step in result["steps"][1:])
+            return {**result, "cached": bool(result["steps"][1:]) and cached}
+        # Unchanged builds are skipped by the build cache, which also restores outputs
+        result = await run_command(build_command, project)
+        cached = result.get("build_cache", {}).get("hit", False)
+        if not result.get("success"):
+            message = result.get("stderr") or result.get("error") or "Build failed"
+        elif cached:
+            message = "Build skipped (unchanged, outputs from cache)"
+        else:
+            message = "Build completed"
+        return {"success": result.get("success", False), "cached": cached, "message": message}
+
+    async def run_lint() -> dict:
+        result = await run_command("npm run lint", project)
+        if result.get("success"):
+            return {"success": True, "message": "Lint passed"}
+        output = result.get("stdout") or result.get("stderr") or result.get("error", "")
+        return {"success": False, "message": "Lint failed", "error": output[-2000:]}
+
+    async def lint_inputs() -> str:
+        return await inputs_of("npm run lint")
+
+    async def git_add() -> dict:
+        result = await run_command("git add -A", project)
+        return {"success": result.get("success", False), "error": result.get("stderr", "")}
+
+    async def git_commit() -> dict:
+        safe_message = commit_message.replace('"', '\\"')
+        result = await run_command(f'git commit -m "{safe_message}"', project)
+        # Nothing to commit is not an error
+        nothing_to_commit = "nothing to commit" in result.get("stdout", "").lower()
+        return {
+            "success": result.get("success", False) or nothing_to_commit,
             "message": "No changes to commit" if nothing_to_commit else commit_message,
+            "error": result.get("stderr", ""),
         }
-    )
 
-    # Step 4: Git push
-    push_result = await run_command(f"git push origin {branch}", project)
-    results["steps"].append(
-        {
-            "step": "git_push",
-            "success": push_result.get("success", False),
+    async def git_push() -> dict:
+        result = await run_command(f"git push origin {branch}", project)
+        return {
+            "success": result.get("success", False),
             "branch": branch,
+            "error": result.get("stderr") or result.get("error") or "Push failed",
         }
-    )
 
-    if not push_result.get("success"):
-        results["success"] = False
-        results["failed_at"] = "git_push"
-        results["error"] = push_result.get("stderr", "Push failed")
-        return results
+    async def pushed_inputs() -> str:
+        return f"{await _git_head(project)}:{branch}"
 
-    # Step 5: Deploy to Vercel
-    deploy_result = await deploy_vercel(project, deploy_prod)
-    results["steps"].append(
-        {
-            "step": "deploy",
-            "success": deploy_result.get("success", False),
-            "url": deploy_result.get("deployment_url", ""),
+    async def deploy() -> dict:
+        result = await _vercel_deploy(project, deploy_prod, prebuilt)
+        return {
+            "success": result.get("success", False),
+            "url": result.get("deployment_url", ""),
             "production": deploy_prod,
+            "prebuilt": prebuilt,
+            "error": result.get("stderr") or result.get("error") or "Deploy failed",
         }
-    )
 
-    if not deploy_result.get("success"):
-        results["success"] = False
-        results["failed_at"] = "deploy"
-        results["error"] = deploy_result.get("stderr", "Deploy failed")
-    else:
-        results["deployment_url"] = deploy_result.get("deployment_url", "")
+    async def deploy_inputs() -> str:
+        # HEAD alone misses git-ignored inputs (.env*, pulled Vercel env)
+        target = "prod" if deploy_prod else "preview"
+        mode = "prebuilt" if prebuilt else "remote"
+        return f"{await _git_head(project)}:{target}:{mode}:{await inputs_of(build_command)}"
+
+    checks = []
+    if prebuilt or (project_path / "package.json").exists():
+        steps.append(Step("build", build))
+        checks.append("build")
+        if lint and "lint" in scripts:
+            steps.append(Step("lint", run_lint, inputs=lint_inputs))
+            checks.append("lint")
+    steps += [
+        Step("git_add", git_add, needs=tuple(checks)),
+        Step("git_commit", git_commit, needs=("git_add",)),
+        Step("git_push", git_push, needs=("git_commit",), inputs=pushed_inputs),
+        Step("deploy", deploy, needs=("git_push",), inputs=deploy_inputs),
+    ]
+    return steps
+
+
+@mcp.tool()
+async def full_deploy_pipeline(
+    project: str,
+    commit_message: str,
+    branch: str = "main",
+    deploy_prod: bool = False,
+    lint: bool = False,
+    force: bool = False,
+    prebuilt: bool = False,
+) -> dict:
+    """
+    Full deployment pipeline: build + lint -> add -> commit -> push -> deploy.
+    Build and lint run concurrently. A re-run resumes where the last one
+    failed: push is skipped when HEAD is the same as in its last successful
+    run, deploy when HEAD, target and the build inputs (including ignored
+    .env* files) are, lint when its inputs are unchanged, and build is
+    served by the build cache.
+
+    Args:
+        project: Project path
+        commit_message: Git commit message
+        branch: Branch to push to (default: main)
+        deploy_prod: Deploy to production (default: False)
+        lint: Run the package.json "lint" script alongside the build (default: False)
+        force: Run every step even if its inputs are unchanged
+        prebuilt: Build with `vercel build` and deploy that output with
+            `vercel deploy --prebuilt`, so Vercel doesn't build again
+
+    Returns:
+        Pipeline results with all steps (status succeeded / failed /
+        skipped / blocked and seconds each), failed_at and error on failure
+    """
+    logger.info(f"[PIPELINE] full_deploy_pipeline: {project}")
 
-    return results
+    project_path = WORKSPACE_ROOT / project
+    is_safe, error = is_path_safe(str(project_path))
+    if not is_safe:
+        return {"success": False, "error": error}
+    if not project_path.is_dir():
+        return {"success": False, "error": f"Directory not found: {project}"}
+
+    steps = _deploy_steps(project, commit_message, branch, deploy_prod, lint, prebuilt)
+    result = await pipeline_runner.run(
+        f"full_deploy:{project_path.resolve()}", steps, force=force
+    )
+    for record in result["steps"]:
+        if record.get("success"):
+            record.pop("error", None)
+    deploy = next(record for record in result["steps"] if record["step"] == "deploy")
+    if deploy["success"]:
+        result["deployment_url"] = deploy.get("url", "")
+    return {"project": project, **result}
 
 
 # ════════════════════════════════════════════════════════════
@@ -1160,6 +3976,22 @@ async def full_deploy_pipeline(
 # ════════════════════════════════════════════════════════════
 
 
+# list_projects result, reused until the file watcher reports a change
+# at project level (a top-level folder or a file directly inside one)
+_project_catalog: Optional[list[dict]] = None
+
+
+def _on_changes_project_catalog(events: list[dict]):
+    global _project_catalog
+    for event in events:
+        if event["type"] == "overflow" or len(Path(event["path"]).parts) <= 2:
+            _project_catalog = None
+            return
+
+
+fs_watcher.subscribe(_on_changes_project_catalog)
+
+
 @mcp.tool()
 async def list_projects() -> dict:
     """
@@ -1169,8 +4001,17 @@ async def list_projects() -> dict:
         List of projects with basic info
     """
     logger.info("📋 list_projects")
+    global _project_catalog
 
     try:
+        if fs_watcher.running and _project_catalog is not None:
+            return {
+                "success": True,
+                "workspace": str(WORKSPACE_ROOT),
+                "count": len(_project_catalog),
+                "projects": _project_catalog,
+            }
+
         projects = []
 
         for item in WORKSPACE_ROOT.iterdir():
@@ -1211,6 +4052,8 @@ async def list_projects() -> dict:
             projects.append(project_info)
 
         projects.sort(key=lambda x: x["name"])
+        if fs_watcher.running:
+            _project_catalog = projects
 
         return {
             "success": True,
@@ -1293,6 +4136,204 @@ async def get_project_info(project: str) -> dict:
         return {"success": False, "error": str(e)}
 
 
+# ════════════════════════════════════════════════════════════
+# BATCH TOOL CALLS
+# ════════════════════════════════════════════════════════════
+
+# Tools that can run inside batch_tools
+BATCH_TOOLS = {
+    "read_file": read_file,
+    "read_files": read_files,
+    "write_file": write_file,
+    "edit_file": edit_file,
+    "delete_file": delete_file,
+    "undo_edit": undo_edit,
+    "list_snapshots": list_snapshots,
+    "apply_patch": apply_patch,
+    "search_files": search_files,
+    "search_many": search_many,
+    "replace_in_workspace": replace_in_workspace,
+    "list_files": list_files,
+    "changes_since": changes_since,
+    "find_symbol": find_symbol,
+    "list_symbols": list_symbols,
+    "select_tests": select_tests,
+    "semantic_search_code": semantic_search_code,
+    "run_command": run_command,
+    "start_command": start_command,
+    "poll_command": poll_command,
+    "cancel_command": cancel_command,
+    "list_commands": list_commands,
+    "git_status": git_status,
+    "git_diff": git_diff,
+    "git_log": git_log,
+    "git_history_query": git_history_query,
+    "git_commit": git_commit,
+    "git_push": git_push,
+    "git_pull": git_pull,
+    "git_status_all": git_status_all,
+    "git_fetch_all": git_fetch_all,
+    "git_pull_all": git_pull_all,
+    "list_projects": list_projects,
+    "get_project_info": get_project_info,
+}
+
+# Maximum number of calls in one batch
+BATCH_MAX_CALLS = 50
+
+
+def _validate_batch(calls: list[dict]) -> tuple[list[dict], str]:
+    """
+    Normalize batch calls and check tools, ids and dependencies.
+    Returns (steps, error_message).
+    """
+    steps = []
+    ids = set()
+    for position, call in enumerate(calls):
+        if not isinstance(call, dict):
+            return [], f"Call #{position} must be an object"
+
+        step_id = str(call.get("id", position))
+        if step_id in ids:
+            return [], f"Duplicate call id: {step_id}"
+        ids.add(step_id)
+
+        tool = call.get("tool", "")
+        if tool not in BATCH_TOOLS:
+            return [], f"Call {step_id}: tool '{tool}' is not available in batches"
+
+        args = call.get("args") or {}
+        if not isinstance(args, dict):
+            return [], f"Call {step_id}: args must be an object"
+
+        depends_on = call.get("depends_on") or []
+        if isinstance(depends_on, (str, int)):
+            depends_on = [depends_on]
+
+        steps.append(
+            {
+                "id": step_id,
+                "tool": tool,
+                "args": args,
+                "depends_on": [str(dep) for dep in depends_on],
+            }
+        )
+
+    for step in steps:
+        for dep in step["depends_on"]:
+            if dep not in ids:
+                return [], f"Call {step['id']}: unknown dependency '{dep}'"
+
+    # Reject cycles (Kahn's algorithm)
+    remaining = {step["id"]: set(step["depends_on"]) for step in steps}
+    while remaining:
+        ready = [step_id for step_id, deps in remaining.items() if not deps]
+        if not ready:
+            return [], f"Dependency cycle between calls: {sorted(remaining)}"
+        for step_id in ready:
+            del remaining[step_id]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+    return steps, ""
+
+
+@mcp.tool()
+async def batch_tools(
+    calls: list[dict], max_concurrency: int = 4, stop_on_error: bool = False
+) -> dict:
+    """
+    Run several tool calls in one round-trip.
+    Independent calls run concurrently; results come back in request order.
+
+    Args:
+        calls: List of {"id": "a", "tool": "git_status", "args": {"path": "proj"},
+            "depends_on": ["other-id"]}. "id" defaults to the call's position.
+            A call starts only after every call in depends_on has finished, and
+            is skipped if one of them failed.
+        max_concurrency: Maximum calls running at the same time (default: 4, max: 16)
+        stop_on_error: Skip all calls that have not started once one fails
+
+    Returns:
+        Per-call results with timing, in request order
+    """
+    logger.info(f"📦 batch_tools: {len(calls)} calls")
+
+    if len(calls) > BATCH_MAX_CALLS:
+        return {
+            "success": False,
+            "error": f"Too many calls ({len(calls)}). Max: {BATCH_MAX_CALLS}",
+        }
+
+    steps, error = _validate_batch(calls)
+    if error:
+        return {"success": False, "error": error}
+
+    semaphore = asyncio.Semaphore(max(1, min(max_concurrency, 16)))
+    done_events = {step["id"]: asyncio.Event() for step in steps}
+    outcomes: dict[str, dict] = {}
+    failed = False
+
+    async def run_step(step: dict):
+        nonlocal failed
+        try:
+            for dep in step["depends_on"]:
+                await done_events[dep].wait()
+
+            failed_deps = [
+                dep for dep in step["depends_on"] if not outcomes[dep].get("success")
+            ]
+            if failed_deps:
+                outcomes[step["id"]] = {
+                    "success": False,
+                    "skipped": True,
+                    "error": f"Dependency failed: {', '.join(failed_deps)}",
+                }
+                return
+
+            async with semaphore:
+                if stop_on_error and failed:
+                    outcomes[step["id"]] = {
+                        "success": False,
+                        "skipped": True,
+                        "error": "Skipped after an earlier failure",
+                    }
+                    return
+
+                started = time.perf_counter()
+                try:
+                    result = await BATCH_TOOLS[step["tool"]](**step["args"])
+                except TypeError as e:
+                    result = {"success": False, "error": f"Invalid arguments: {e}"}
+                except Exception as e:
+                    result = {"success": False, "error": str(e)}
+
+                success = not isinstance(result, dict) or bool(result.get("success", True))
+                if not success:
+                    failed = True
+                outcomes[step["id"]] = {
+                    "success": success,
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "result": result,
+                }
+        finally:
+            done_events[step["id"]].set()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_step(step) for step in steps))
+
+    results = [
+        {"id": step["id"], "tool": step["tool"], **outcomes[step["id"]]} for step in steps
+    ]
+    return {
+        "success": all(r["success"] for r in results),
+        "count": len(results),
+        "failed": sum(1 for r in results if not r["success"]),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "results": results,
+    }
+
+
 # ════════════════════════════════════════════════════════════
 # RESOURCES (for context)
 # ════════════════════════════════════════════════════════════
@@ -1325,6 +4366,18 @@ def get_server_settings() -> str:
             "blocked_folders": BLOCKED_FOLDERS,
             "allowed_commands": list(ALLOWED_COMMANDS.keys()),
             "max_file_size": format_size(MAX_FILE_SIZE),
+            "io_executor": io_executor.stats(),
+            "snapshots": snapshot_store.stats(),
+            "file_watcher": fs_watcher.stats(),
+            "symbol_index": symbol_index.stats(),
+            "import_graph": import_graph.stats(),
+            "semantic_index": semantic_index.stats() if semantic_index else None,
+            "command_jobs": job_manager.stats(),
+            "command_scheduler": command_scheduler.stats(),
+            "build_cache": build_cache.stats(),
+            "git_backend": git_backend.stats(),
+            "git_history": git_history.stats(),
+            "deploy_pipeline": pipeline_runner.stats(),
         },
         indent=2,
     )
@@ -2066,12 +5119,21 @@ def main():
 ║  Google:    {google_status:<47} ║
 ║            {google_detail:<49} ║
 ╠═══════════════════════════════════════════════════════════════╣
-║  File Tools: read_file, write_file, edit_file, delete_file   ║
-║  Search:     search_files, list_files                         ║
-║  Commands:   run_command                                      ║
+║  File Tools: read_file, read_files, write_file, edit_file,    ║
+║              delete_file, apply_patch, undo_edit,             ║
+║              list_snapshots                                   ║
+║  Search:     search_files, search_many, replace_in_workspace, ║
+║              list_files, changes_since                        ║
+║  Code:       find_symbol, list_symbols, select_tests          ║
+║              semantic_search_code                             ║
+║  Commands:   run_command, start_command, poll_command,        ║
+║              cancel_command, list_commands                    ║
 ║  Git:        git_status, git_diff, git_log, git_commit,      ║
-║              git_push, git_pull                               ║
+║              git_push, git_pull, git_status_all,              ║
+║              git_fetch_all, git_pull_all, git_history_query   ║
 ║  Projects:   list_projects, get_project_info                  ║
+║  Deploy:     deploy_vercel, deploy_many, full_deploy_pipeline ║
+║  Batch:      batch_tools                                      ║
 ║  Brain:      brain_search, brain_add, brain_list_domains,    ║
 ║              brain_stats                                      ║
 ║  Google AI:  gemini_chat, gemini_code, gemini_summarize,     ║
@@ -2088,6 +5150,10 @@ def main():
     logger.info(f"Starting MCP Server on port {MCP_PORT}")
     logger.info(f"Workspace root: {WORKSPACE_ROOT}")
 
+    # Watch the workspace for cache invalidation and changes_since
+    if WATCH_MODE != "0":
+        fs_watcher.start({"poll": "poll", "auto": "auto"}.get(WATCH_MODE, "inotify"))
+
     # Try to find available port for MCP server
     import socket
     def find_available_port(start_port, max_attempts=5):
@@ -2160,6 +5226,12 @@ def main():
             logger.error(f"HTTP image generation error: {e}")
             return {"success": False, "error": str(e)}
 
+    # Workspace change feed (long-poll): GET /mcp/changes?cursor=...&wait=30
+    @http_app.get("/mcp/changes")
+    async def http_changes(cursor: str = "", limit: int = 500, wait: float = 0):
+        """HTTP endpoint for incremental workspace sync"""
+        return await changes_since(cursor, limit, wait)
+
     # Video generation endpoint
     try:
         from video_generation import video_service
@@ -2441,7 +5513,11 @@ def main():
     time.sleep(0.5)
 
     # Run with HTTP transport for web access
-    mcp.run(transport="streamable-http")
+    try:
+        mcp.run(transport="streamable-http")
+    finally:
+        # Background jobs run in their own process groups: don't orphan them
+        job_manager.kill_all()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,248 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           SNAPSHOT STORE                                      ║
+║  Content-addressed history for write/edit/delete              ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Every destructive file tool records the previous content of the file
+before changing it, so a bad remote edit can be undone:
+- Blobs are zlib-compressed and named by the sha256 of their content,
+  so identical content is only ever stored once
+- Each file has an append-only journal (JSON lines) of its snapshots
+- Total blob size is bounded; the oldest snapshots across all files are
+  evicted first and a blob is deleted once no snapshot references it
+"""
+
+import os
+import json
+import time
+import zlib
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Snapshots kept per file (oldest dropped first)
+MAX_SNAPSHOTS_PER_FILE = 50
+
+
+class SnapshotStore:
+    """Deduplicated, size-bounded snapshots of workspace files."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.journal_dir = self.root / "journals"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._journals: dict[str, list[dict]] = {}  # file -> entries, oldest first
+        self._refs: dict[str, int] = {}  # blob hash -> number of snapshots using it
+        self._blob_sizes: dict[str, int] = {}  # blob hash -> compressed size
+        self.total_bytes = 0
+
+    # ---------- Storage layout ----------
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest[2:]
+
+    def _journal_path(self, file: str) -> Path:
+        name = hashlib.sha1(file.encode("utf-8")).hexdigest()
+        return self.journal_dir / f"{name}.jsonl"
+
+    def _load(self):
+        """Rebuild the in-memory view from the journals on first use."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.journal_dir.exists():
+            return
+        for journal in self.journal_dir.glob("*.jsonl"):
+            try:
+                entries = [json.loads(line) for line in journal.read_text("utf-8").splitlines() if line]
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable snapshot journal {journal.name}: {e}")
+                continue
+            if not entries:
+                continue
+            self._journals[entries[0]["file"]] = entries
+            for entry in entries:
+                self._add_ref(entry.get("hash"))
+
+    def _add_ref(self, digest: Optional[str]):
+        if not digest:
+            return
+        self._refs[digest] = self._refs.get(digest, 0) + 1
+        if digest not in self._blob_sizes:
+            try:
+                size = self._blob_path(digest).stat().st_size
+            except OSError:
+                size = 0
+            self._blob_sizes[digest] = size
+            self.total_bytes += size
+
+    def _drop_ref(self, digest: Optional[str]):
+        if not digest or digest not in self._refs:
+            return
+        self._refs[digest] -= 1
+        if self._refs[digest] > 0:
+            return
+        del self._refs[digest]
+        self.total_bytes -= self._blob_sizes.pop(digest, 0)
+        try:
+            self._blob_path(digest).unlink()
+        except OSError:
+            pass
+
+    def _save_journal(self, file: str):
+        entries = self._journals.get(file, [])
+        path = self._journal_path(file)
+        if not entries:
+            self._journals.pop(file, None)
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, path)
+
+    def _write_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self._blob_path(digest)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = blob.with_name(blob.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(zlib.compress(data, 6))
+            os.replace(tmp_path, blob)
+        return digest
+
+    def read_blob(self, digest: str) -> bytes:
+        with open(self._blob_path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+    # ---------- Public API ----------
+
+    def snapshot(self, file: str, data: Optional[bytes], op: str) -> dict:
+        """
+        Record the content of `file` before `op` changes it.
+        data=None means the file did not exist (undo will remove it).
+        """
+        with self._lock:
+            self._load()
+            digest = self._write_blob(data) if data is not None else None
+            entry = {
+                "id": f"{time.time_ns():x}",
+                "file": file,
+                "op": op,
+                "time": time.time(),
+                "hash": digest,
+                "size": len(data) if data is not None else 0,
+            }
+            entries = self._journals.setdefault(file, [])
+            entries.append(entry)
+            self._add_ref(digest)
+
+            # Append-only in the common case; rewrite only when trimming
+            if len(entries) > MAX_SNAPSHOTS_PER_FILE:
+                for old in entries[:-MAX_SNAPSHOTS_PER_FILE]:
+                    self._drop_ref(old["hash"])
+                del entries[:-MAX_SNAPSHOTS_PER_FILE]
+                self._save_journal(file)
+            else:
+                self.journal_dir.mkdir(parents=True, exist_ok=True)
+                with open(self._journal_path(file), "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+
+            self._evict(keep=entry)
+            return entry
+
+    def _evict(self, keep: dict):
+        """Drop the oldest snapshots (any file) until under max_bytes."""
+        if self.total_bytes <= self.max_bytes:
+            return
+        candidates = sorted(
+            (entry for entries in self._journals.values() for entry in entries if entry is not keep),
+            key=lambda entry: entry["time"],
+        )
+        touched = set()
+        for entry in candidates:
+            if self.total_bytes <= self.max_bytes:
+                break
+            self._journals[entry["file"]].remove(entry)
+            self._drop_ref(entry["hash"])
+            touched.add(entry["file"])
+        for file in touched:
+            self._save_journal(file)
+        if touched:
+            logger.info(f"Evicted snapshots of {len(touched)} file(s); store is {self.total_bytes} bytes")
+
+    def list(self, file: Optional[str] = None, limit: int = 20) -> list[dict]:
+        """Snapshots of one file (or all files), newest first."""
+        with self._lock:
+            self._load()
+            if file is not None:
+                entries = list(self._journals.get(file, []))
+            else:
+                entries = [entry for entries in self._journals.values() for entry in entries]
+        entries.sort(key=lambda entry: entry["time"], reverse=True)
+        return entries[:limit]
+
+    def _position(self, file: str, snapshot_id: Optional[str]) -> int:
+        entries = self._journals.get(file, [])
+        if not entries:
+            raise KeyError(f"No snapshots for {file}")
+        if not snapshot_id:
+            return len(entries) - 1
+        position = next((i for i, e in enumerate(entries) if e["id"] == snapshot_id), None)
+        if position is None:
+            raise KeyError(f"Snapshot not found: {snapshot_id}")
+        return position
+
+    def get(
+        self, file: str, snapshot_id: Optional[str] = None
+    ) -> tuple[dict, Optional[bytes]]:
+        """
+        A snapshot (default: the newest) of `file` with its content (None =
+        file did not exist), left in place. Raises KeyError if there is no
+        such snapshot.
+        """
+        with self._lock:
+            self._load()
+            position = self._position(file, snapshot_id)
+            entry = self._journals[file][position]
+            data = self.read_blob(entry["hash"]) if entry["hash"] else None
+            return entry, data
+
+    def drop(self, file: str, snapshot_id: str):
+        """Remove a snapshot and every newer one for `file` (no-op if it is gone)."""
+        with self._lock:
+            self._load()
+            try:
+                position = self._position(file, snapshot_id)
+            except KeyError:
+                return
+            entries = self._journals[file]
+            for dropped in entries[position:]:
+                self._drop_ref(dropped["hash"])
+            del entries[position:]
+            self._save_journal(file)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load()
+            return {
+                "files": len(self._journals),
+                "snapshots": sum(len(entries) for entries in self._journals.values()),
+                "blobs": len(self._refs),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
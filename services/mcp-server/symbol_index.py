@@ -0,0 +1,408 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           SYMBOL INDEX                                        ║
+║  Definitions of Python / TypeScript / JavaScript symbols      ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Backs find_symbol / list_symbols:
+- Python files are parsed with `ast` (classes, functions, methods,
+  module/class-level variables)
+- TS/JS files go through a light line scanner that strips comments and
+  strings and tracks braces to find classes, interfaces, types, enums,
+  functions, arrow functions and methods
+- One SQLite row per symbol (name, kind, file, line, parent); only files
+  whose mtime/size changed are re-parsed
+"""
+
+import re
+import ast
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+PYTHON_EXTENSIONS = {".py", ".pyi"}
+SCRIPT_EXTENSIONS = {".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".mts", ".cts"}
+SYMBOL_EXTENSIONS = PYTHON_EXTENSIONS | SCRIPT_EXTENSIONS
+
+# Files larger than this are skipped (generated bundles, vendored code)
+SYMBOL_MAX_FILE_SIZE = 1024 * 1024
+
+SCHEMA_VERSION = 1
+
+# (name, kind, line, end_line, parent, signature)
+Symbol = tuple[str, str, int, int, Optional[str], str]
+
+
+# ════════════════════════════════════════════════════════════
+# Python
+# ════════════════════════════════════════════════════════════
+
+
+def _python_signature(node) -> str:
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def extract_python_symbols(source: str) -> list[Symbol]:
+    tree = ast.parse(source)
+    symbols: list[Symbol] = []
+
+    def visit(body, parent: Optional[str], parent_kind: str):
+        for node in body:
+            end_line = getattr(node, "end_lineno", None) or getattr(node, "lineno", 0)
+            if isinstance(node, ast.ClassDef):
+                bases = ", ".join(ast.unparse(base) for base in node.bases)
+                signature = f"class {node.name}({bases})" if bases else f"class {node.name}"
+                symbols.append((node.name, "class", node.lineno, end_line, parent, signature))
+                qualified = f"{parent}.{node.name}" if parent else node.name
+                visit(node.body, qualified, "class")
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                kind = "method" if parent_kind == "class" else "function"
+                symbols.append(
+                    (node.name, kind, node.lineno, end_line, parent, _python_signature(node))
+                )
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                segment = ast.get_source_segment(source, node) or ""
+                signature = segment.split("\n")[0][:200]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        symbols.append(
+                            (target.id, "variable", node.lineno, end_line, parent, signature)
+                        )
+            elif isinstance(node, (ast.If, ast.Try)) and parent_kind == "module":
+                # Definitions under `if TYPE_CHECKING:` / `try: import ...`
+                visit(node.body, parent, parent_kind)
+                visit(getattr(node, "orelse", []), parent, parent_kind)
+
+    visit(tree.body, None, "module")
+    return symbols
+
+
+# ════════════════════════════════════════════════════════════
+# TypeScript / JavaScript
+# ════════════════════════════════════════════════════════════
+
+_STRIP = re.compile(
+    r"//[^\n]*|/\*.*?\*/|`(?:\\.|[^`\\])*`|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'",
+    re.DOTALL,
+)
+
+# Declarations whose braces open a body worth tracking
+_CONTAINERS = {"class", "namespace", "interface", "enum", "function", "method"}
+
+_MODIFIERS = r"(?:export\s+)?(?:default\s+)?(?:declare\s+)?(?:abstract\s+)?"
+
+_DECLARATIONS = [
+    ("class", re.compile(rf"^\s*{_MODIFIERS}class\s+([A-Za-z_$][\w$]*)")),
+    ("interface", re.compile(rf"^\s*{_MODIFIERS}interface\s+([A-Za-z_$][\w$]*)")),
+    ("type", re.compile(rf"^\s*{_MODIFIERS}type\s+([A-Za-z_$][\w$]*)\s*(?:<[^=]*>)?\s*=")),
+    ("enum", re.compile(rf"^\s*{_MODIFIERS}(?:const\s+)?enum\s+([A-Za-z_$][\w$]*)")),
+    (
+        "function",
+        re.compile(rf"^\s*{_MODIFIERS}(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)"),
+    ),
+    (
+        "function",
+        re.compile(
+            rf"^\s*{_MODIFIERS}(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*(?::[^=]+)?=\s*"
+            r"(?:async\s+)?(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|[A-Za-z_$][\w$]*\s*=>)"
+        ),
+    ),
+    ("variable", re.compile(rf"^\s*{_MODIFIERS}(?:const|let|var)\s+([A-Za-z_$][\w$]*)")),
+]
+
+_NAMESPACE = re.compile(rf"^\s*{_MODIFIERS}(?:namespace|module)\s+([A-Za-z_$][\w$.]*)")
+
+_METHOD = re.compile(
+    r"^\s*(?:(?:public|private|protected|static|readonly|abstract|override|async|get|set)\s+)*"
+    r"\*?\s*([A-Za-z_$#][\w$]*)\s*(?:<[^>]*>)?\s*\([^;]*$"
+)
+
+_PROPERTY = re.compile(
+    r"^\s*(?:(?:public|private|protected|static|readonly|declare|override)\s+)*"
+    r"([A-Za-z_$#][\w$]*)\s*[?!]?\s*(?::[^=;(]+)?(?:=|;|$)"
+)
+
+# Keywords that look like `name(...)` inside a class body
+_NOT_METHODS = set("if for while switch catch return function constructor super new".split())
+
+
+def _blank_literals(source: str) -> str:
+    """Replace comments and string contents with spaces, keeping newlines."""
+    def blank(match):
+        text = match.group(0)
+        return "".join("\n" if ch == "\n" else " " for ch in text)
+    return _STRIP.sub(blank, source)
+
+
+def extract_script_symbols(source: str) -> list[Symbol]:
+    original_lines = source.splitlines()
+    lines = _blank_literals(source).splitlines()
+    symbols: list[Symbol] = []
+    depth = 0
+    # Open containers: (name, kind, body depth, index into symbols)
+    stack: list[tuple[str, str, int, int]] = []
+
+    for number, line in enumerate(lines, 1):
+        parent = stack[-1] if stack else None
+        in_class_body = parent is not None and parent[1] == "class" and depth == parent[2]
+        in_namespace = parent is not None and parent[1] == "namespace" and depth == parent[2]
+        at_top = depth == 0 or in_namespace
+        signature = original_lines[number - 1].strip()[:200]
+
+        found = None
+        if at_top:
+            for kind, pattern in _DECLARATIONS:
+                match = pattern.match(line)
+                if match:
+                    found = (match.group(1), kind)
+                    break
+            if found is None:
+                match = _NAMESPACE.match(line)
+                if match:
+                    found = (match.group(1), "namespace")
+        elif in_class_body:
+            match = _METHOD.match(line)
+            if match and match.group(1) not in _NOT_METHODS:
+                found = (match.group(1), "method")
+            elif match and match.group(1) == "constructor":
+                found = ("constructor", "method")
+            elif not match:
+                match = _PROPERTY.match(line)
+                if match and line.strip():
+                    found = (match.group(1), "property")
+
+        opens = line.count("{")
+        closes = line.count("}")
+
+        if found:
+            name, kind = found
+            parent_name = parent[0] if in_class_body or in_namespace else None
+            symbols.append((name, kind, number, number, parent_name, signature))
+            if kind in _CONTAINERS and opens > closes:
+                qualified = f"{parent_name}.{name}" if parent_name else name
+                stack.append((qualified, kind, depth + 1, len(symbols) - 1))
+
+        depth += opens - closes
+        while stack and depth < stack[-1][2]:
+            _, _, _, index = stack.pop()
+            symbol = symbols[index]
+            symbols[index] = symbol[:3] + (number,) + symbol[4:]
+        depth = max(depth, 0)
+
+    return symbols
+
+
+def extract_symbols(path: str, source: str) -> list[Symbol]:
+    """Symbols defined in one file (language chosen by extension)."""
+    suffix = Path(path).suffix.lower()
+    if suffix in PYTHON_EXTENSIONS:
+        return extract_python_symbols(source)
+    if suffix in SCRIPT_EXTENSIONS:
+        return extract_script_symbols(source)
+    return []
+
+
+# ════════════════════════════════════════════════════════════
+# SQLite store
+# ════════════════════════════════════════════════════════════
+
+
+class SymbolIndex:
+    """Incremental symbol table for a workspace, stored in SQLite."""
+
+    def __init__(self, db_path: Path, root: Path):
+        self.db_path = Path(db_path)
+        self.root = Path(root)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+        self.last_refresh = 0.0
+        self._refreshed_in_process = False
+
+    def _init_schema(self):
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self._db.executescript(
+                """
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS symbols;
+                """
+            )
+        self._db.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                error TEXT
+            );
+            CREATE TABLE IF NOT EXISTS symbols (
+                name TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                file TEXT NOT NULL,
+                line INTEGER NOT NULL,
+                end_line INTEGER NOT NULL,
+                parent TEXT,
+                signature TEXT
+            );
+            CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS symbols_file ON symbols (file);
+            PRAGMA user_version = {SCHEMA_VERSION};
+            """
+        )
+        self._db.commit()
+
+    def _parse(self, rel_path: str) -> tuple[list[Symbol], Optional[str]]:
+        try:
+            with open(self.root / rel_path, "r", encoding="utf-8", errors="replace") as f:
+                source = f.read()
+            return extract_symbols(rel_path, source), None
+        except (OSError, SyntaxError, ValueError, RecursionError) as e:
+            return [], f"{type(e).__name__}: {e}"
+
+    def _store(self, rel_path: str, mtime_ns: int, size: int):
+        symbols, error = self._parse(rel_path)
+        self._db.execute("DELETE FROM symbols WHERE file = ?", (rel_path,))
+        self._db.executemany(
+            "INSERT INTO symbols (name, kind, file, line, end_line, parent, signature) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(name, kind, rel_path, *rest) for name, kind, *rest in symbols],
+        )
+        self._db.execute(
+            "INSERT OR REPLACE INTO files (path, mtime_ns, size, error) VALUES (?, ?, ?, ?)",
+            (rel_path, mtime_ns, size, error),
+        )
+
+    def _remove(self, rel_path: str):
+        self._db.execute("DELETE FROM symbols WHERE file = ?", (rel_path,))
+        self._db.execute("DELETE FROM files WHERE path = ?", (rel_path,))
+
+    def refresh(self, iter_files: Callable[[], Iterable[tuple[str, int, int]]]) -> dict:
+        """Re-parse files whose (mtime, size) changed; drop files that are gone."""
+        with self._lock:
+            started = time.time()
+            rows = self._db.execute("SELECT path, mtime_ns, size FROM files")
+            known = {path: (mtime_ns, size) for path, mtime_ns, size in rows}
+            changed = []
+            seen = set()
+            for rel_path, mtime_ns, size in iter_files():
+                seen.add(rel_path)
+                if known.get(rel_path) != (mtime_ns, size):
+                    changed.append((rel_path, mtime_ns, size))
+            removed = [path for path in known if path not in seen]
+
+            for rel_path in removed:
+                self._remove(rel_path)
+            for rel_path, mtime_ns, size in changed:
+                self._store(rel_path, mtime_ns, size)
+            self._db.commit()
+
+            self.last_refresh = time.time()
+            self._refreshed_in_process = True
+            if changed or removed:
+                logger.info(
+                    f"Symbol index refreshed: {len(changed)} parsed, "
+                    f"{len(removed)} removed in {time.time() - started:.2f}s"
+                )
+            return {"parsed_files": len(changed), "removed_files": len(removed)}
+
+    def ensure_fresh(
+        self, iter_files: Callable[[], Iterable[tuple[str, int, int]]], max_age: float
+    ) -> dict:
+        """Refresh only if the last refresh is older than max_age seconds."""
+        if self._refreshed_in_process and time.time() - self.last_refresh <= max_age:
+            return {"refreshed": False}
+        return {"refreshed": True, **self.refresh(iter_files)}
+
+    def mark_stale(self):
+        self.last_refresh = 0.0
+
+    def update_files(self, files: Iterable[tuple[str, Optional[int], Optional[int]]]):
+        """Re-parse specific files now; mtime_ns=None removes the file."""
+        with self._lock:
+            for rel_path, mtime_ns, size in files:
+                if mtime_ns is None:
+                    self._remove(rel_path)
+                else:
+                    self._store(rel_path, mtime_ns, size)
+            self._db.commit()
+
+    def _rows(self, sql: str, params: tuple) -> list[dict]:
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [
+            {
+                "name": name,
+                "kind": kind,
+                "file": file,
+                "line": line,
+                "end_line": end_line,
+                "parent": parent,
+                "signature": signature,
+            }
+            for name, kind, file, line, end_line, parent, signature in rows
+        ]
+
+    def find(
+        self,
+        name: str,
+        kind: str = "",
+        path_prefix: str = "",
+        exact: bool = False,
+        limit: int = 50,
+    ) -> list[dict]:
+        """
+        Symbols named `name` (case-insensitive). Without exact, names that
+        start with or contain it are included, ranked after exact matches.
+        """
+        where = ["name = ? COLLATE NOCASE"] if exact else ["name LIKE ? ESCAPE '\\'"]
+        escaped = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params: list = [name] if exact else [f"%{escaped}%"]
+        if kind:
+            where.append("kind = ?")
+            params.append(kind)
+        if path_prefix:
+            where.append("file LIKE ? ESCAPE '\\'")
+            prefix = path_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"{prefix}%")
+        sql = (
+            "SELECT name, kind, file, line, end_line, parent, signature FROM symbols "
+            f"WHERE {' AND '.join(where)} "
+            "ORDER BY (name = ?) DESC, (name = ? COLLATE NOCASE) DESC, "
+            "(name LIKE ? ESCAPE '\\') DESC, length(name), file, line LIMIT ?"
+        )
+        params += [name, name, f"{escaped}%", limit]
+        return self._rows(sql, tuple(params))
+
+    def list_file(self, rel_path: str) -> list[dict]:
+        """Symbols of one file in line order."""
+        return self._rows(
+            "SELECT name, kind, file, line, end_line, parent, signature FROM symbols "
+            "WHERE file = ? ORDER BY line",
+            (rel_path,),
+        )
+
+    def file_error(self, rel_path: str) -> Optional[str]:
+        """Parse error recorded for a file, if any."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT error FROM files WHERE path = ?", (rel_path,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            files = self._db.execute("SELECT count(*) FROM files").fetchone()[0]
+            symbols = self._db.execute("SELECT count(*) FROM symbols").fetchone()[0]
+        return {"files": files, "symbols": symbols}
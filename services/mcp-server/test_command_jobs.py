@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Regression test: background job output and cancellation.
+
+OutputRing.read must report how much of the stream was trimmed away
+(dropped) and where the next read continues (next_offset), also when
+the ring has cut chunks in half. JobManager.cancel must finish a job
+that is still queued behind a scheduler slot (without ever starting
+it and without leaking the slot) as well as one that is running.
+
+Usage:
+    python test_command_jobs.py
+"""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+from command_jobs import JobManager, OutputRing
+from command_scheduler import CommandScheduler
+
+
+def read_checks() -> list[tuple[str, bool]]:
+    ring = OutputRing(10)
+    for chunk in ["abcd", "efgh", "ijkl"]:
+        ring.append(chunk)  # "ab" is trimmed, "cd" is what is left of the first chunk
+
+    def read(offset: int, limit: int) -> tuple:
+        result = ring.read(offset, limit)
+        return result["output"], result["offset"], result["next_offset"], result["dropped"]
+
+    checks = [
+        ("read from 0 reports the trimmed head", read(0, 5) == ("cdefg", 2, 7, 2)),
+        ("read resumes at next_offset", read(7, 100) == ("hijkl", 7, 12, 0)),
+        ("read inside a chunk", read(5, 3) == ("fgh", 5, 8, 0)),
+        ("read at the end is empty", read(12, 10) == ("", 12, 12, 0)),
+    ]
+    ring.append("mnopqrstuvwxyz")  # Longer than the ring: only its tail is kept
+    checks += [
+        ("a chunk larger than the ring", read(7, 100) == ("qrstuvwxyz", 16, 26, 9)),
+        ("total counts every character", ring.total == 26 and ring.start == 16),
+    ]
+    return checks
+
+
+async def cancel_checks() -> list[tuple[str, bool]]:
+    scheduler = CommandScheduler(1)
+    manager = JobManager(ring_chars=1000)
+    cwd = Path.cwd()
+
+    async with scheduler.slot("python hold.py", "other"):
+        gate = scheduler.slot("python job.py", "app")
+        queued = await manager.start("echo never", cwd, ".", 30, gate)
+        await asyncio.sleep(0.05)
+        was_queued = queued.status == "queued" and scheduler.cpu.waiting == 1
+        await manager.cancel(queued.id)
+
+        # Cancelled before its task ever ran
+        gate = scheduler.slot("python job.py", "app")
+        early = await manager.start("echo never", cwd, ".", 30, gate)
+        await manager.cancel(early.id)
+
+    running = await manager.start("sleep 30", cwd, ".", 60)
+    await asyncio.sleep(0.2)
+    started = time.monotonic()
+    await manager.cancel(running.id)
+    stopped_in = time.monotonic() - started
+
+    stats = scheduler.stats()
+    jobs = manager.stats()
+    return [
+        ("job waits for its slot while queued", was_queued),
+        (
+            "cancelling a queued job finishes it unstarted",
+            queued.status == "cancelled" and queued.process is None and queued.done.is_set(),
+        ),
+        (
+            "cancelling before the task runs",
+            early.status == "cancelled" and early.process is None and early.done.is_set(),
+        ),
+        (
+            "no slot or waiter is left behind",
+            stats["cpu_slots_in_use"] == 0 and stats["waiting_for_cpu"] == 0,
+        ),
+        (
+            "cancelling a running job stops its process",
+            running.status == "cancelled"
+            and running.exit_code not in (None, 0)
+            and stopped_in < 5,
+        ),
+        ("nothing is left queued or running", jobs["queued"] == 0 and jobs["running"] == 0),
+    ]
+
+
+def main() -> int:
+    print("=" * 60)
+    print("🧪 TESTING: OutputRing offsets and job cancellation")
+    print("=" * 60)
+
+    failures = 0
+    for name, passed in read_checks() + asyncio.run(cancel_checks()):
+        if passed:
+            print(f"   ✅ {name}")
+        else:
+            failures += 1
+            print(f"   ❌ {name}")
+
+    summary = "✅ All job checks passed" if not failures else f"❌ {failures} failed"
+    print("\n" + summary)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
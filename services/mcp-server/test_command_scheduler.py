@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Regression test: CommandScheduler admission control.
+
+Waiters get CPU slots by priority, then arrival order; a timed out or
+cancelled waiter (even one cancelled right after a slot was handed to
+it) leaks neither a slot nor its project lock; builds of one project
+never overlap while other projects run.
+
+Usage:
+    python test_command_scheduler.py
+"""
+import sys
+import asyncio
+
+from command_scheduler import CommandScheduler, QueueTimeout
+
+BUILD = "npm install"  # build class: CPU slot + per-project build lock
+NORMAL = "python script.py"  # normal class: CPU slot only
+
+
+def idle(scheduler: CommandScheduler) -> bool:
+    stats = scheduler.stats()
+    return (
+        stats["cpu_slots_in_use"] == 0
+        and stats["queue_depth"] == 0
+        and stats["waiting_for_cpu"] == 0
+        and not stats["locked_projects"]
+        and all(c["running"] == 0 for c in stats["classes"].values())
+    )
+
+
+async def priority_order() -> bool:
+    scheduler = CommandScheduler(1)
+    order = []
+
+    async def run(name: str, command: str):
+        async with scheduler.slot(command, name):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async with scheduler.slot(NORMAL, "holder"):
+        tasks = []
+        for name, command in [("build-1", BUILD), ("normal-1", NORMAL), ("normal-2", NORMAL)]:
+            tasks.append(asyncio.create_task(run(name, command)))
+            await asyncio.sleep(0)  # Queue in this order
+    await asyncio.gather(*tasks)
+    return order == ["normal-1", "normal-2", "build-1"] and idle(scheduler)
+
+
+async def timeout_releases_lock() -> bool:
+    scheduler = CommandScheduler(1)
+    async with scheduler.slot(NORMAL, "other"):
+        try:
+            # Gets the build lock on "app", then times out waiting for the CPU
+            async with scheduler.slot(BUILD, "app", wait_timeout=0.05):
+                return False
+        except QueueTimeout as e:
+            if "CPU slot" not in str(e) or scheduler.stats()["locked_projects"]:
+                return False
+    return idle(scheduler)
+
+
+async def timeout_on_lock() -> bool:
+    scheduler = CommandScheduler(2)
+    async with scheduler.slot(BUILD, "app"):
+        try:
+            async with scheduler.slot(BUILD, "app", wait_timeout=0.05):
+                return False
+        except QueueTimeout as e:
+            if "build lock on 'app'" not in str(e) or scheduler.cpu.in_use != 1:
+                return False
+    return idle(scheduler)
+
+
+async def cancel_while_waiting() -> bool:
+    scheduler = CommandScheduler(1)
+
+    async def wait_for_slot():
+        async with scheduler.slot(BUILD, "app"):
+            pass
+
+    async with scheduler.slot(NORMAL, "other"):
+        task = asyncio.create_task(wait_for_slot())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    return task.cancelled() and idle(scheduler)
+
+
+async def cancel_after_handoff() -> bool:
+    scheduler = CommandScheduler(1)
+    entered = []
+
+    async def wait_for_slot():
+        async with scheduler.slot(NORMAL, "app"):
+            entered.append(True)
+
+    holder = scheduler.slot(NORMAL, "other")
+    await holder.__aenter__()
+    task = asyncio.create_task(wait_for_slot())
+    await asyncio.sleep(0.01)
+    # The slot is handed to the waiter, which is cancelled before it runs
+    await holder.__aexit__(None, None, None)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return not entered and idle(scheduler)
+
+
+async def build_lock_exclusion() -> bool:
+    scheduler = CommandScheduler(4)
+    running = {"app": 0, "web": 0}
+    overlap = {"app": 0, "web": 0}
+    concurrent_projects = 0
+
+    async def build(project: str):
+        nonlocal concurrent_projects
+        async with scheduler.slot(BUILD, project):
+            running[project] += 1
+            overlap[project] = max(overlap[project], running[project])
+            busy = sum(1 for n in running.values() if n)
+            concurrent_projects = max(concurrent_projects, busy)
+            await asyncio.sleep(0.02)
+            running[project] -= 1
+
+    await asyncio.gather(*(build(project) for project in ["app", "app", "web", "app"]))
+    return overlap == {"app": 1, "web": 1} and concurrent_projects == 2 and idle(scheduler)
+
+
+CASES = [
+    ("waiters served by priority, then arrival", priority_order),
+    ("CPU timeout releases the build lock", timeout_releases_lock),
+    ("build lock timeout holds no CPU slot", timeout_on_lock),
+    ("cancel while queued leaks nothing", cancel_while_waiting),
+    ("cancel right after a slot handoff leaks nothing", cancel_after_handoff),
+    ("one build per project, projects in parallel", build_lock_exclusion),
+]
+
+
+def main() -> int:
+    print("=" * 60)
+    print("🧪 TESTING: CommandScheduler slots and project locks")
+    print("=" * 60)
+
+    failures = 0
+    for name, case in CASES:
+        if asyncio.run(case()):
+            print(f"   ✅ {name}")
+        else:
+            failures += 1
+            print(f"   ❌ {name}")
+
+    summary = "✅ All scheduler checks passed" if not failures else f"❌ {failures} failed"
+    print("\n" + summary)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Regression test: PipelineRunner resume and skip logic.
+
+A small graph (install -> build + lint -> push) runs twice against the
+same state directory. Run 1 fails at push; run 2 must skip every step
+whose inputs are unchanged and re-run only from the failed step. A
+failed build blocks push, and changed inputs or force re-run a step.
+
+Usage:
+    python test_deploy_pipeline.py
+"""
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+
+from deploy_pipeline import PipelineRunner, PipelineStore, Step
+
+
+class Graph:
+    """Steps that count their runs and fail on demand."""
+
+    def __init__(self):
+        self.runs: dict[str, int] = {}
+        self.failing: set[str] = set()
+        self.inputs = {"install": "lock-1", "build": "src-1", "lint": "src-1"}
+
+    def step(self, name: str, needs: tuple[str, ...] = ()) -> Step:
+        async def run() -> dict:
+            self.runs[name] = self.runs.get(name, 0) + 1
+            if name in self.failing:
+                return {"success": False, "error": f"{name} failed"}
+            return {"success": True, "output": f"{name} ok"}
+
+        async def inputs() -> str:
+            return self.inputs[name]
+
+        return Step(name, run, needs, inputs if name in self.inputs else None)
+
+    def steps(self) -> list[Step]:
+        return [
+            self.step("install"),
+            self.step("build", ("install",)),
+            self.step("lint", ("install",)),
+            self.step("push", ("build", "lint")),
+        ]
+
+
+def statuses(result: dict) -> dict:
+    return {step["step"]: step["status"] for step in result["steps"]}
+
+
+def expect(install: str, build: str, lint: str, push: str) -> dict:
+    return {"install": install, "build": build, "lint": lint, "push": push}
+
+
+async def resume_from_failed_step(state_dir: Path) -> list[tuple[str, bool]]:
+    graph = Graph()
+    graph.failing.add("push")
+    first = await PipelineRunner(PipelineStore(state_dir)).run("app", graph.steps())
+
+    graph.failing.clear()
+    # A fresh runner reads the state run 1 persisted
+    runner = PipelineRunner(PipelineStore(state_dir))
+    second = await runner.run("app", graph.steps())
+
+    return [
+        ("run 1 fails at push", not first["success"] and first["failed_at"] == "push"),
+        (
+            "run 1 statuses",
+            statuses(first) == expect("succeeded", "succeeded", "succeeded", "failed"),
+        ),
+        (
+            "run 2 skips unchanged steps and re-runs push",
+            second["success"]
+            and statuses(second) == expect("skipped", "skipped", "skipped", "succeeded"),
+        ),
+        (
+            "each step ran once, push twice",
+            graph.runs == {"install": 1, "build": 1, "lint": 1, "push": 2},
+        ),
+        ("skips are counted", runner.stats()["skipped_steps"] == 3),
+        (
+            "skipped steps keep their previous result",
+            second["steps"][1].get("output") == "build ok",
+        ),
+    ]
+
+
+async def failure_blocks_dependents(state_dir: Path) -> list[tuple[str, bool]]:
+    graph = Graph()
+    graph.failing.add("build")
+    result = await PipelineRunner(PipelineStore(state_dir)).run("web", graph.steps())
+    push = next(step for step in result["steps"] if step["step"] == "push")
+    return [
+        ("build failure is reported", result["failed_at"] == "build"),
+        (
+            "push is blocked by build",
+            push["status"] == "blocked" and push["blocked_by"] == ["build"],
+        ),
+        ("lint still runs", statuses(result)["lint"] == "succeeded"),
+        ("push never ran", "push" not in graph.runs),
+    ]
+
+
+async def changed_inputs_rerun(state_dir: Path) -> list[tuple[str, bool]]:
+    graph = Graph()
+    runner = PipelineRunner(PipelineStore(state_dir))
+    await runner.run("api", graph.steps())
+
+    graph.inputs["build"] = "src-2"
+    changed = await runner.run("api", graph.steps())
+    forced = await runner.run("api", graph.steps(), force=True)
+    return [
+        (
+            "only the changed step and steps without inputs re-run",
+            statuses(changed) == expect("skipped", "succeeded", "skipped", "succeeded"),
+        ),
+        ("force re-runs everything", set(statuses(forced).values()) == {"succeeded"}),
+        ("one state file per pipeline", runner.stats()["stored_pipelines"] == 1),
+    ]
+
+
+CASES = [resume_from_failed_step, failure_blocks_dependents, changed_inputs_rerun]
+
+
+def main() -> int:
+    print("=" * 60)
+    print("🧪 TESTING: PipelineRunner resume and skip")
+    print("=" * 60)
+
+    failures = 0
+    for case in CASES:
+        with tempfile.TemporaryDirectory() as state_dir:
+            checks = asyncio.run(case(Path(state_dir)))
+        for name, passed in checks:
+            if passed:
+                print(f"   ✅ {name}")
+            else:
+                failures += 1
+                print(f"   ❌ {name}")
+
+    summary = "✅ All pipeline checks passed" if not failures else f"❌ {failures} failed"
+    print("\n" + summary)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
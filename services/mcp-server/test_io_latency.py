@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Latency test: a long search_files must not delay a concurrent read_file.
+
+Builds a synthetic workspace, starts a full-scan search (index disabled)
+and, while it runs, times read_file calls. Before the I/O executor the
+read waited for the whole search; now it should return in milliseconds.
+
+Usage:
+    python test_io_latency.py --files 30000
+"""
+import os
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+# read_file must finish within this share of the search duration
+MAX_READ_SHARE = 0.2
+
+
+def build_tree(root: Path, file_count: int):
+    body = "x = 1\n" * 200
+    for i in range(file_count):
+        folder = root / f"pkg_{i % 50}" / f"mod_{i // 1000}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"file_{i}.py").write_text(body)
+    (root / "notes.md").write_text("# Notes\n" + "line\n" * 100)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=30_000)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🧪 TESTING: search_files does not block read_file")
+    print("=" * 60)
+
+    workspace = Path(tempfile.mkdtemp(prefix="mcp-latency-"))
+    os.environ["WORKSPACE_ROOT"] = str(workspace)
+    os.environ["MCP_SEARCH_INDEX"] = "0"
+
+    try:
+        build_tree(workspace, args.files)
+        import server
+
+        # Warm up imports/thread pools
+        await server.read_file("notes.md")
+
+        search_started = time.perf_counter()
+        search_task = asyncio.create_task(
+            server.search_files("text that never appears", use_index=False)
+        )
+        await asyncio.sleep(0.05)  # let the search get going
+
+        read_latencies = []
+        while not search_task.done():
+            started = time.perf_counter()
+            result = await server.read_file("notes.md", start_line=1, end_line=5)
+            read_latencies.append(time.perf_counter() - started)
+            assert result.get("success"), result
+            await asyncio.sleep(0.05)
+
+        search_result = await search_task
+        search_time = time.perf_counter() - search_started
+
+        worst = max(read_latencies) if read_latencies else 0.0
+        print(f"\n📝 search_files: {search_time:.2f}s over {search_result['files_searched']:,} files")
+        print(f"📝 read_file during search: {len(read_latencies)} calls, worst {worst * 1000:.1f} ms")
+
+        if not read_latencies:
+            print("   ⚠️ Search finished before any read was issued; use more --files")
+            sys.exit(1)
+        if worst > search_time * MAX_READ_SHARE:
+            print("   ❌ read_file was blocked by search_files")
+            sys.exit(1)
+        print("   ✅ read_file stays responsive during a long search")
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
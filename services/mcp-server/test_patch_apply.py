@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Regression test: multi-hunk patches land on the right lines.
+
+Pure-insertion hunks (as produced by `diff -U0` / `git diff -U0`) name
+the line they go after; every later hunk must still apply at its own
+position once earlier hunks have shifted the file.
+
+Usage:
+    python test_patch_apply.py
+"""
+import sys
+
+from patch_apply import apply_hunks, parse_unified_diff
+
+BASE = "a\nb\nc\nd\ne\n"
+
+CASES = [
+    (
+        "two -U0 insertions",
+        "--- a/f.txt\n+++ b/f.txt\n@@ -1,0 +2 @@\n+X\n@@ -3,0 +5 @@\n+Y\n",
+        "a\nX\nb\nc\nY\nd\ne\n",
+    ),
+    (
+        "-U0 insertion then replacement",
+        "--- a/f.txt\n+++ b/f.txt\n@@ -1,0 +2,2 @@\n+X\n+X2\n@@ -4 +6 @@\n-d\n+D\n",
+        "a\nX\nX2\nb\nc\nD\ne\n",
+    ),
+    (
+        "-U0 deletion then insertion",
+        "--- a/f.txt\n+++ b/f.txt\n@@ -2 +1,0 @@\n-b\n@@ -4,0 +4 @@\n+Y\n",
+        "a\nc\nd\nY\ne\n",
+    ),
+    (
+        "-U0 insertion at the top",
+        "--- a/f.txt\n+++ b/f.txt\n@@ -0,0 +1 @@\n+X\n@@ -5,0 +7 @@\n+Z\n",
+        "X\na\nb\nc\nd\ne\nZ\n",
+    ),
+    (
+        "-U1 context hunks",
+        "--- a/f.txt\n+++ b/f.txt\n@@ -1,2 +1,3 @@\n a\n+X\n b\n"
+        "@@ -4,2 +5,3 @@\n d\n+Y\n e\n",
+        "a\nX\nb\nc\nd\nY\ne\n",
+    ),
+]
+
+
+def main() -> int:
+    print("=" * 60)
+    print("🧪 TESTING: apply_hunks offsets across hunks")
+    print("=" * 60)
+
+    failures = 0
+    for name, diff, expected in CASES:
+        (file_patch,) = parse_unified_diff(diff)
+        result = apply_hunks(BASE, file_patch.hunks, file_patch.path)
+        if result == expected:
+            print(f"   ✅ {name}")
+        else:
+            failures += 1
+            print(f"   ❌ {name}: got {result!r}, expected {expected!r}")
+
+    print("\n" + ("✅ All patches applied correctly" if not failures else f"❌ {failures} failed"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           WORKSPACE SEARCH & REPLACE                          ║
+║  Parallel replacement planning with preview + plan tokens     ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Backs replace_in_workspace:
+- Each candidate file is read and rewritten in memory on a thread pool
+  (one read per file; files without a match are dropped immediately)
+- A plan token fingerprints the request plus the exact content of every
+  file it would change, so a confirmed run can refuse to write if any
+  file changed since the preview
+- Preview diffs are bounded so thousands of matches stay readable
+"""
+
+import os
+import re
+import difflib
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+# Worker threads used to compute replacements
+REPLACE_WORKERS = min(8, (os.cpu_count() or 4))
+
+Substitute = Callable[[str], tuple[str, int]]
+
+
+@dataclass
+class FileReplacement:
+    path: Path
+    rel_path: str
+    original: bytes
+    new: bytes
+    count: int
+
+
+def compile_substitute(
+    query: str, replacement: str, regex: bool, case_sensitive: bool
+) -> Substitute:
+    """
+    Build a text -> (new_text, count) function.
+    Regex mode supports group references (\\1, \\g<name>) in replacement.
+    Raises re.error for an invalid pattern.
+    """
+    flags = 0 if case_sensitive else re.IGNORECASE
+    if regex:
+        pattern = re.compile(query, flags | re.MULTILINE)
+        pattern.sub(replacement, "")  # Validate the template up front
+        return lambda text: pattern.subn(replacement, text)
+
+    if case_sensitive:
+        return lambda text: (text.replace(query, replacement), text.count(query))
+    pattern = re.compile(re.escape(query), flags)
+    return lambda text: pattern.subn(lambda _: replacement, text)
+
+
+def _plan_file(path: Path, rel_path: str, substitute: Substitute, probe: Optional[bytes]):
+    try:
+        with open(path, "rb") as f:
+            original = f.read()
+    except OSError:
+        return None, rel_path, "unreadable"
+    if probe is not None and probe not in original:
+        return None, rel_path, None
+    try:
+        text = original.decode("utf-8")
+    except UnicodeDecodeError:
+        return None, rel_path, "not UTF-8 text"
+
+    new_text, count = substitute(text)
+    if not count or new_text == text:
+        return None, rel_path, None
+    return FileReplacement(path, rel_path, original, new_text.encode("utf-8"), count), rel_path, None
+
+
+def plan_replacements(
+    targets: Iterable[tuple[Path, str]],
+    substitute: Substitute,
+    probe: Optional[bytes] = None,
+) -> tuple[list[FileReplacement], list[dict]]:
+    """
+    Compute replacements for every target file on a thread pool.
+
+    probe is an optional byte string every matching file must contain;
+    files without it are skipped before decoding.
+    Returns (changed files sorted by path, skipped files with reasons).
+    """
+    changed, skipped = [], []
+    with ThreadPoolExecutor(max_workers=REPLACE_WORKERS, thread_name_prefix="mcp-replace") as pool:
+        futures = [
+            pool.submit(_plan_file, path, rel_path, substitute, probe)
+            for path, rel_path in targets
+        ]
+        for future in futures:
+            replacement, rel_path, reason = future.result()
+            if replacement is not None:
+                changed.append(replacement)
+            elif reason:
+                skipped.append({"file": rel_path, "reason": reason})
+    changed.sort(key=lambda item: item.rel_path)
+    return changed, skipped
+
+
+def plan_token(request: dict, changed: list[FileReplacement]) -> str:
+    """Fingerprint of the request and the current content of each file it changes."""
+    digest = hashlib.sha256(repr(sorted(request.items())).encode("utf-8"))
+    for item in changed:
+        digest.update(item.rel_path.encode("utf-8"))
+        digest.update(hashlib.sha256(item.original).digest())
+    return digest.hexdigest()[:32]
+
+
+def preview_diff(item: FileReplacement, context: int = 1) -> list[str]:
+    """Unified diff lines for one file."""
+    old_lines = item.original.decode("utf-8").splitlines()
+    new_lines = item.new.decode("utf-8").splitlines()
+    return list(
+        difflib.unified_diff(
+            old_lines,
+            new_lines,
+            fromfile=f"a/{item.rel_path}",
+            tofile=f"b/{item.rel_path}",
+            n=context,
+            lineterm="",
+        )
+    )
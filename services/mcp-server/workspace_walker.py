@@ -0,0 +1,185 @@
+"""
+╔═══════════════════════════════════════════════════════════════╗
+║           WORKSPACE WALKER                                    ║
+║  os.scandir-based traversal with blocked-subtree pruning      ║
+╚═══════════════════════════════════════════════════════════════╝
+
+Shared by search_files, list_files and the search index:
+- BLOCKED_FOLDERS / BLOCKED_EXTENSIONS are compiled once into sets
+- Blocked directories (node_modules, .venv, dist, ...) are never entered
+- Entries are yielded as os.DirEntry so callers reuse the cached stat data
+  instead of issuing extra stat() calls
+"""
+
+import os
+import re
+import sys
+import fnmatch
+from pathlib import Path, PurePath
+from typing import Callable, Iterable, Iterator, Optional
+
+
+class PathMatcher:
+    """Precompiled form of the folder/extension block lists."""
+
+    def __init__(self, blocked_folders: Iterable[str], blocked_extensions: Iterable[str]):
+        # Last component -> full component sequences ending with it,
+        # e.g. "objects" -> [(".git", "objects")]
+        self._folders: dict[str, list[tuple[str, ...]]] = {}
+        for blocked in blocked_folders:
+            parts = tuple(p for p in blocked.lower().replace("\\", "/").split("/") if p)
+            if parts:
+                self._folders.setdefault(parts[-1], []).append(parts)
+        self._extensions = frozenset(ext.lower() for ext in blocked_extensions)
+
+    def blocked_tail(self, lowered_parts: tuple[str, ...]) -> Optional[str]:
+        """
+        Return the block-list entry matching the end of the given
+        (lowercased) path components, or None.
+        """
+        sequences = self._folders.get(lowered_parts[-1]) if lowered_parts else None
+        if not sequences:
+            return None
+        for sequence in sequences:
+            if lowered_parts[-len(sequence) :] == sequence:
+                return "/".join(sequence)
+        return None
+
+    def blocked_folder(self, parts: Iterable[str]) -> Optional[str]:
+        """Return the block-list entry found anywhere in a full path, or None."""
+        lowered: tuple[str, ...] = ()
+        for part in parts:
+            lowered += (part.lower(),)
+            blocked = self.blocked_tail(lowered)
+            if blocked:
+                return blocked
+        return None
+
+    def extension_blocked(self, name: str) -> bool:
+        return os.path.splitext(name)[1].lower() in self._extensions
+
+
+def relative_ignores(root: Path, paths: Iterable[Path]) -> set[str]:
+    """
+    Ignored files/trees (e.g. the server's own cache) as workspace-relative
+    paths; paths outside the workspace are never walked and are dropped.
+    """
+    ignored = set()
+    for path in paths:
+        try:
+            ignored.add(str(Path(path).resolve().relative_to(Path(root).resolve())))
+        except ValueError:
+            continue
+    return ignored
+
+
+def compile_name_pattern(pattern: str) -> Callable[[str, str], bool]:
+    """
+    Compile a glob the way Path.rglob applies it.
+
+    Returns a predicate taking (relative_path, name). Plain name patterns
+    ("*.py") only look at the name; patterns with a separator are matched
+    against the end of the relative path.
+    """
+    if not pattern or pattern in ("*", "**", "**/*"):
+        return lambda rel_path, name: True
+
+    if "/" in pattern or "\\" in pattern:
+        return lambda rel_path, name: PurePath(rel_path).match(pattern)
+
+    flags = re.IGNORECASE if sys.platform == "win32" else 0
+    regex = re.compile(fnmatch.translate(pattern), flags)
+    return lambda rel_path, name: regex.match(name) is not None
+
+
+def _is_real_dir(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir(follow_symlinks=False)
+    except OSError:
+        return False
+
+
+class WorkspaceWalker:
+    """Depth-first scandir walk rooted at the workspace."""
+
+    def __init__(self, root: Path, matcher: PathMatcher, ignore: Iterable[Path] = ()):
+        self.root = Path(root)
+        self.matcher = matcher
+        self.ignore = relative_ignores(self.root, ignore)
+
+    def _is_contained(self, path: str) -> bool:
+        resolved = Path(path).resolve()
+        root = self.root.resolve()
+        return resolved == root or root in resolved.parents
+
+    def walk(
+        self,
+        start: Optional[Path] = None,
+        include_dirs: bool = False,
+        recursive: bool = True,
+        skip_blocked_extensions: bool = True,
+        on_pruned: Optional[Callable[[str], None]] = None,
+    ) -> Iterator[tuple[str, os.DirEntry]]:
+        """
+        Yield (path relative to workspace root, DirEntry) in sorted order.
+
+        Blocked folders and ignored paths are pruned before descending,
+        files with blocked extensions are skipped, and symlinked
+        directories are not followed. A directory is listed only after
+        it has been yielded, so callers can act on it first.
+
+        Args:
+            start: Directory to walk (default: workspace root)
+            include_dirs: Also yield directory entries
+            recursive: Descend into subdirectories
+            skip_blocked_extensions: Drop files with BLOCKED_EXTENSIONS
+            on_pruned: Called with the relative path of every blocked folder
+                that is skipped
+        """
+        start = Path(start) if start is not None else self.root
+        rel_start = start.relative_to(self.root)
+        base_parts = tuple(p.lower() for p in rel_start.parts)
+        base_rel = "" if not rel_start.parts else str(rel_start) + os.sep
+
+        stack = [(str(start), base_rel, base_parts)]
+        while stack:
+            dir_path, rel_prefix, lowered_parts = stack.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+
+            subdirs = []
+            for entry in entries:
+                parts = lowered_parts + (entry.name.lower(),)
+                if self.matcher.blocked_tail(parts):
+                    if on_pruned is not None and _is_real_dir(entry):
+                        on_pruned(rel_prefix + entry.name)
+                    continue
+
+                rel_path = rel_prefix + entry.name
+                if rel_path in self.ignore:
+                    continue
+                try:
+                    is_symlink = entry.is_symlink()
+                    if entry.is_dir(follow_symlinks=False):
+                        if include_dirs:
+                            yield rel_path, entry
+                        if recursive:
+                            subdirs.append((entry.path, rel_path + os.sep, parts))
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+
+                if skip_blocked_extensions and self.matcher.extension_blocked(entry.name):
+                    continue
+                if is_symlink and not self._is_contained(entry.path):
+                    continue
+
+                yield rel_path, entry
+
+            # Reverse so the stack pops subdirectories in sorted order
+            stack.extend(reversed(subdirs))